@@ -1,29 +1,62 @@
 from __future__ import unicode_literals
 
+import argparse
+import concurrent.futures
 import contextlib
 import curses
 import errno
+import functools
+import json
+import multiprocessing
+import os
+import queue
 import select
-from datetime import datetime
+import signal
+import socket
+import sys
+import threading
+from datetime import datetime, timezone
 import logging
 import time
+import urllib.error
+import urllib.request
 from typing import List
 
-from google.cloud import datastore
-from google.oauth2 import service_account
-
 from . import ControlUnit
+from . import bench
+from . import logs
+from . import pipeline
+from . import profiling
+from . import ring
+from . import soak
+from .archive import ArchiveReader, ArchiveWriter
+from .clock import ClockSync
+from .connection import TimeoutError
+from .live import LivePublisher
+from .livestate import CarState, LiveStateWriter
+from .timing import Car, RaceTiming
 
 DATASTORE_CERT_PATH = './bigdatatech-warsaw-challenge-219525419ec7.json'
 DATASTORE_ENTITY_NAME = 'race_results'
 LOG_FILE_NAME = 'carreralib.log'
+TRACE_FILE_NAME = None
 DEVICE = 'F8:69:3D:77:50:EA'
 RESULTS_CSV_FILE = 'results.csv'
 MAX_LAPS = 5
+RACE_DURATION = None
+DRIVER_PADS = ('yellow', 'blue')
+ARCHIVE_DIR = 'telemetry'
+PROFILE_MODE = 'sample'
+SPAN_REPORT_INTERVAL = 60.0
+INGEST_URL = None  # e.g. 'http://leaderboard:5000/api/results'
+STATION_ID = socket.gethostname()
+REPROCESSED_CSV_FILE = 'results.reprocessed.csv'
+REPROCESS_TOLERANCE = 5.0  # seconds between stored and regenerated finishing times
+SOAK_DEVICE = 'sim:?cars=8&lap=4.0&rate=20'
 
 
-credentials = service_account.Credentials.from_service_account_file(DATASTORE_CERT_PATH)
-client = datastore.Client(project=credentials.project_id, credentials=credentials)
+client = None
+uploader = None
 
 
 def formattime(time, longfmt=False):
@@ -40,19 +73,19 @@ def formattime(time, longfmt=False):
         return '%d:%02d:%02d.%03d' % (s // 3600, (s // 60) % 60, s % 60, ms)
 
 
-class Driver(object):
-    def __init__(self, name):
+class Driver(Car):
+    def __init__(self, name, address, save=True):
+        super().__init__(address)
         self.name = name
-        self.time = None
-        self.last_lap_time = None
-        self.best_lap_time = None
-        self.laps = []
+        self.save = save
 
-    def reset(self):
-        self.time = None
-        self.last_lap_time = None
-        self.best_lap_time = None
-        self.laps = []
+    @property
+    def last_lap_time(self):
+        return self.laps.last
+
+    @property
+    def best_lap_time(self):
+        return self.laps.best
 
     @property
     def is_registered(self):
@@ -62,29 +95,30 @@ class Driver(object):
     def finished_laps(self):
         return len(self.laps)
 
-    @property
-    def finished(self):
-        return self.finished_laps >= MAX_LAPS
-
-    def newlap(self, timer):
-        if self.finished:
-            return
-
-        if self.time is not None:
-            self.last_lap_time = timer.timestamp - self.time
-            self.laps.append(self.last_lap_time)
-            if self.best_lap_time is None or self.last_lap_time < self.best_lap_time:
-                self.best_lap_time = self.last_lap_time
-        self.time = timer.timestamp
-
-        if self.finished:
-            self.save_results()
+    def finish(self):
+        super().finish()
+        self.save_results()
 
     def save_results(self):
-        if self.name and self.time:
-            laps_sum = sum(self.laps)
+        with profiling.spans.span('save_results'):
+            self.__save_results()
+
+    def __save_results(self):
+        if self.save and self.name and self.time:
+            laps_sum = self.laps.total
+            finished_at = datetime.utcnow()
             with open(RESULTS_CSV_FILE, 'a+') as file:
-                file.write(f'{self.name}, {laps_sum}, {datetime.utcnow()}\n')
+                file.write(format_result(self.name, laps_sum, finished_at, self.laps,
+                                         self.heat))
+            if uploader:
+                # the heat id lets the leaderboard drop results submitted twice
+                uploader.submit({
+                    'heat': self.heat,
+                    'username': self.name,
+                    'time': laps_sum,
+                    'finished_at': finished_at.isoformat(),
+                    'laps': self.laps.tolist(),
+                })
             try:
                 save_to_datastore(self)
             except BaseException as e:
@@ -95,69 +129,211 @@ class Driver(object):
                f'| {formattime(self.last_lap_time)} | {formattime(self.best_lap_time)}'
 
 
+class ReplayDriver(Driver):
+    """Driver collecting its result in `results` instead of saving it,
+    finishing at the host time returned by `clock`."""
+
+    def __init__(self, name, address, results, clock):
+        super().__init__(name, address, save=False)
+        self.results = results
+        self.clock = clock
+
+    def save_results(self):
+        if self.name and self.time:
+            finished_at = datetime.fromtimestamp(self.clock(), timezone.utc).replace(tzinfo=None)
+            self.results.append((self.name, self.laps.total, finished_at, self.laps.tolist()))
+
+
+def format_result(name, total, finished_at, laps, heat=None):
+    laps = ' '.join(map(str, laps))
+    if heat is None:
+        return f'{name}, {total}, {finished_at}, {laps}\n'
+    return f'{name}, {total}, {finished_at}, {laps}, {heat}\n'
+
+
+def parse_result(line):
+    name, total, finished_at, *rest = line.rstrip('\n').split(', ', 3)
+    # results saved by older versions have no lap times, and those
+    # saved by the race runner end with a heat id
+    laps = rest[0].partition(', ')[0] if rest else ''
+    return name, int(total), datetime.fromisoformat(finished_at), [int(t) for t in laps.split()]
+
+
 def posgetter(driver: Driver):
     return (-driver.finished_laps, driver.best_lap_time or 10000000)
 
 
-class RaceRunner:
-    HEADER = 'Pos Name                   Lap time  Best lap Laps'
-    FORMAT = '{pos:<4}{car:<8}{time:>12}{laptime:>10}{bestlap:>10} {laps:>5}'
-
-    FOOTER = ' * * * * *  SPACE to start/restart, ESC quit'
+class RaceHandler:
+    """Race state driven by Control Unit events, optionally publishing
+    live updates for the webapp."""
 
-    def __init__(self, control_unit: ControlUnit, window, drivers: List[Driver]):
-        self.control_unit = control_unit
+    def __init__(self, drivers: List[Driver], publish=True, archive=None, laps=MAX_LAPS,
+                 duration=RACE_DURATION):
         self.status = None
-        self.start = None
         self.drivers = drivers
+        self.timing = RaceTiming(drivers, laps=laps, duration=duration, key=posgetter)
         self.max_lap = 0
+        self.publisher = LivePublisher() if publish else None
+        self.state = LiveStateWriter() if publish else None
+        self.archive = archive
 
-        self.window = window
-        self.titleattr = curses.A_STANDOUT
-        self.lightattr = curses.color_pair(1)
-        self.reset()
+    def reset_timing(self):
+        self.timing.reset()
+        self.max_lap = 0
+        if self.publisher:
+            self.publisher.publish('reset')
+        if self.archive:
+            self.archive.heat([driver.name for driver in self.drivers])
+
+    def handle_status(self, status, hosttime=None):
+        if self.archive:
+            self.archive.write(status, hosttime)
+        if self.publisher and (self.status is None or status.start != self.status.start):
+            self.publisher.publish('lights', start=status.start)
+        self.timing.handle_status(status)
+        changed = status is not self.status and status != self.status
+        self.status = status
+        if changed:
+            self.write_state()
+
+    def handle_timer(self, timer, hosttime=None):
+        logging.debug('handle_timer %s', timer)
+        if self.archive:
+            self.archive.write(timer, hosttime)
+        driver = self.timing.handle_timer(timer)
+        if driver is None or timer.sector != 1:
+            return None
+        self.max_lap = max(self.max_lap, driver.finished_laps)
+        self.publish_lap(driver)
+        self.write_state()
+        return driver
 
-    def reset(self):
-        for driver in drivers:
-            driver.reset()
+    def publish_lap(self, driver):
+        if not self.publisher:
+            return
+        self.publisher.publish(
+            'lap', address=driver.address, name=driver.name, laps=driver.finished_laps,
+            lap=driver.last_lap_time, best=driver.best_lap_time, total=driver.laps.total,
+            mean=driver.laps.rolling_mean,
+        )
+        order = [driver.address for driver in self.timing.standings if driver.is_registered]
+        self.publisher.publish('positions', order=order)
+
+    def write_state(self):
+        status = self.status
+        if not self.state or status is None:
+            return
+        cars = [
+            CarState(
+                name=driver.name, laps=driver.finished_laps, last=driver.last_lap_time,
+                best=driver.best_lap_time, total=driver.laps.total if driver.laps else None,
+                position=driver.position or 0, fuel=driver.fuel, pits=driver.pits,
+                pit=driver.pit, finished=driver.finished,
+            )
+            for driver in self.drivers
+        ]
+        self.state.write(status.start, status.mode, cars)
+
+
+class RaceController(RaceHandler):
+    """Race driven by polling a local or remote Control Unit, without a
+    user interface."""
+
+    def __init__(self, control_unit: ControlUnit, drivers: List[Driver], publish=True,
+                 archive=None):
+        super().__init__(drivers, publish, archive)
+        self.control_unit = control_unit
+        # Control Unit host times are monotonic
+        self.walltime = time.time() - time.monotonic()
 
+    def reset(self):
         status = self.control_unit.request()
         while not isinstance(status, ControlUnit.Status):
             status = self.control_unit.request()
         self.status = status
 
         self.control_unit.reset()
+        # a remote Control Unit is reset asynchronously, so reset timing
+        # when its reset marker is polled
+        if not isinstance(self.control_unit, pipeline.RemoteControlUnit):
+            self.reset_timing()
+
+    def poll(self):
+        """Poll the Control Unit once, handle and return the event."""
+        data = self.control_unit.poll()
+        if data is None:
+            return None
+
+        logging.debug('%s', data)
+        hosttime = self.control_unit.hosttime
+        if hosttime is not None:
+            hosttime += self.walltime
+        if isinstance(data, ControlUnit.Status):
+            self.handle_status(data, hosttime)
+        elif isinstance(data, ControlUnit.Timer):
+            self.handle_timer(data, hosttime)
+        elif isinstance(data, ring.Reset):
+            self.reset_timing()
+        else:
+            logging.warning('Unknown data from ControlUnit: %s', data)
+        return data
+
+    def handle_timer(self, timer, hosttime=None):
+        driver = super().handle_timer(timer, hosttime)
+        if driver is None:
+            return None
+        if all([driver.finished for driver in self.drivers if driver.is_registered]):
+            self.control_unit.start()
+        return driver
+
+
+class RaceRunner(RaceController):
+    HEADER = 'Pos Name                   Lap time  Best lap Laps'
+    FORMAT = '{pos:<4}{car:<8}{time:>12}{laptime:>10}{bestlap:>10} {laps:>5}'
+
+    FOOTER = ' * * * * *  SPACE to start/restart, P profile, ESC quit'
+
+    def __init__(self, control_unit: ControlUnit, window, drivers: List[Driver], publish=True,
+                 archive=None, profiler=None):
+        super().__init__(control_unit, drivers, publish, archive)
+        self.profiler = profiler
+
+        self.window = window
+        self.titleattr = curses.A_STANDOUT
+        self.lightattr = curses.color_pair(1)
+        self.reset()
+
+    def reset(self):
+        super().reset()
         time.sleep(1)
 
     def run(self):
         self.window.nodelay(1)
-        last = None
+        spans = profiling.spans
+        reported = time.monotonic()
 
         while True:
             try:
-                self.update()
+                with spans.span('update'):
+                    self.update()
                 c = self.window.getch()
 
                 if c == 27:  # ESC
                     break
+                elif c == ord('p') and self.profiler:
+                    self.profiler.toggle()
                 elif c == ord('r'):
                     self.reset()
                 elif c == ord(' '):
                     self.reset()
                     self.control_unit.start()
 
-                data = self.control_unit.request()
-                if data == last:
-                    continue
+                if time.monotonic() - reported >= SPAN_REPORT_INTERVAL:
+                    logging.info('Timing spans:\n%s', spans.format())
+                    spans.clear()
+                    reported = time.monotonic()
 
-                logging.debug(data)
-                if isinstance(data, ControlUnit.Status):
-                    self.handle_status(data)
-                elif isinstance(data, ControlUnit.Timer):
-                    self.handle_timer(data)
-                else:
-                    logging.warning(f'Unknown data from ControlUnit: {data}')
-                last = data
+                self.poll()
 
             except select.error as e:
                 pass
@@ -165,24 +341,6 @@ class RaceRunner:
                 if e.errno != errno.EINTR:
                     raise
 
-    def handle_status(self, status):
-        self.status = status
-
-    def handle_timer(self, timer):
-        if timer.address > 1:
-            return
-
-        if self.start is None:
-            self.start = timer.timestamp
-
-        logging.debug(f'handle_timer {timer}')
-        driver = self.drivers[timer.address]
-        driver.newlap(timer)
-        self.max_lap = max(self.max_lap, driver.finished_laps)
-
-        if all([driver.finished for driver in self.drivers if driver.is_registered]):
-            self.control_unit.start()
-
     def update(self, blink=lambda: (time.time() * 2) % 2 == 0):
         window = self.window
         window.clear()
@@ -200,17 +358,20 @@ class RaceRunner:
         elif int(time.time() * 2) % 2 == 0:  # A_BLINK may not be supported
             window.chgat(nlines - 1, 0, 2 * 5, self.lightattr)
 
-        for pos, driver in enumerate(sorted(self.drivers, key=posgetter), start=1):
+        drivers = [driver for driver in self.timing.standings if driver.is_registered] + [
+            driver for driver in self.drivers if driver.position is None and driver.is_registered
+        ]
+        for pos, driver in enumerate(drivers, start=1):
             driver_time = None
             if pos == 1:
                 leader = driver
-                if driver.time and self.start:
+                if driver.time and self.timing.start:
                     # driver_time = formattime(driver.time - self.start, True)
-                    leader_time = sum(driver.laps)
+                    leader_time = driver.laps.total
                     driver_time = formattime(leader_time)
             else:
                 if driver.time and leader.time:
-                    driver_time = '+%ss' % formattime(sum(driver.laps) - leader_time)
+                    driver_time = '+%ss' % formattime(driver.laps.total - leader_time)
 
             text = self.FORMAT.format(
                 pos=pos, car=driver.name, time=driver_time or '-', laps=driver.finished_laps,
@@ -221,41 +382,569 @@ class RaceRunner:
         window.refresh()
 
 
+class ResultUploader:
+    """Submit results to a central leaderboard in batches from a
+    background thread, retrying failed batches."""
+
+    def __init__(self, url, station, interval=2.0, maxbatch=100, timeout=5.0):
+        self.url = url
+        self.station = station
+        self.interval = interval
+        self.maxbatch = maxbatch
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.pending = []
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, result):
+        self.queue.put(result)
+
+    def close(self, timeout=None):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def run(self):
+        closed = False
+        while not closed:
+            try:
+                result = self.queue.get(timeout=self.interval if self.pending else None)
+                while True:
+                    if result is None:
+                        closed = True
+                    else:
+                        self.pending.append(result)
+                    result = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            while self.pending:
+                batch = self.pending[:self.maxbatch]
+                try:
+                    self.post(batch)
+                except urllib.error.HTTPError as e:
+                    if not 400 <= e.code < 500 or e.code in (408, 429):
+                        logging.warning('Failed to upload %d results: %s', len(self.pending), e)
+                        break
+                    # retrying a rejected batch would block all later results
+                    logging.error('Dropping %d results rejected by the server: %s\n%s',
+                                  len(batch), e, json.dumps(batch))
+                except OSError as e:
+                    logging.warning('Failed to upload %d results: %s', len(self.pending), e)
+                    break
+                del self.pending[:len(batch)]
+
+    def post(self, batch):
+        data = json.dumps({'station': self.station, 'results': batch}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=data, headers={
+            'Content-Type': 'application/json'
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def datastore_client():
+    global client
+    if client is None:
+        from google.cloud import datastore
+        from google.oauth2 import service_account
+
+        credentials = service_account.Credentials.from_service_account_file(DATASTORE_CERT_PATH)
+        client = datastore.Client(project=credentials.project_id, credentials=credentials)
+    return client
+
+
 def save_to_datastore(driver: Driver):
+    from google.cloud import datastore
+
+    client = datastore_client()
     entity = datastore.Entity(client.key(DATASTORE_ENTITY_NAME))
     entity['username'] = driver.name
-    entity['time'] = sum(driver.laps)
-    entity['laps'] = driver.laps
+    entity['time'] = driver.laps.total
+    entity['laps'] = driver.laps.tolist()
     entity['best_lap'] = driver.best_lap_time
     entity['finished_at'] = datetime.utcnow()
     client.put(entity)
 
 
-logging.basicConfig(level=logging.INFO,
-                    filename=LOG_FILE_NAME,
-                    format='%(message)s')
+def race(args):
+    global uploader
+    log_listener = logs.configure(LOG_FILE_NAME, level=logging.INFO, format='%(message)s')
+
+    clock = ClockSync()
+    trace = logs.TraceWriter(TRACE_FILE_NAME) if TRACE_FILE_NAME else None
+    uploader = ResultUploader(INGEST_URL, STATION_ID) if INGEST_URL else None
+    archive = open_archive() if ARCHIVE_DIR else None
 
+    profiler = profiling.ProfileToggle(args.profile)
+    profiler.install()
 
-with contextlib.closing(ControlUnit(DEVICE, timeout=1)) as control_unit:
-    control_unit.version()
+    with contextlib.closing(ControlUnit(args.device, timeout=1, clock=clock, trace=trace)) as control_unit:
+        control_unit.version()
+        control_unit.request = profiling.spans.wrap('request', control_unit.request)
 
-    driver_name_1 = input('Name (yellow pad): ')
-    driver_name_2 = input('Name (blue pad): ')
+        names = [input(f'Name ({pad} pad): ') for pad in DRIVER_PADS]
+        drivers = make_drivers(names)
 
-    drivers = [
-        Driver(driver_name_1),
-        Driver(driver_name_2)
+        def run(window):
+            curses.curs_set(0)
+            curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
+            runner = RaceRunner(control_unit, window, drivers, archive=archive, profiler=profiler)
+            runner.run()
+
+        try:
+            curses.wrapper(run)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            control_unit.reset()
+            if profiler.running:
+                profiler.toggle()
+            logging.info('Timer latency percentiles: %s', clock.percentiles())
+            logging.info('Timing spans:\n%s', profiling.spans.format())
+            if trace:
+                trace.close()
+            if archive:
+                archive.close()
+            if uploader:
+                uploader.close(timeout=10)
+            log_listener.stop()
+
+
+def open_archive(directory=ARCHIVE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    return ArchiveWriter(os.path.join(directory, f'{datetime.utcnow():%Y%m%d-%H%M%S}.crla'))
+
+
+def make_drivers(names, save=True):
+    return [
+        Driver(names[address] if address < len(names) else '', address, save)
+        for address in range(8)
     ]
 
-    def run(window):
-        curses.curs_set(0)
-        curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
-        runner = RaceRunner(control_unit, window, drivers)
-        runner.run()
 
+def configure_process_logging():
+    # drop handlers inherited from the parent process, whose queue
+    # listener does not run here
+    logging.getLogger().handlers.clear()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    return logs.configure(LOG_FILE_NAME, level=logging.INFO, format='%(message)s')
+
+
+def log_spans():
+    # each process records its own spans, e.g. the results consumer's
+    # save_results
+    if profiling.spans.report():
+        logging.info('Timing spans of %s:\n%s', multiprocessing.current_process().name,
+                     profiling.spans.format())
+
+
+def io_main(device, commands, stop, ready, profile=PROFILE_MODE, trace=TRACE_FILE_NAME):
+    log_listener = configure_process_logging()
+    # profile polling with kill -USR1 <pid>
+    profiler = profiling.ProfileToggle(profile)
+    profiler.install()
+    clock = ClockSync()
+    try:
+        pipeline.io_process(device, ring.DEFAULT_PATH, commands, stop, ready,
+                            trace=trace, spans=profiling.spans, timeout=1, clock=clock)
+    finally:
+        if profiler.running:
+            profiler.toggle()
+        logging.info('Timer latency percentiles: %s', clock.percentiles())
+        log_spans()
+        log_listener.stop()
+
+
+def consumer_main(names, stop, ready, publish=False, save=False, archive=None):
+    global uploader
+    log_listener = configure_process_logging()
+    if save and INGEST_URL:
+        uploader = ResultUploader(INGEST_URL, STATION_ID)
+    archive = open_archive(archive) if archive else None
+    handler = RaceHandler(make_drivers(names, save), publish, archive)
+    reader = ring.RingReader()
+    ready.set()
+    lost = 0
+    # ring buffer events carry monotonic host times
+    walltime = time.time() - time.monotonic()
+    try:
+        while not stop.is_set():
+            events = reader.read()
+            if not events:
+                time.sleep(0.005)
+                continue
+            for event, hosttime in events:
+                if isinstance(event, ControlUnit.Timer):
+                    handler.handle_timer(event, walltime + hosttime)
+                elif isinstance(event, ControlUnit.Status):
+                    handler.handle_status(event, walltime + hosttime)
+                else:
+                    handler.reset_timing()
+            if reader.lost != lost:
+                logging.warning('Lost %d events', reader.lost - lost)
+                lost = reader.lost
+    finally:
+        reader.close()
+        if archive:
+            archive.close()
+        if uploader:
+            uploader.close(timeout=10)
+        log_spans()
+        log_listener.stop()
+
+
+@contextlib.contextmanager
+def pipeline_processes(device, names, consumers, profile=PROFILE_MODE, trace=TRACE_FILE_NAME):
+    """Start an I/O process owning the Control Unit at `device` and a
+    consumer process for each `(name, publish, save, archive)` tuple in
+    `consumers`, and yield a remote Control Unit connected to them by a
+    shared memory ring buffer."""
+    commands = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    ready = multiprocessing.Event()
+    io = multiprocessing.Process(target=io_main, name='carreralib-io',
+                                 args=(device, commands, stop, ready, profile, trace))
+    io.start()
+    processes = [io]
     try:
-        curses.wrapper(run)
-    except KeyboardInterrupt:
-        pass
+        while not ready.wait(0.1):
+            if not io.is_alive():
+                raise SystemExit('Failed to connect to Control Unit')
+        for name, publish, save, archive in consumers:
+            ready = multiprocessing.Event()
+            consumer = multiprocessing.Process(target=consumer_main, name=f'carreralib-{name}',
+                                               args=(names, stop, ready, publish, save, archive))
+            consumer.start()
+            processes.append(consumer)
+            ready.wait(10)
+
+        control_unit = pipeline.RemoteControlUnit(ring.RingReader(), commands, io.is_alive)
+        try:
+            yield control_unit
+        finally:
+            control_unit.reset()
+            control_unit.close()
     finally:
-        control_unit.reset()
+        commands.close()
+        commands.join_thread()
+        stop.set()
+        for process in processes:
+            process.join(15)
+
+
+def race_processes(args):
+    """Run the race with the Control Unit owned by an I/O process and
+    results persisted, live updates published and telemetry archived by
+    separate consumer processes, all connected by a shared memory ring
+    buffer."""
+    log_listener = logs.configure(LOG_FILE_NAME, level=logging.INFO, format='%(message)s')
+    names = [input(f'Name ({pad} pad): ') for pad in DRIVER_PADS]
+
+    consumers = [('results', False, True, None), ('live', True, False, None)]
+    if ARCHIVE_DIR:
+        consumers.append(('telemetry', False, False, ARCHIVE_DIR))
+    try:
+        with pipeline_processes(args.device, names, consumers, args.profile) as control_unit:
+            profiler = profiling.ProfileToggle(args.profile)
+            profiler.install()
+
+            def run(window):
+                curses.curs_set(0)
+                curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
+                runner = RaceRunner(control_unit, window, make_drivers(names, save=False),
+                                    publish=False, profiler=profiler)
+                runner.run()
+
+            try:
+                curses.wrapper(run)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if profiler.running:
+                    profiler.toggle()
+    finally:
+        log_listener.stop()
+
+
+def run_bench(args):
+    with contextlib.closing(ControlUnit(args.device, timeout=args.timeout)) as control_unit:
+        print(f'CU version {control_unit.version()}')
+        report = bench.bench(control_unit, duration=args.duration)
+    report['device'] = args.device
+    print(bench.format_report(report))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+def reprocess_archive(path, laps=MAX_LAPS):
+    """Replay every heat of the telemetry archive at `path` through the
+    race timing of a `laps` lap race and return the regenerated results,
+    together with the host time ranges of the heats."""
+    results = []
+    heats = []
+    with ArchiveReader(path) as reader:
+        for heat in reader.heats:
+            now = [heat.start]
+            drivers = [
+                ReplayDriver(heat.names[address] if address < len(heat.names) else '',
+                             address, results, lambda: now[0])
+                for address in range(8)
+            ]
+            handler = RaceHandler(drivers, publish=False, laps=laps)
+            for hosttime, event in reader.events(heat.heat):
+                now[0] = hosttime
+                if isinstance(event, ControlUnit.Timer):
+                    handler.handle_timer(event, hosttime)
+                else:
+                    handler.handle_status(event, hosttime)
+            heats.append((heat.start, heat.end))
+    return results, heats
+
+
+def diff_results(stored, regenerated, heats, tolerance=REPROCESS_TOLERANCE):
+    """Compare regenerated results with stored ones.
+
+    Results match if they are for the same driver and finished within
+    `tolerance` seconds of each other.  Return lists of changed
+    ``(stored, regenerated)`` pairs, of results only regenerated, and of
+    stored results finished during one of the replayed `heats` which
+    were not regenerated.
+
+    """
+    def timestamp(result):
+        return result[2].replace(tzinfo=timezone.utc).timestamp()
+
+    candidates = {}
+    for result in stored:
+        candidates.setdefault(result[0], []).append(result)
+    changed, added = [], []
+    for result in sorted(regenerated, key=timestamp):
+        others = candidates.get(result[0], [])
+        match = min(others, key=lambda other: abs(timestamp(other) - timestamp(result)),
+                    default=None)
+        if match is None or abs(timestamp(match) - timestamp(result)) > tolerance:
+            added.append(result)
+            continue
+        others.remove(match)
+        if (match[1], match[3]) != (result[1], result[3]):
+            changed.append((match, result))
+    missing = sorted((
+        result for others in candidates.values() for result in others
+        if any(start <= timestamp(result) <= end + tolerance for start, end in heats)
+    ), key=timestamp)
+    return changed, added, missing
+
+
+def run_reprocess(args):
+    paths = []
+    for path in args.archives or [ARCHIVE_DIR]:
+        if os.path.isdir(path):
+            paths.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith('.crla')
+            ))
+        else:
+            paths.append(path)
+
+    results, heats = [], []
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as executor:
+        for path, (archive_results, archive_heats) in zip(
+            paths, executor.map(functools.partial(reprocess_archive, laps=args.laps), paths)
+        ):
+            print(f'{path}: {len(archive_heats)} heats, {len(archive_results)} results')
+            results.extend(archive_results)
+            heats.extend(archive_heats)
+    results.sort(key=lambda result: result[2])
+    with open(args.output, 'w') as file:
+        for result in results:
+            file.write(format_result(*result))
+
+    stored = []
+    if os.path.exists(args.results):
+        with open(args.results) as file:
+            stored = [parse_result(line) for line in file if line.strip()]
+    changed, added, missing = diff_results(stored, results, heats, args.tolerance)
+    for old, new in changed:
+        print(f'- {format_result(*old)}', end='')
+        print(f'+ {format_result(*new)}', end='')
+    for result in added:
+        print(f'+ {format_result(*result)}', end='')
+    for result in missing:
+        print(f'- {format_result(*result)}', end='')
+    print(f'{len(results)} results regenerated: {len(changed)} changed, {len(added)} added, '
+          f'{len(missing)} missing')
+    if changed or added or missing:
+        sys.exit(1)
+
+
+def run_soak(args):
+    """Run the race loop headless for `args.duration` seconds, restarting
+    heats as soon as all drivers have finished, and fail if memory or
+    latency grow past the given thresholds."""
+    simulated = args.device.startswith('sim:')
+    names = [f'Driver {n + 1}' for n in range(8)]
+    drivers = make_drivers(names, save=False)
+    monitor = soak.SoakMonitor(warmup=args.warmup)
+    clock = None if args.processes else ClockSync()
+    failures = []
+    heats = timeouts = lost = 0
+    # trace allocations in forked processes as well, so that they are
+    # slowed down alike and the I/O process cannot overrun the ring
+    monitor.start()
+    with contextlib.ExitStack() as stack:
+        stack.callback(monitor.stop)
+        if args.processes:
+            consumers = []
+            if args.publish:
+                consumers.append(('live', True, False, None))
+            if args.archive:
+                consumers.append(('telemetry', False, False, args.archive))
+            control_unit = stack.enter_context(
+                pipeline_processes(args.device, names, consumers, trace=args.trace)
+            )
+            controller = RaceController(control_unit, drivers, publish=False)
+        else:
+            trace = logs.TraceWriter(args.trace) if args.trace else None
+            if trace:
+                stack.callback(trace.close)
+            archive = open_archive(args.archive) if args.archive else None
+            if archive:
+                stack.callback(archive.close)
+            control_unit = ControlUnit(args.device, clock=clock, trace=trace)
+            stack.callback(control_unit.close)
+            control_unit.request = profiling.spans.wrap('request', control_unit.request)
+            controller = RaceController(control_unit, drivers, args.publish, archive)
+        restarted = None
+        start = sampled = time.monotonic()
+        while time.monotonic() - start < args.duration and not failures:
+            timing = controller.timing
+            # a remote Control Unit resets timing once its reset is polled
+            if heats == 0 or (timing.finished and timing.heat != restarted):
+                restarted = timing.heat
+                if simulated:
+                    controller.reset()
+                    control_unit.start()
+                else:
+                    controller.reset_timing()
+                heats += 1
+            polled = time.perf_counter()
+            try:
+                event = controller.poll()
+            except TimeoutError:
+                timeouts += 1
+                continue
+            except EOFError:
+                logging.info('End of replay')
+                break
+            if event is not None:
+                monitor.record(time.perf_counter() - polled)
+            if time.monotonic() - sampled >= args.interval:
+                sampled = time.monotonic()
+                print(soak.format_sample(monitor.sample()), flush=True)
+                failures = monitor.check(args.max_rss * 2**20, args.max_traced * 2**20,
+                                         args.max_p99)
+        print(soak.format_sample(monitor.sample()))
+        failures = failures or monitor.check(args.max_rss * 2**20, args.max_traced * 2**20,
+                                             args.max_p99)
+        for line in monitor.top():
+            print(line)
+        if args.processes:
+            lost = control_unit.reader.lost
+            if lost:
+                failures.append(f'Lost {lost} events')
+    print(f'{heats} heats, {timeouts} timeouts, {lost} lost events')
+    if clock is not None:
+        print(f'Timer latency percentiles: {clock.percentiles()}')
+    print(profiling.spans.format())
+    if args.output:
+        report = monitor.report()
+        report.update(device=args.device, heats=heats, timeouts=timeouts, lost=lost,
+                      failures=failures, spans=profiling.spans.report())
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    for failure in failures:
+        print(f'FAILED: {failure}')
+    if failures:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m carreralib')
+    subparsers = parser.add_subparsers(dest='command')
+
+    race_parser = subparsers.add_parser('race', help='run the race UI (default)')
+    race_parser.add_argument('device', metavar='DEVICE', nargs='?', default=DEVICE)
+    race_parser.add_argument('-P', '--processes', action='store_true',
+                             help='poll the device, save results and publish live updates '
+                                  'in separate processes')
+    race_parser.add_argument('--profile', metavar='MODE', default=PROFILE_MODE,
+                             choices=('sample', 'cprofile'),
+                             help='profiler toggled by P or SIGUSR1 (default: %(default)s)')
+
+    bench_parser = subparsers.add_parser('bench', help='measure device throughput and latency')
+    bench_parser.add_argument('device', metavar='URL',
+                              help='serial port, Bluetooth address, sim:... or replay:FILE')
+    bench_parser.add_argument('-d', '--duration', default=10.0, type=float)
+    bench_parser.add_argument('-t', '--timeout', default=1.0, type=float)
+    bench_parser.add_argument('-o', '--output', metavar='FILE', help='write JSON report to FILE')
+
+    reprocess_parser = subparsers.add_parser(
+        'reprocess', help='regenerate results from telemetry archives and compare them'
+    )
+    reprocess_parser.add_argument('archives', metavar='ARCHIVE', nargs='*',
+                                  help=f'archive file or directory (default: {ARCHIVE_DIR})')
+    reprocess_parser.add_argument('-j', '--jobs', type=int, help='number of worker processes')
+    reprocess_parser.add_argument('-r', '--results', metavar='FILE', default=RESULTS_CSV_FILE,
+                                  help='stored results to compare with (default: %(default)s)')
+    reprocess_parser.add_argument('-o', '--output', metavar='FILE', default=REPROCESSED_CSV_FILE,
+                                  help='write regenerated results to FILE (default: %(default)s)')
+    reprocess_parser.add_argument('-t', '--tolerance', type=float, default=REPROCESS_TOLERANCE,
+                                  help='maximum difference of finishing times in seconds')
+    reprocess_parser.add_argument('-l', '--laps', type=int, default=MAX_LAPS,
+                                  help='number of laps the heats were raced over '
+                                       '(default: %(default)s)')
+
+    soak_parser = subparsers.add_parser(
+        'soak', help='run the race loop for hours and check for memory and latency growth'
+    )
+    soak_parser.add_argument('device', metavar='URL', nargs='?', default=SOAK_DEVICE,
+                             help='sim:... or replay:FILE?loop=1 (default: %(default)s)')
+    soak_parser.add_argument('-d', '--duration', default=3600.0, type=float,
+                             help='duration in seconds (default: %(default)s)')
+    soak_parser.add_argument('-i', '--interval', default=60.0, type=float,
+                             help='sampling interval in seconds (default: %(default)s)')
+    soak_parser.add_argument('-w', '--warmup', default=60.0, type=float,
+                             help='seconds until the baseline sample (default: %(default)s)')
+    soak_parser.add_argument('--max-rss', default=32.0, type=float, metavar='MIB',
+                             help='maximum RSS growth (default: %(default)s)')
+    soak_parser.add_argument('--max-traced', default=8.0, type=float, metavar='MIB',
+                             help='maximum traced memory growth (default: %(default)s)')
+    soak_parser.add_argument('--max-p99', default=2.0, type=float, metavar='RATIO',
+                             help='maximum P99 latency growth factor (default: %(default)s)')
+    soak_parser.add_argument('-P', '--processes', action='store_true',
+                             help='poll the device and consume events in separate processes')
+    soak_parser.add_argument('--publish', action='store_true', help='publish live updates')
+    soak_parser.add_argument('--archive', metavar='DIR', help='archive telemetry in DIR')
+    soak_parser.add_argument('--trace', metavar='FILE', help='trace messages to FILE')
+    soak_parser.add_argument('-o', '--output', metavar='FILE', help='write JSON report to FILE')
+
+    args = parser.parse_args()
+    if args.command == 'bench':
+        run_bench(args)
+    elif args.command == 'reprocess':
+        run_reprocess(args)
+    elif args.command == 'soak':
+        run_soak(args)
+    else:
+        if args.command is None:
+            args.device = DEVICE
+            args.processes = False
+            args.profile = PROFILE_MODE
+        if args.processes:
+            race_processes(args)
+        else:
+            race(args)
+
+
+if __name__ == '__main__':
+    main()
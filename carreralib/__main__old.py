@@ -9,9 +9,9 @@ import select
 import time
 
 from . import ControlUnit
-
-def posgetter(driver):
-    return (-driver.laps, driver.time)
+from . import logs
+from .timing import RaceTiming
+from .tower import PositionTower
 
 
 def formattime(time, longfmt=False):
@@ -42,36 +42,18 @@ class RMS(object):
     # FUEL_MASK = ControlUnit.Status.FUEL_MODE | ControlUnit.Status.REAL_MODE
     FUEL_MASK = ControlUnit.Status.PIT_LANE_MODE
 
-    class Driver(object):
-        def __init__(self, num):
-            self.num = num
-            self.time = None
-            self.laptime = None
-            self.bestlap = None
-            self.laps = 0
-            self.pits = 0
-            self.fuel = 0
-            self.pit = False
-
-        def newlap(self, timer):
-            if self.time is not None:
-                self.laptime = timer.timestamp - self.time
-                if self.bestlap is None or self.laptime < self.bestlap:
-                    self.bestlap = self.laptime
-                self.laps += 1
-            self.time = timer.timestamp
-
     def __init__(self, cu, window):
         self.cu = cu
+        self.timing = RaceTiming()
+        self.tower = PositionTower(cu)
         self.window = window
         self.titleattr = curses.A_STANDOUT
         self.lightattr = curses.color_pair(1)
         self.reset()
 
     def reset(self):
-        self.drivers = [self.Driver(num) for num in range(1, 9)]
+        self.timing.reset()
         self.maxlaps = 0
-        self.start = None
         # discard remaining timer messages
         status = self.cu.request()
         while not isinstance(status, ControlUnit.Status):
@@ -80,11 +62,10 @@ class RMS(object):
         # reset cu timer
         self.cu.reset()
         # reset position tower
-        self.cu.clrpos()
+        self.tower.clear()
 
     def run(self):
         self.window.nodelay(1)
-        last = None
         while True:
             try:
                 self.update()
@@ -105,9 +86,10 @@ class RMS(object):
                     self.cu.request(ControlUnit.FUEL_KEY)
                 elif c == ord('c'):
                     self.cu.request(ControlUnit.CODE_KEY)
-                data = self.cu.request()
-                # prevent counting duplicate laps
-                if data == last:
+                self.tower.flush()
+                # duplicate timer events are suppressed by poll()
+                data = self.cu.poll()
+                if data is None:
                     continue
                 elif isinstance(data, ControlUnit.Status):
                     self.handle_status(data)
@@ -115,7 +97,6 @@ class RMS(object):
                     self.handle_timer(data)
                 else:
                     logging.warn('Unknown data from CU: ' + data)
-                last = data
             except select.error as e:
                 pass
             except IOError as e:
@@ -123,23 +104,15 @@ class RMS(object):
                     raise
 
     def handle_status(self, status):
-        for driver, fuel in zip(self.drivers, status.fuel):
-            driver.fuel = fuel
-        for driver, pit in zip(self.drivers, status.pit):
-            if pit and not driver.pit:
-                driver.pits += 1
-            driver.pit = pit
+        self.timing.handle_status(status)
         self.status = status
 
     def handle_timer(self, timer):
-        driver = self.drivers[timer.address]
-        driver.newlap(timer)
-        if self.maxlaps < driver.laps:
-            self.maxlaps = driver.laps
-            # position tower only handles 250 laps
-            self.cu.setlap(self.maxlaps % 250)
-        if self.start is None:
-            self.start = timer.timestamp
+        driver = self.timing.handle_timer(timer)
+        if driver is None or timer.sector != 1:
+            return
+        self.maxlaps = max(self.maxlaps, len(driver.laps))
+        self.tower.update(self.timing.standings, self.maxlaps)
 
     def update(self, blink=lambda: (time.time() * 2) % 2 == 0):
         window = self.window
@@ -159,29 +132,30 @@ class RMS(object):
         elif int(time.time() * 2) % 2 == 0:  # A_BLINK may not be supported
             window.chgat(nlines - 2, 0, 2 * 5, self.lightattr)
 
-        drivers = [driver for driver in self.drivers if driver.time]
-        for pos, driver in enumerate(sorted(drivers, key=posgetter), start=1):
+        for pos, driver in enumerate(self.timing.standings, start=1):
             if pos == 1:
                 leader = driver
-                t = formattime(driver.time - self.start, True)
-            elif driver.laps == leader.laps:
+                t = formattime(driver.time - self.timing.start, True)
+            elif len(driver.laps) == len(leader.laps):
                 t = '+%ss' % formattime(driver.time - leader.time)
             else:
-                gap = leader.laps - driver.laps
+                gap = len(leader.laps) - len(driver.laps)
                 t = '+%d Lap%s' % (gap, 's' if gap != 1 else '')
             if (self.status.mode & self.FUEL_MASK) != 0:
                 text = self.FORMAT1.format(
-                    pos=pos, car=driver.num, time=t, laps=driver.laps,
-                    laptime=formattime(driver.laptime),
-                    bestlap=formattime(driver.bestlap),
+                    pos=pos, car=driver.address + 1, time=t,
+                    laps=len(driver.laps),
+                    laptime=formattime(driver.laps.last),
+                    bestlap=formattime(driver.laps.best),
                     fuel=driver.fuel/15.0,
                     pits=driver.pits
                 )
             else:
                 text = self.FORMAT2.format(
-                    pos=pos, car=driver.num, time=t, laps=driver.laps,
-                    laptime=formattime(driver.laptime),
-                    bestlap=formattime(driver.bestlap)
+                    pos=pos, car=driver.address + 1, time=t,
+                    laps=len(driver.laps),
+                    laptime=formattime(driver.laps.last),
+                    bestlap=formattime(driver.laps.best)
                 )
             window.addnstr(pos, 0, text, ncols)
         window.refresh()
@@ -191,14 +165,17 @@ parser = argparse.ArgumentParser(prog='python -m carreralib')
 parser.add_argument('device', metavar='DEVICE')
 parser.add_argument('-l', '--logfile', default='carreralib.log')
 parser.add_argument('-t', '--timeout', default=1.0, type=float)
+parser.add_argument('-T', '--trace', metavar='FILE')
 parser.add_argument('-v', '--verbose', action='store_true')
 args = parser.parse_args()
 
-logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARN,
-                    filename=args.logfile,
-                    fmt='%(asctime)s: %(message)s')
+listener = logs.configure(args.logfile,
+                          level=logging.DEBUG if args.verbose else logging.WARN,
+                          format='%(asctime)s: %(message)s')
+trace = logs.TraceWriter(args.trace) if args.trace else None
 
-with contextlib.closing(ControlUnit(args.device, timeout=args.timeout)) as cu:
+with contextlib.closing(ControlUnit(args.device, timeout=args.timeout,
+                                    trace=trace)) as cu:
     print('CU version %s' % cu.version())
 
     def run(win):
@@ -210,3 +187,7 @@ with contextlib.closing(ControlUnit(args.device, timeout=args.timeout)) as cu:
         curses.wrapper(run)
     except KeyboardInterrupt:
         pass
+    finally:
+        if trace:
+            trace.close()
+        listener.stop()
@@ -0,0 +1,321 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import array
+import heapq
+import json
+import mmap
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+from operator import itemgetter
+
+from .cu import _PIT_MASKS, ControlUnit
+
+MAGIC = b'CRLA\x01\x00\x00\x00'
+
+# record type, payload length
+_RECORD = struct.Struct('<4sI')
+
+# table, number of rows, number of columns
+_CHUNK = struct.Struct('<BIB')
+
+# name, type code, compressed length
+_COLUMN = struct.Struct('<16scI')
+
+_CHUNK_TAG = b'CHNK'
+
+_HEAT_TAG = b'HEAT'
+
+_UINT32 = 'I' if array.array('I').itemsize == 4 else 'L'
+
+_FUEL = tuple('fuel%d' % n for n in range(8))
+
+TIMERS = 1
+"""Table of :class:`ControlUnit.Timer` events."""
+
+STATUS = 2
+"""Table of :class:`ControlUnit.Status` changes."""
+
+COLUMNS = {
+    TIMERS: (('time', 'd'), ('heat', 'H'), ('address', 'B'),
+             ('sector', 'B'), ('timestamp', _UINT32)),
+    STATUS: (('time', 'd'), ('heat', 'H'), ('start', 'B'), ('mode', 'B'),
+             ('pit', 'B')) + tuple((name, 'B') for name in _FUEL)
+}
+"""Names and :mod:`array` type codes of the columns of each table."""
+
+Heat = namedtuple('Heat', 'heat start end names rows')
+"""Index entry of a heat, with `rows` mapping tables to row ranges."""
+
+
+class _Table(object):
+
+    def __init__(self, table):
+        self.table = table
+        self.columns = [
+            (name, array.array(code)) for name, code in COLUMNS[table]
+        ]
+        self.rows = 0
+
+    def __len__(self):
+        return len(self.columns[0][1])
+
+
+class ArchiveWriter(object):
+    """Append-only columnar archive of Control Unit events.
+
+    Events are buffered per table and written as chunks of
+    zlib-compressed, typed columns once `chunksize` rows have been
+    collected.  Status events are only stored if they differ from the
+    previous one.  Calling :meth:`heat` marks the start of a new heat,
+    and an index entry for every heat is appended when it ends.  The
+    archive file must not exist yet.
+
+    """
+
+    def __init__(self, path, chunksize=4096, level=6, clock=time.time):
+        self.__file = open(path, 'xb')
+        self.__file.write(MAGIC)
+        self.chunksize = chunksize
+        self.level = level
+        self.clock = clock
+        self.__tables = {table: _Table(table) for table in COLUMNS}
+        self.__status = None
+        self.__heat = None
+        self.__heats = 0
+
+    def close(self):
+        """End the current heat and close the archive."""
+        self.end_heat()
+        self.flush()
+        self.__file.close()
+
+    def heat(self, names=()):
+        """End the current heat and start a new one with the given
+        driver `names`.
+
+        """
+        self.end_heat()
+        self.__heats += 1
+        rows = {table: t.rows + len(t) for table, t in self.__tables.items()}
+        self.__heat = (self.__heats, self.clock(), list(names), rows)
+        self.__status = None
+
+    def end_heat(self):
+        """End the current heat, if any, and append its index entry."""
+        if self.__heat is None:
+            return
+        heat, start, names, first = self.__heat
+        self.__heat = None
+        rows = {}
+        for table, t in self.__tables.items():
+            rows[str(table)] = [first[table], t.rows + len(t)]
+        payload = json.dumps({
+            'heat': heat, 'start': start, 'end': self.clock(),
+            'names': names, 'rows': rows
+        }).encode('utf-8')
+        self.flush()
+        self.__file.write(_RECORD.pack(_HEAT_TAG, len(payload)))
+        self.__file.write(payload)
+        self.__file.flush()
+
+    def write(self, event, hosttime=None):
+        """Append a :class:`ControlUnit.Timer` or
+        :class:`ControlUnit.Status` event; other events are ignored.
+
+        """
+        if hosttime is None:
+            hosttime = self.clock()
+        heat = self.__heat[0] if self.__heat is not None else 0
+        if isinstance(event, ControlUnit.Timer):
+            values = (hosttime, heat, event.address, event.sector,
+                      event.timestamp)
+            table = self.__tables[TIMERS]
+        elif isinstance(event, ControlUnit.Status):
+            if event == self.__status:
+                return
+            self.__status = event
+            pitmask = sum(1 << n for n, pit in enumerate(event.pit) if pit)
+            values = (hosttime, heat, event.start, event.mode, pitmask)
+            values += tuple(event.fuel)
+            table = self.__tables[STATUS]
+        else:
+            return
+        for (_, column), value in zip(table.columns, values):
+            column.append(value)
+        if len(table) >= self.chunksize:
+            self.__write_chunk(table)
+
+    def flush(self):
+        """Write all buffered rows."""
+        for table in self.__tables.values():
+            if len(table):
+                self.__write_chunk(table)
+        self.__file.flush()
+
+    def __write_chunk(self, table):
+        headers = []
+        blobs = []
+        for name, column in table.columns:
+            if sys.byteorder != 'little':
+                column = array.array(column.typecode, column)
+                column.byteswap()
+            blob = zlib.compress(column.tobytes(), self.level)
+            headers.append(_COLUMN.pack(name.encode('ascii'),
+                                        column.typecode.encode('ascii'),
+                                        len(blob)))
+            blobs.append(blob)
+        size = _CHUNK.size + sum(map(len, headers)) + sum(map(len, blobs))
+        f = self.__file
+        f.write(_RECORD.pack(_CHUNK_TAG, size))
+        f.write(_CHUNK.pack(table.table, len(table), len(table.columns)))
+        for header in headers:
+            f.write(header)
+        for blob in blobs:
+            f.write(blob)
+        table.rows += len(table)
+        table.columns = [
+            (name, array.array(column.typecode))
+            for name, column in table.columns
+        ]
+
+
+class ArchiveReader(object):
+    """Reader for archives written by :class:`ArchiveWriter`.
+
+    The file is memory-mapped and only its record headers are parsed
+    when opened; column chunks are decompressed on demand, so queries
+    only touch the chunks and columns they need.
+
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self.__mmap
+        if buf[:len(MAGIC)] != MAGIC:
+            buf.close()
+            raise ValueError('Not a telemetry archive: %s' % path)
+        self.heats = []
+        self.__chunks = {table: [] for table in COLUMNS}
+        offset = len(MAGIC)
+        rows = {table: 0 for table in COLUMNS}
+        while offset + _RECORD.size <= len(buf):
+            tag, size = _RECORD.unpack_from(buf, offset)
+            offset += _RECORD.size
+            if offset + size > len(buf):
+                break  # incomplete record, e.g. after a crash
+            if tag == _CHUNK_TAG:
+                table, nrows, ncolumns = _CHUNK.unpack_from(buf, offset)
+                pos = offset + _CHUNK.size
+                data = pos + ncolumns * _COLUMN.size
+                columns = {}
+                for _ in range(ncolumns):
+                    name, code, length = _COLUMN.unpack_from(buf, pos)
+                    name = name.rstrip(b'\0').decode('ascii')
+                    columns[name] = (code.decode('ascii'), data, length)
+                    pos += _COLUMN.size
+                    data += length
+                if table in self.__chunks:
+                    self.__chunks[table].append((rows[table], nrows, columns))
+                    rows[table] += nrows
+            elif tag == _HEAT_TAG:
+                payload = bytes(buf[offset:offset + size])
+                entry = json.loads(payload.decode('utf-8'))
+                self.heats.append(Heat(
+                    entry['heat'], entry['start'], entry['end'],
+                    entry['names'],
+                    {int(t): tuple(r) for t, r in entry['rows'].items()}
+                ))
+            offset += size
+        self.__rows = rows
+
+    def close(self):
+        """Close the archive."""
+        self.__mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def rows(self, table):
+        """Return the number of rows in `table`."""
+        return self.__rows[table]
+
+    def chunks(self, table, names, start=0, stop=None):
+        """Yield dicts mapping column `names` to :class:`array.array`
+        instances for each chunk of `table` within the given row range.
+
+        """
+        if stop is None:
+            stop = self.__rows[table]
+        for first, nrows, columns in self.__chunks[table]:
+            if first + nrows <= start or first >= stop:
+                continue
+            lo, hi = max(start - first, 0), min(stop - first, nrows)
+            yield {name: self.__column(columns[name])[lo:hi] for name in names}
+
+    def column(self, table, name, heat=None):
+        """Return a column of `table` as a single :class:`array.array`,
+        optionally restricted to the rows of a single `heat`.
+
+        """
+        start, stop = 0, None
+        if heat is not None:
+            start, stop = self.heat(heat).rows[table]
+        result = array.array(dict(COLUMNS[table])[name])
+        for chunk in self.chunks(table, (name,), start, stop):
+            result.extend(chunk[name])
+        return result
+
+    def events(self, heat=None):
+        """Yield ``(hosttime, event)`` tuples of the archived
+        :class:`ControlUnit.Timer` and :class:`ControlUnit.Status`
+        events ordered by host time, optionally restricted to a single
+        `heat`.  Status events precede timer events with the same host
+        time.
+
+        Since the display mode is not archived, status events are
+        restored with a `display` of 8.
+
+        """
+        rows = {TIMERS: (0, None), STATUS: (0, None)}
+        if heat is not None:
+            rows = self.heat(heat).rows
+        # on equal host times, status events come first
+        return heapq.merge(self.__status(*rows[STATUS]),
+                           self.__timers(*rows[TIMERS]), key=itemgetter(0))
+
+    def heat(self, heat):
+        """Return the index entry of `heat`."""
+        for entry in self.heats:
+            if entry.heat == heat:
+                return entry
+        raise KeyError(heat)
+
+    def __timers(self, start, stop):
+        Timer = ControlUnit.Timer
+        names = ('time', 'address', 'timestamp', 'sector')
+        for chunk in self.chunks(TIMERS, names, start, stop):
+            for row in zip(*(chunk[name] for name in names)):
+                yield row[0], Timer(*row[1:])
+
+    def __status(self, start, stop):
+        Status = ControlUnit.Status
+        names = ('time', 'start', 'mode', 'pit') + _FUEL
+        for chunk in self.chunks(STATUS, names, start, stop):
+            for row in zip(*(chunk[name] for name in names)):
+                pit = _PIT_MASKS[row[3]]
+                yield row[0], Status(row[4:], row[1], row[2], pit, 8)
+
+    def __column(self, column):
+        code, offset, length = column
+        values = array.array(code)
+        values.frombytes(zlib.decompress(self.__mmap[offset:offset + length]))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
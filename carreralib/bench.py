@@ -0,0 +1,109 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import collections
+import time
+
+from .connection import TimeoutError
+
+COMMANDS = {
+    b'?': 'poll',
+    b'0': 'version'
+}
+"""Names of the requests issued by :func:`bench`."""
+
+
+def percentiles(values, percents=(50, 90, 99)):
+    """Return the given percentiles of `values` as a :class:`dict`."""
+    values = sorted(values)
+    n = len(values)
+    if not n:
+        return {p: None for p in percents}
+    return {p: values[min(n - 1, int(n * p / 100))] for p in percents}
+
+
+def bench(cu, duration=10.0, version_interval=100, clock=time.monotonic):
+    """Issue requests to `cu` as fast as possible for `duration`
+    seconds and return a report as a :class:`dict`.
+
+    Every `version_interval`-th request is a version request, all
+    others are status polls.  The benchmark ends early if a replayed
+    connection runs out of data.
+
+    """
+    rtts = collections.defaultdict(list)
+    timeouts = collections.Counter()
+    requests = 0
+    cpu = time.process_time()
+    start = clock()
+    while True:
+        sent = clock()
+        if sent - start >= duration:
+            break
+        if (version_interval and
+                requests % version_interval == version_interval - 1):
+            cmd = b'0'
+        else:
+            cmd = b'?'
+        try:
+            cu.request(cmd)
+        except TimeoutError:
+            timeouts[cmd] += 1
+        except EOFError:
+            break
+        else:
+            rtts[cmd].append(clock() - sent)
+        requests += 1
+    elapsed = clock() - start
+    cpu = time.process_time() - cpu
+    commands = {}
+    for cmd, name in COMMANDS.items():
+        values = rtts[cmd]
+        if not values and not timeouts[cmd]:
+            continue
+        stats = percentiles(values, (50, 90, 99))
+        commands[name] = {
+            'count': len(values) + timeouts[cmd],
+            'timeouts': timeouts[cmd],
+            'rtt_min': min(values) if values else None,
+            'rtt_mean': sum(values) / len(values) if values else None,
+            'rtt_p50': stats[50],
+            'rtt_p90': stats[90],
+            'rtt_p99': stats[99],
+            'rtt_max': max(values) if values else None
+        }
+    total = sum(timeouts.values())
+    return {
+        'duration': elapsed,
+        'requests': requests,
+        'rate': requests / elapsed if elapsed else None,
+        'timeouts': total,
+        'timeout_rate': total / requests if requests else None,
+        'cpu': cpu,
+        'cpu_per_request': cpu / requests if requests else None,
+        'commands': commands
+    }
+
+
+def format_report(report):
+    """Format a report returned by :func:`bench` as text."""
+    def ms(value):
+        return '%.3f' % (value * 1000) if value is not None else 'n/a'
+    lines = [
+        'Requests:      %d in %.1f s' % (report['requests'],
+                                         report['duration']),
+        'Poll rate:     %.1f requests/s' % (report['rate'] or 0),
+        'Timeouts:      %d (%.2f%%)' % (report['timeouts'],
+                                        100 * (report['timeout_rate'] or 0)),
+        'CPU/request:   %s ms' % ms(report['cpu_per_request']),
+        '',
+        '%-10s%8s%8s%10s%10s%10s%10s%10s' % (
+            'Command', 'Count', 'Timeout', 'Min', 'Mean', 'P50', 'P99', 'Max'
+        )
+    ]
+    for name, stats in sorted(report['commands'].items()):
+        lines.append('%-10s%8d%8d%10s%10s%10s%10s%10s' % (
+            name, stats['count'], stats['timeouts'], ms(stats['rtt_min']),
+            ms(stats['rtt_mean']), ms(stats['rtt_p50']),
+            ms(stats['rtt_p99']), ms(stats['rtt_max'])
+        ))
+    return '\n'.join(lines)
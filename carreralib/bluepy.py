@@ -1,11 +1,11 @@
 from __future__ import absolute_import, division, unicode_literals
 
-import collections
 import logging
 
 from bluepy import btle
 
 from .connection import BufferTooShort, Connection, TimeoutError
+from .framing import FrameAssembler
 
 SERVICE_UUID = '39df7777-b1b4-b90b-57f1-7144ae4e4a6a'
 OUTPUT_UUID = '39df8888-b1b4-b90b-57f1-7144ae4e4a6a'
@@ -16,18 +16,12 @@ logger = logging.getLogger(__name__)
 
 class BluepyDelegate(btle.DefaultDelegate):
 
-    def __init__(self, sequence):
-        self.__sequence = sequence
+    def __init__(self, assembler):
+        self.__assembler = assembler
 
     def handleNotification(self, handle, data):
         logger.debug('Received notification message %r', data)
-        # BLE notifications ending with '$' do not start with command letter
-        if not data.endswith(b'$'):
-            self.__sequence.append(data)
-        elif len(data) == 6:
-            self.__sequence.append(b'0' + data[:-1])
-        else:
-            self.__sequence.append(b'?' + data[:-1])
+        self.__assembler.feed(data)
 
 
 class BluepyConnection(Connection):
@@ -38,8 +32,9 @@ class BluepyConnection(Connection):
         except Exception:
             self.__peripheral = None
             raise
-        self.__data = collections.deque()
-        self.__delegate = BluepyDelegate(self.__data)
+        self.__assembler = FrameAssembler()
+        self.__data = self.__assembler.frames
+        self.__delegate = BluepyDelegate(self.__assembler)
         self.__peripheral.setDelegate(self.__delegate)
         # FIXME: hard-coded handle 0x000f, should be characteristic UUID 2902
         self.__peripheral.writeCharacteristic(0x000f, b'\x03', False)
@@ -58,14 +53,17 @@ class BluepyConnection(Connection):
                 self.__peripheral = None
 
     def recv(self, maxlength=None):
-        if self.__data:
-            buf = self.__data.popleft()
-        elif self.__peripheral.waitForNotifications(self.__timeout):
-            buf = self.__data.popleft()
-        else:
-            raise TimeoutError('Timeout waiting for Bluetooth notification')
+        # a notification may only hold part of a response
+        while not self.__data:
+            if not self.__peripheral.waitForNotifications(self.__timeout):
+                raise TimeoutError(
+                    'Timeout waiting for Bluetooth notification'
+                )
+        buf = self.__data.popleft()
         if maxlength is not None and maxlength < len(buf):
             raise BufferTooShort('Buffer too short for data received')
+        # notifications are only fed to the assembler while waiting
+        # here, so the frame stays valid until the next call
         return buf
 
     def send(self, buf, offset=0, size=None):
@@ -0,0 +1,163 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import time
+from collections import deque, namedtuple
+
+WRAP = 1 << 32
+"""Modulus of the CU's 32-bit millisecond timer."""
+
+RESET_TOLERANCE = 60000
+"""Backward jump in CU time, in milliseconds, taken as a timer reset."""
+
+TimedEvent = namedtuple('TimedEvent', 'event hosttime')
+
+
+def _monotonic():
+    try:
+        return time.monotonic()
+    except AttributeError:
+        return time.time()
+
+
+class ClockSync(object):
+    """Map CU timer time stamps to host monotonic time.
+
+    The CU reports the time at which a car was detected as a 32-bit
+    millisecond counter, which is reset by :meth:`ControlUnit.reset`
+    and wraps around after about 49 days.  Every timer event received
+    at host time `received` yields an upper bound for the clock
+    offset, since the event cannot be delivered before it happened.
+    The minimum of these bounds is tracked per `block` seconds of CU
+    time, and a line fitted to the lower envelope of the last `blocks`
+    minima gives offset and drift.  Resetting the CU timer anchors the
+    offset to the round trip of the reset request.
+
+    The detection-to-delivery latencies of the last `samples` timer
+    events are kept in :attr:`latencies` for :meth:`percentiles`.
+    Since the offset follows the lower envelope, these are latencies
+    in excess of the fastest delivery observed, so their minimum is
+    always about zero; they do not include the constant part of the
+    latency, which cannot be measured from the host.
+
+    """
+
+    def __init__(self, clock=_monotonic, block=10.0, blocks=32,
+                 samples=1024):
+        self.clock = clock
+        self.block = block
+        self.latencies = deque(maxlen=samples)
+        self.__minima = deque(maxlen=blocks)
+        self.reset()
+
+    def reset(self, sent=None, received=None):
+        """Reset the estimate, e.g. after the CU timer has been reset by
+        a request sent at host time `sent` and acknowledged at host
+        time `received`.
+
+        """
+        self.__epoch = 0
+        self.__last = None
+        self.__minima.clear()
+        self.__current = None
+        self.offset = None
+        self.drift = 0.0
+        self.__ref = 0.0
+        if sent is not None and received is not None:
+            self.__minima.append((0.0, (sent + received) / 2))
+            self.__fit()
+
+    def unwrap(self, timestamp):
+        """Return the CU `timestamp` extended beyond 32 bits.
+
+        A large backward jump in CU time is taken as a wraparound if it
+        spans more than half the timer range, or as a timer reset
+        otherwise, which clears the current estimate.
+
+        """
+        last = self.__last
+        if last is not None and timestamp < last:
+            if last - timestamp > WRAP // 2:
+                self.__epoch += 1
+            elif last - timestamp > RESET_TOLERANCE:
+                self.reset()
+            else:
+                return self.__epoch * WRAP + timestamp
+        elif last is not None and timestamp - last > WRAP // 2:
+            # late event from before the last wraparound
+            return (self.__epoch - 1) * WRAP + timestamp
+        self.__last = timestamp
+        return self.__epoch * WRAP + timestamp
+
+    def observe(self, timestamp, received):
+        """Update the estimate from a timer event with CU `timestamp`
+        received at host time `received`, and return its host time.
+
+        """
+        cutime = self.unwrap(timestamp) / 1000
+        bound = received - cutime
+        current = self.__current
+        if current is None or cutime - current[0] >= self.block:
+            self.__current = current = [cutime, bound]
+            self.__minima.append(tuple(current))
+            self.__fit()
+        elif bound < current[1]:
+            current[1] = bound
+            self.__minima[-1] = tuple(current)
+            self.__fit()
+        hosttime = self.__hosttime(cutime)
+        self.latencies.append(received - hosttime)
+        return hosttime
+
+    def hosttime(self, timestamp):
+        """Return the estimated host time for the CU `timestamp`, or
+        :const:`None` if no estimate is available.
+
+        """
+        if self.offset is None:
+            return None
+        last = self.__last
+        epoch = self.__epoch
+        if last is not None and timestamp - last > WRAP // 2:
+            epoch -= 1
+        return self.__hosttime((epoch * WRAP + timestamp) / 1000)
+
+    def annotate(self, event):
+        """Return `event` with the host time of its time stamp, if
+        any.
+
+        """
+        timestamp = getattr(event, 'timestamp', None)
+        if timestamp is None:
+            return TimedEvent(event, None)
+        return TimedEvent(event, self.hosttime(timestamp))
+
+    def percentiles(self, percents=(50, 90, 99)):
+        """Return the given percentiles of detection-to-delivery latency
+        in excess of the fastest delivery in seconds as a :class:`dict`.
+
+        """
+        values = sorted(self.latencies)
+        if not values:
+            return {p: None for p in percents}
+        n = len(values)
+        return {p: values[min(n - 1, int(n * p / 100))] for p in percents}
+
+    def __hosttime(self, cutime):
+        return cutime + self.offset + self.drift * (cutime - self.__ref)
+
+    def __fit(self):
+        minima = self.__minima
+        n = len(minima)
+        if n >= 3:
+            mx = sum(x for x, _ in minima) / n
+            my = sum(y for _, y in minima) / n
+            sxx = sum((x - mx) ** 2 for x, _ in minima)
+            sxy = sum((x - mx) * (y - my) for x, y in minima)
+            drift = sxy / sxx if sxx else 0.0
+        else:
+            drift = 0.0
+        # shift the fitted line down to the lower envelope of the minima
+        ref = minima[-1][0]
+        self.offset = min(y - drift * (x - ref) for x, y in minima)
+        self.drift = drift
+        self.__ref = ref
@@ -29,7 +29,10 @@ class Connection(object):
 
     def recv(self, maxlength=None):
         """Return a complete message of byte data sent from the other
-        end of the connection as a bytes object.
+        end of the connection as a bytes-like object.
+
+        Implementations may return a :class:`memoryview` of their
+        receive buffer, which is only valid until the next call.
 
         """
         raise NotImplementedError
@@ -42,7 +45,13 @@ class Connection(object):
 
 def open(device, **kwargs):
     """Open a connection to the given device."""
-    if len(device.split(':')) == 6:
+    if device.startswith('sim:'):
+        from .simulator import SimulatorConnection
+        return SimulatorConnection(device, **kwargs)
+    elif device.startswith('replay:'):
+        from .replay import ReplayConnection
+        return ReplayConnection(device, **kwargs)
+    elif len(device.split(':')) == 6:
         from .bluepy import BluepyConnection
         return BluepyConnection(device, **kwargs)
     else:
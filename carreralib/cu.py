@@ -1,13 +1,74 @@
 from __future__ import absolute_import, division, unicode_literals
 
 import logging
-from collections import namedtuple
+from collections import OrderedDict, deque, namedtuple
 
 from . import connection
 from . import protocol
 
 logger = logging.getLogger(__name__)
 
+_PIT_MASKS = tuple(
+    tuple(mask & (1 << n) != 0 for n in range(8)) for mask in range(256)
+)
+
+
+class TimerIndex(object):
+    """Bounded index of recently seen timer events.
+
+    Timer events are keyed on `(address, timestamp, sector)`.  Entries
+    are kept for `window` milliseconds of CU time relative to the most
+    recent timestamp seen, and at most `maxsize` entries are kept in
+    total.
+
+    """
+
+    def __init__(self, window=10000, maxsize=256):
+        self.window = window
+        self.maxsize = maxsize
+        self.suppressed = 0
+        self.__keys = set()
+        self.__order = deque()
+        self.__latest = None
+
+    def __contains__(self, timer):
+        return tuple(timer) in self.__keys
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def add(self, timer):
+        """Add `timer` to the index.
+
+        Returns :const:`False` and counts a suppressed duplicate if
+        `timer` has already been seen, :const:`True` otherwise.
+
+        """
+        key = tuple(timer)
+        if key in self.__keys:
+            self.suppressed += 1
+            return False
+        timestamp = key[1]
+        latest = self.__latest
+        if latest is not None and timestamp < latest - self.window:
+            # CU timer was reset or wrapped around
+            self.clear()
+        if self.__latest is None or timestamp > self.__latest:
+            self.__latest = timestamp
+        keys, order = self.__keys, self.__order
+        keys.add(key)
+        order.append(key)
+        expires = self.__latest - self.window
+        while order and (order[0][1] < expires or len(order) > self.maxsize):
+            keys.discard(order.popleft())
+        return True
+
+    def clear(self):
+        """Remove all entries, e.g. after the CU timer was reset."""
+        self.__keys.clear()
+        self.__order.clear()
+        self.__latest = None
+
 
 class ControlUnit(object):
     """Interface to a Carrera Digital 124/132 Control Unit."""
@@ -86,7 +147,16 @@ class ControlUnit(object):
     CODE_KEY = b'T8'
     """Request for emulating the Control Unit's CODE key."""
 
-    def __init__(self, device, **kwargs):
+    def __init__(self, device, dedup_window=10000, clock=None, trace=None,
+                 status_cache=16, **kwargs):
+        self.timers = TimerIndex(dedup_window)
+        self.status_cache = status_cache
+        self.__statuses = OrderedDict()
+        self.clock = clock
+        self.trace = trace
+        self.received = None
+        self.hosttime = None
+        self.__registers = {}
         if isinstance(device, connection.Connection):
             self.__connection = device
         else:
@@ -99,14 +169,66 @@ class ControlUnit(object):
         logger.debug('Closing connection')
         self.__connection.close()
 
+    def apply_profile(self, speed=None, brake=None, fuel=None):
+        """Set speed, brake and fuel values for all controllers.
+
+        Each argument may be a single value applied to all eight
+        controllers, or a sequence of eight values, where :const:`None`
+        leaves a controller unchanged.  Only values that differ from
+        the last ones written are sent, and all requests are pipelined
+        in a single batch.
+
+        """
+        words = []
+        for word, values in ((0, speed), (1, brake), (2, fuel)):
+            if values is None:
+                continue
+            elif isinstance(values, int):
+                values = [values] * 8
+            elif len(values) != 8:
+                raise ValueError('Profile requires eight values')
+            for address, value in enumerate(values):
+                if value is not None:
+                    words.append((word, address, value))
+        return self.setwords(words, repeat=2)
+
     def clrpos(self):
         """Clear/reset the Position Tower display."""
-        self.setword(6, 0, 9)
+        self.setword(6, 0, 9, force=True)
+        self.invalidate(6)
+
+    def invalidate(self, word=None):
+        """Forget the values last written to command `word`, or to all
+        command words if `word` is :const:`None`.
+
+        This should be called if register values may have been changed
+        by other means, e.g. using the CU's keys.
+
+        """
+        if word is None:
+            self.__registers.clear()
+        else:
+            for key in [key for key in self.__registers if key[0] == word]:
+                del self.__registers[key]
 
     def ignore(self, mask):
         """Ignore the controllers represented by bitmask `mask`."""
         self.request(protocol.pack('cBC', b':', mask))
 
+    def poll(self):
+        """Request the CU status or the next timer event.
+
+        Timer events already seen within the de-duplication window are
+        suppressed, in which case :const:`None` is returned.  The number
+        of suppressed duplicates is available as
+        ``self.timers.suppressed``.
+
+        """
+        res = self.request()
+        if isinstance(res, ControlUnit.Timer) and not self.timers.add(res):
+            return None
+        return res
+
     def request(self, buf=b'?', maxlength=None):
         """Send a message to the CU and wait for a response.
 
@@ -115,33 +237,50 @@ class ControlUnit(object):
         depending on whether any timer events are pending.
 
         """
-        logger.debug('Sending message %r', buf)
-        self.__connection.send(buf)
-        while True:
-            res = self.__connection.recv(maxlength)
-            if res.startswith(buf[0:1]):
-                break
-            else:
-                logger.warn('Received unexpected message %r', res)
-        logger.debug('Received message %r', res)
-        if res.startswith(b'?:'):
+        self.__send(buf)
+        res = self.__recv(buf[0:1], maxlength)
+        if self.clock is not None:
+            self.received = self.hosttime = self.clock.clock()
+        if res[0:2] == b'?:':
+            return self.__status(res)
+        elif res[0:1] == b'?':
+            address, timestamp, sector = protocol.unpack('xYIYC', res)
+            if self.clock is not None:
+                self.hosttime = self.clock.observe(timestamp, self.received)
+            return ControlUnit.Timer(address - 1, timestamp, sector)
+        else:
+            return bytes(res)
+
+    def __status(self, res):
+        # the CU keeps reporting identical status frames, so return the
+        # same Status object for these
+        statuses = self.__statuses
+        key = bytes(res)
+        status = statuses.pop(key, None)
+        if status is None:
             # recent CU versions report two extra unknown bytes with '?:'
             try:
                 parts = protocol.unpack('2x8YYYBYC', res)
             except protocol.ChecksumError:
                 parts = protocol.unpack('2x8YYYBYxxC', res)
             fuel, (start, mode, pitmask, display) = parts[:8], parts[8:]
-            pit = tuple(pitmask & (1 << n) != 0 for n in range(8))
-            return ControlUnit.Status(fuel, start, mode, pit, display)
-        elif res.startswith(b'?'):
-            address, timestamp, sector = protocol.unpack('xYIYC', res)
-            return ControlUnit.Timer(address - 1, timestamp, sector)
-        else:
-            return res
+            status = ControlUnit.Status(fuel, start, mode, _PIT_MASKS[pitmask],
+                                        display)
+            if self.status_cache and len(statuses) >= self.status_cache:
+                statuses.popitem(last=False)
+        if self.status_cache:
+            statuses[key] = status
+        return status
 
     def reset(self):
         """Reset the CU timer."""
-        self.request(b'=10')
+        if self.clock is not None:
+            sent = self.clock.clock()
+            self.request(b'=10')
+            self.clock.reset(sent, self.received)
+        else:
+            self.request(b'=10')
+        self.timers.clear()
 
     def setbrake(self, address, value):
         """Set the brake value for controller `address`."""
@@ -176,17 +315,42 @@ class ControlUnit(object):
         """Set the speed value for controller address."""
         self.setword(0, address, value, repeat=2)
 
-    def setword(self, word, address, value, repeat=1):
-        if word < 0 or word > 31:
-            raise ValueError('Command word out of range')
-        if address < 0 or address > 7:
-            raise ValueError('Address out of range')
-        if value < 0 or value > 15:
-            raise ValueError('Value out of range')
-        if repeat < 1 or repeat > 15:
-            raise ValueError('Repeat count out of range')
-        buf = protocol.pack('cBYYC', b'J', word | address << 5, value, repeat)
-        return self.request(buf)
+    def setword(self, word, address, value, repeat=1, force=False):
+        """Write `value` to command `word` for controller `address`.
+
+        The request is skipped if `value` is the value last written to
+        this command word and address, unless `force` is set.
+
+        """
+        buf = self.__setword(word, address, value, repeat)
+        if not force and self.__registers.get((word, address)) == value:
+            return None
+        res = self.request(buf)
+        self.__registers[(word, address)] = value
+        return res
+
+    def setwords(self, words, repeat=1, force=False):
+        """Write a sequence of `(word, address, value)` items.
+
+        Items are skipped if their value is the value last written to
+        the same command word and address, unless `force` is set.  The
+        remaining requests are sent as a single pipelined batch before
+        waiting for the responses.  Returns the number of requests
+        sent.
+
+        """
+        registers = self.__registers
+        items = []
+        for word, address, value in words:
+            buf = self.__setword(word, address, value, repeat)
+            if force or registers.get((word, address)) != value:
+                items.append((buf, (word, address), value))
+        for buf, _, _ in items:
+            self.__send(buf)
+        for buf, key, value in items:
+            self.__recv(buf[0:1])
+            registers[key] = value
+        return len(items)
 
     def start(self):
         """Initiate the CU start sequence."""
@@ -195,3 +359,35 @@ class ControlUnit(object):
     def version(self):
         """Retrieve the CU version."""
         return protocol.unpack('x4sC', self.request(b'0'))[0]
+
+    def __send(self, buf):
+        logger.debug('Sending message %r', buf)
+        self.__connection.send(buf)
+        if self.trace is not None:
+            self.trace.send(buf)
+
+    def __recv(self, prefix, maxlength=None):
+        while True:
+            res = self.__connection.recv(maxlength)
+            if self.trace is not None:
+                self.trace.recv(res)
+            # connections may return a view of their receive buffer
+            if res[0:len(prefix)] == prefix:
+                break
+            else:
+                logger.warning('Received unexpected message %r', bytes(res))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Received message %r', bytes(res))
+        return res
+
+    @staticmethod
+    def __setword(word, address, value, repeat):
+        if word < 0 or word > 31:
+            raise ValueError('Command word out of range')
+        if address < 0 or address > 7:
+            raise ValueError('Address out of range')
+        if value < 0 or value > 15:
+            raise ValueError('Value out of range')
+        if repeat < 1 or repeat > 15:
+            raise ValueError('Repeat count out of range')
+        return protocol.pack('cBYYC', b'J', word | address << 5, value, repeat)
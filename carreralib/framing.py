@@ -0,0 +1,86 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import collections
+
+_DELIMITER = ord('$')
+
+_VERSION_PREFIX = ord('0')
+
+_DEFAULT_PREFIX = ord('?')
+
+
+class FrameAssembler(object):
+    """Reassemble CU responses from Bluetooth LE notifications.
+
+    Responses are terminated by ``$``, but lack their command letter,
+    which is inferred from the response length.  Notification data is
+    copied once into a reusable buffer, and each complete response is
+    appended to :attr:`frames` as a :class:`memoryview` of the buffer,
+    with the command letter written into the byte preceding it, i.e.
+    where the previous response's ``$`` used to be.  A response may
+    span several notifications, and a notification may hold several
+    responses.
+
+    A notification without ``$`` that is shorter than `fragment_size`,
+    the maximum notification payload, is taken to be a complete
+    response by itself if no partial response is pending.
+
+    Frames removed from :attr:`frames` remain valid until the next
+    call to :meth:`feed`.
+
+    """
+
+    def __init__(self, size=4096, fragment_size=20):
+        self.frames = collections.deque()
+        self.fragment_size = fragment_size
+        self.__size = size
+        self.__buf = bytearray(size)
+        self.__start = None  # index of pending response's command letter
+        self.__end = 0
+
+    def clear(self):
+        """Discard all pending data and frames."""
+        self.frames.clear()
+        self.__start = None
+        self.__end = 0
+
+    def feed(self, data):
+        """Add the data of a notification."""
+        start = self.__start
+        if start is None:
+            if _DELIMITER not in data and len(data) < self.fragment_size:
+                self.frames.append(data)
+                return
+            if not self.frames:
+                # all frames consumed, so the buffer can be reused
+                self.__end = 0
+            start = self.__end
+            needed = len(data) + 1
+        else:
+            needed = self.__end - start + len(data)
+        buf = self.__buf
+        if start + needed > len(buf):
+            if self.frames or needed > len(buf):
+                # frames still refer to the current buffer
+                buf = bytearray(max(self.__size, 2 * needed))
+            pending = self.__end - start if self.__start is not None else 0
+            buf[0:pending] = self.__buf[start:start + pending]
+            self.__buf = buf
+            start, self.__end = 0, pending
+        if self.__start is None:
+            self.__end = start + 1
+        end = self.__end + len(data)
+        buf[self.__end:end] = data
+        view = memoryview(buf)
+        while True:
+            pos = buf.find(b'$', start + 1, end)
+            if pos < 0:
+                break
+            if pos - start - 1 == 5:
+                buf[start] = _VERSION_PREFIX
+            else:
+                buf[start] = _DEFAULT_PREFIX
+            self.frames.append(view[start:pos])
+            start = pos
+        self.__end = end
+        self.__start = start if start + 1 < end else None
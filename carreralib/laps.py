@@ -0,0 +1,106 @@
+from __future__ import absolute_import, division, unicode_literals
+
+from array import array
+
+
+class LapRecord(object):
+    """Compact lap time storage with running statistics.
+
+    Lap times, the time stamps at which laps were completed and the
+    sectors reporting them are kept in :class:`array.array` columns.
+    Totals, best lap, mean and variance of all laps as well as of the
+    last `window` laps are updated in constant time per lap.
+
+    """
+
+    def __init__(self, window=5):
+        if window < 1:
+            raise ValueError('Window size out of range')
+        self.window = window
+        self.clear()
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return iter(self.times)
+
+    def __getitem__(self, index):
+        return self.times[index]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.times.tolist())
+
+    def append(self, time, timestamp=0, sector=1):
+        """Record a lap of `time` milliseconds completed at `timestamp`."""
+        times = self.times
+        times.append(time)
+        self.timestamps.append(timestamp)
+        self.sectors.append(sector)
+        self.total += time
+        self.__sumsq += time * time
+        if self.best is None or time < self.best:
+            self.best = time
+        self.__rsum += time
+        self.__rsumsq += time * time
+        if len(times) > self.window:
+            old = times[-self.window - 1]
+            self.__rsum -= old
+            self.__rsumsq -= old * old
+
+    def clear(self):
+        """Remove all laps."""
+        self.times = array('I')
+        self.timestamps = array('I')
+        self.sectors = array('B')
+        self.total = 0
+        self.best = None
+        self.__sumsq = 0
+        self.__rsum = 0
+        self.__rsumsq = 0
+
+    def tolist(self):
+        """Return the lap times as a list."""
+        return self.times.tolist()
+
+    @property
+    def last(self):
+        """The most recent lap time, or :const:`None`."""
+        return self.times[-1] if self.times else None
+
+    @property
+    def mean(self):
+        """The mean lap time, or :const:`None`."""
+        n = len(self.times)
+        return self.total / n if n else None
+
+    @property
+    def variance(self):
+        """The population variance of all lap times, or :const:`None`."""
+        return _variance(len(self.times), self.total, self.__sumsq)
+
+    @property
+    def rolling_total(self):
+        """The sum of the last `window` lap times."""
+        return self.__rsum
+
+    @property
+    def rolling_mean(self):
+        """The mean of the last `window` lap times, or :const:`None`."""
+        n = min(len(self.times), self.window)
+        return self.__rsum / n if n else None
+
+    @property
+    def rolling_variance(self):
+        """The population variance of the last `window` lap times, or
+        :const:`None`.
+
+        """
+        n = min(len(self.times), self.window)
+        return _variance(n, self.__rsum, self.__rsumsq)
+
+
+def _variance(n, total, sumsq):
+    if not n:
+        return None
+    return (sumsq - total * total / n) / n
@@ -0,0 +1,88 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import errno
+import json
+import logging
+import os
+import socket
+
+DEFAULT_ADDRESS = '/tmp/carreralib-live.sock'
+"""Default path of the Unix datagram socket used for live events."""
+
+MAX_EVENT_SIZE = 8192
+"""Maximum size of a single encoded live event in bytes."""
+
+logger = logging.getLogger(__name__)
+
+
+class LivePublisher(object):
+    """Publish live race events to a local Unix datagram socket.
+
+    Events are encoded as JSON objects with a ``type`` key and sent
+    without blocking.  If no subscriber is listening or the socket
+    buffer is full, events are silently dropped, so publishing never
+    delays the race loop.
+
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.__address = address
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.__socket.setblocking(False)
+        self.dropped = 0
+
+    def close(self):
+        """Close the publisher socket."""
+        self.__socket.close()
+
+    def publish(self, type, **fields):
+        """Publish an event of the given `type` with additional `fields`."""
+        fields['type'] = type
+        data = json.dumps(fields, separators=(',', ':')).encode('utf-8')
+        try:
+            self.__socket.sendto(data, self.__address)
+        except (IOError, OSError) as e:
+            if e.errno not in (errno.ENOENT, errno.ECONNREFUSED,
+                               errno.EAGAIN, errno.EWOULDBLOCK):
+                logger.warning('Failed to publish live event: %s', e)
+            self.dropped += 1
+            return False
+        return True
+
+
+class LiveSubscriber(object):
+    """Receive live race events published by :class:`LivePublisher`."""
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        if os.path.exists(address):
+            os.unlink(address)
+        self.__address = address
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.__socket.bind(address)
+
+    def close(self):
+        """Close the subscriber socket and remove its address."""
+        self.__socket.close()
+        try:
+            os.unlink(self.__address)
+        except OSError:
+            pass
+
+    def fileno(self):
+        return self.__socket.fileno()
+
+    def recv(self, timeout=None):
+        """Return the next event as a :class:`dict`, or :const:`None` if
+        `timeout` expires.
+
+        """
+        self.__socket.settimeout(timeout)
+        try:
+            data = self.__socket.recv(MAX_EVENT_SIZE)
+        except socket.timeout:
+            return None
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError:
+            logger.warning('Received malformed live event %r', data)
+            return None
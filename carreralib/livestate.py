@@ -0,0 +1,171 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+
+MAGIC = b'CRLS'
+
+VERSION = 1
+
+NCARS = 8
+
+DEFAULT_PATH = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'carreralib-live'
+)
+"""Default path of the memory-mapped live state segment."""
+
+# sequence, magic, version, start light, mode, number of cars
+_HEADER = struct.Struct('<I4sHBBB3x')
+
+# name, laps, last lap, best lap, total time, position, fuel, pits, flags
+_CAR = struct.Struct('<16sIIIIBBBB')
+
+_PIT_FLAG = 0x1
+
+_FINISHED_FLAG = 0x2
+
+_NONE = 0xffffffff
+
+SIZE = _HEADER.size + NCARS * _CAR.size
+"""Size of the live state segment in bytes."""
+
+
+class CarState(namedtuple('CarState', 'name laps last best total position '
+                                      'fuel pits pit finished')):
+    """Live state of a single car.
+
+    Lap times are given in milliseconds, or :const:`None` if not
+    available.  A `position` of zero means the car is not ranked.
+
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, name='', laps=0, last=None, best=None, total=None,
+                position=0, fuel=0, pits=0, pit=False, finished=False):
+        return super(CarState, cls).__new__(
+            cls, name, laps, last, best, total, position, fuel, pits, pit,
+            finished
+        )
+
+
+LiveState = namedtuple('LiveState', 'start mode cars')
+
+
+def _encode(value):
+    return _NONE if value is None else value
+
+
+def _decode(value):
+    return None if value == _NONE else value
+
+
+class LiveStateWriter(object):
+    """Writer for a fixed-layout, memory-mapped live race state segment.
+
+    Updates are protected by a sequence lock: the sequence number is
+    odd while an update is in progress, so readers never observe a
+    partially written state.  There must only be a single writer.
+
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SIZE)
+            self.__mmap = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        self.__path = path
+        self.__seq = 0
+        _HEADER.pack_into(self.__mmap, 0, 0, MAGIC, VERSION, 0, 0, 0)
+
+    def close(self, unlink=False):
+        """Close the segment, and optionally remove it."""
+        self.__mmap.close()
+        if unlink:
+            os.unlink(self.__path)
+
+    def write(self, start, mode, cars):
+        """Write the start light, mode and state of up to eight cars."""
+        if len(cars) > NCARS:
+            raise ValueError('Too many cars')
+        buf = self.__mmap
+        self.__seq += 1
+        struct.pack_into('<I', buf, 0, self.__seq & 0xffffffff)
+        for n, car in enumerate(cars):
+            flags = (_PIT_FLAG if car.pit else 0)
+            flags |= (_FINISHED_FLAG if car.finished else 0)
+            _CAR.pack_into(
+                buf, _HEADER.size + n * _CAR.size,
+                car.name.encode('utf-8')[:16], car.laps, _encode(car.last),
+                _encode(car.best), _encode(car.total), car.position,
+                car.fuel, car.pits, flags
+            )
+        # publish the header while the sequence is still odd, then
+        # make it even with a separate write
+        _HEADER.pack_into(buf, 0, self.__seq & 0xffffffff, MAGIC, VERSION,
+                          start, mode, len(cars))
+        self.__seq += 1
+        struct.pack_into('<I', buf, 0, self.__seq & 0xffffffff)
+
+
+class LiveStateReader(object):
+    """Reader for a live race state segment created by
+    :class:`LiveStateWriter`.
+
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.__mmap = mmap.mmap(fd, SIZE, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        if _HEADER.unpack_from(self.__mmap, 0)[1] != MAGIC:
+            self.__mmap.close()
+            raise ValueError('Not a live state segment: %s' % path)
+
+    def close(self):
+        """Close the segment."""
+        self.__mmap.close()
+
+    def sequence(self):
+        """Return the current sequence number, which changes with every
+        update and may be used to detect changes cheaply.
+
+        """
+        return struct.unpack_from('<I', self.__mmap, 0)[0]
+
+    def snapshot(self, maxretries=100000):
+        """Return a consistent :class:`LiveState` snapshot, or
+        :const:`None` if none could be read within `maxretries`
+        attempts, e.g. because the writer died during an update.
+
+        """
+        buf = self.__mmap
+        for retries in range(1, maxretries + 1):
+            seq, _, _, start, mode, ncars = _HEADER.unpack_from(buf, 0)
+            if not seq & 1:
+                ncars = min(ncars, NCARS)
+                cars = tuple(self.__car(buf, n) for n in range(ncars))
+                if struct.unpack_from('<I', buf, 0)[0] == seq:
+                    return LiveState(start, mode, cars)
+            if retries % 100 == 0:
+                time.sleep(0)
+        return None
+
+    @staticmethod
+    def __car(buf, n):
+        name, laps, last, best, total, pos, fuel, pits, flags = \
+            _CAR.unpack_from(buf, _HEADER.size + n * _CAR.size)
+        return CarState(
+            name.rstrip(b'\0').decode('utf-8', 'replace'), laps,
+            _decode(last), _decode(best), _decode(total), pos, fuel, pits,
+            bool(flags & _PIT_FLAG), bool(flags & _FINISHED_FLAG)
+        )
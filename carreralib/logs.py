@@ -0,0 +1,169 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import collections
+import logging
+import logging.handlers
+import queue
+import struct
+import threading
+import time
+
+TRACE_SEND = 0
+"""Trace record direction for messages sent to the CU."""
+
+TRACE_RECV = 1
+"""Trace record direction for messages received from the CU."""
+
+_TRACE_MAGIC = b'CRLT\x01\x00\x00\x00'
+
+# host time, direction, payload length
+_TRACE_RECORD = struct.Struct('<dBH')
+
+
+class RateLimitFilter(logging.Filter):
+    """Suppress repeated log messages.
+
+    Records are grouped by logger, level and unformatted message.  At
+    most `burst` records of a group pass per `interval` seconds; the
+    number of records suppressed is appended to the next record of the
+    group that passes.  At most `maxkeys` groups are tracked.
+
+    """
+
+    def __init__(self, interval=10.0, burst=1, maxkeys=256,
+                 clock=time.monotonic):
+        logging.Filter.__init__(self)
+        self.interval = interval
+        self.burst = burst
+        self.maxkeys = maxkeys
+        self.clock = clock
+        self.suppressed = 0
+        self.__groups = collections.OrderedDict()
+        # filters run outside the handler lock
+        self.__lock = threading.Lock()
+
+    def filter(self, record):
+        with self.__lock:
+            return self.__filter(record)
+
+    def __filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = self.clock()
+        groups = self.__groups
+        group = groups.get(key)
+        if group is None or now - group[0] >= self.interval:
+            count = group[2] if group is not None else 0
+            groups[key] = [now, 1, 0]
+            groups.move_to_end(key)
+            while len(groups) > self.maxkeys:
+                groups.popitem(last=False)
+            if count:
+                record.msg = '%s (%d similar messages suppressed)' % (
+                    record.getMessage(), count
+                )
+                record.args = None
+            return True
+        elif group[1] < self.burst:
+            group[1] += 1
+            return True
+        else:
+            group[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the
+    queue is full.
+
+    """
+
+    def __init__(self, queue):
+        logging.handlers.QueueHandler.__init__(self, queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure(filename, level=logging.INFO, format='%(message)s',
+              interval=10.0, burst=1, maxsize=10000):
+    """Configure root logging to write to `filename` from a background
+    thread, with repeated messages rate limited.
+
+    Returns the :class:`logging.handlers.QueueListener`, which should
+    be stopped on exit to flush pending records.
+
+    """
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter(format))
+    listener = logging.handlers.QueueListener(
+        queue.Queue(maxsize), handler, respect_handler_level=True
+    )
+    qhandler = QueueHandler(listener.queue)
+    qhandler.addFilter(RateLimitFilter(interval, burst))
+    root = logging.getLogger()
+    root.addHandler(qhandler)
+    root.setLevel(level)
+    listener.start()
+    return listener
+
+
+class TraceWriter(object):
+    """Compact binary trace of messages exchanged with the CU.
+
+    Each record holds the host time, direction and raw message bytes.
+    Records are buffered and written in blocks of `buffering` bytes.
+
+    """
+
+    def __init__(self, filename, clock=time.monotonic, buffering=65536):
+        self.clock = clock
+        self.__file = open(filename, 'wb', buffering)
+        self.__file.write(_TRACE_MAGIC)
+
+    def close(self):
+        """Flush and close the trace file."""
+        self.__file.close()
+
+    def flush(self):
+        """Flush buffered records to the trace file."""
+        self.__file.flush()
+
+    def write(self, direction, data, time=None):
+        """Write a trace record."""
+        if time is None:
+            time = self.clock()
+        self.__file.write(_TRACE_RECORD.pack(time, direction, len(data)))
+        self.__file.write(data)
+
+    def send(self, data):
+        """Trace a message sent to the CU."""
+        self.write(TRACE_SEND, data)
+
+    def recv(self, data):
+        """Trace a message received from the CU."""
+        self.write(TRACE_RECV, data)
+
+
+def read_trace(filename):
+    """Iterate over the `(time, direction, data)` records of a trace
+    file written by :class:`TraceWriter`.
+
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(_TRACE_MAGIC)) != _TRACE_MAGIC:
+            raise ValueError('Not a trace file: %s' % filename)
+        size = _TRACE_RECORD.size
+        while True:
+            header = f.read(size)
+            if len(header) < size:
+                break
+            time, direction, length = _TRACE_RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            yield time, direction, data
@@ -0,0 +1,151 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import logging
+import queue
+import time
+
+from .cu import ControlUnit
+from .ring import RESET, Reset, RingWriter
+
+logger = logging.getLogger(__name__)
+
+
+def run_io(cu, writer, commands, stop, clock=time.monotonic):
+    """Poll `cu` and write all events to the ring buffer `writer` until
+    `stop` is set.
+
+    `commands` is a queue of tuples naming a :class:`ControlUnit`
+    method and its arguments, which are executed between polls.  A
+    ``reset`` command also writes :const:`carreralib.ring.RESET`, so
+    consumers can reset their state in step with the Control Unit.
+    Commands still pending when `stop` is set are executed before
+    returning.
+
+    """
+    while not stop.is_set():
+        execute(cu, writer, commands, clock)
+        event = cu.poll()
+        if event is not None:
+            hosttime = cu.hosttime if cu.hosttime is not None else clock()
+            writer.write(event, hosttime)
+    execute(cu, writer, commands, clock)
+
+
+def execute(cu, writer, commands, clock=time.monotonic):
+    while True:
+        try:
+            command = commands.get_nowait()
+        except queue.Empty:
+            return
+        name, args = command[0], command[1:]
+        if name == 'reset':
+            writer.write(RESET, clock())
+        try:
+            getattr(cu, name)(*args)
+        except Exception as e:
+            logger.error('Command %r failed', command, exc_info=e)
+
+
+def io_process(device, path, commands, stop, ready, capacity=4096, trace=None,
+               spans=None, **kwargs):
+    """Process entry point owning the Control Unit at `device`.
+
+    `ready` is set once the ring buffer at `path` has been created and
+    the Control Unit responded.  If `trace` is given, all messages are
+    traced to this file.  If `spans` is given, Control Unit requests
+    are timed as span ``request`` of this
+    :class:`carreralib.profiling.Spans` instance.  Additional keyword
+    arguments are passed to :class:`ControlUnit`.
+
+    """
+    from .clock import ClockSync
+    from .logs import TraceWriter
+
+    writer = RingWriter(path, capacity)
+    tracer = TraceWriter(trace) if trace else None
+    kwargs.setdefault('clock', ClockSync())
+    cu = ControlUnit(device, trace=tracer, **kwargs)
+    if spans is not None:
+        cu.request = spans.wrap('request', cu.request)
+    try:
+        cu.version()
+        ready.set()
+        run_io(cu, writer, commands, stop)
+    finally:
+        cu.close()
+        writer.close()
+        if tracer:
+            tracer.close()
+
+
+class RemoteControlUnit(object):
+    """Control Unit proxy for consumers of a ring buffer.
+
+    Events are read from a :class:`carreralib.ring.RingReader`, and
+    commands are sent to the process owning the Control Unit through
+    the `commands` queue.  Only the subset of :class:`ControlUnit`
+    methods used by race management applications is supported.  If
+    given, `alive` is called when no events are pending and should
+    return false once the Control Unit process has terminated.
+
+    """
+
+    def __init__(self, reader, commands, alive=None, interval=0.005):
+        self.reader = reader
+        self.commands = commands
+        self.alive = alive
+        self.interval = interval
+        self.status = None
+        self.hosttime = None
+        self.__events = []
+
+    def poll(self):
+        """Return the next event, or :const:`None` if none is pending.
+
+        The event's host time is available as :attr:`hosttime`.  Since
+        commands are executed asynchronously, a :class:`Reset` marker
+        is returned once the Control Unit has been reset, separating
+        the events of the previous race from those of the next one.
+
+        """
+        if not self.__events:
+            self.__events = list(reversed(self.reader.read()))
+            if not self.__events:
+                if self.alive is not None and not self.alive():
+                    raise IOError('Control Unit process terminated')
+                time.sleep(self.interval)
+                return None
+        event, self.hosttime = self.__events.pop()
+        if isinstance(event, ControlUnit.Status):
+            self.status = event
+        return event
+
+    def request(self, buf=None, maxlength=None):
+        """Return the next :class:`ControlUnit.Status` event.
+
+        Other events are dropped, except for :class:`Reset` markers,
+        which are returned by the following calls to :meth:`poll`.
+
+        """
+        if buf is not None:
+            raise ValueError('Only status requests are supported')
+        resets = []
+        while True:
+            event = self.poll()
+            if isinstance(event, Reset):
+                resets.append((event, self.hosttime))
+            elif isinstance(event, ControlUnit.Status):
+                self.__events.extend(reversed(resets))
+                return event
+
+    def command(self, name, *args):
+        self.commands.put((name,) + args)
+
+    def reset(self):
+        self.command('reset')
+
+    def start(self):
+        self.command('start')
+
+    def close(self):
+        self.reader.close()
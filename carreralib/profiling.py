@@ -0,0 +1,233 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import cProfile
+import collections
+import functools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Span(object):
+
+    __slots__ = ('spans', 'name', 'start')
+
+    def __init__(self, spans, name):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.spans.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.spans.add(self.name, self.spans.clock() - self.start)
+
+
+class Spans(object):
+    """Lightweight timing of named code spans.
+
+    For each name, the number of calls, the total and the maximum
+    time spent are recorded.  Use :meth:`span` as a context manager,
+    or :meth:`wrap` to time every call of a function.
+
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.__stats = {}
+
+    def span(self, name):
+        """Return a context manager timing the span `name`."""
+        return _Span(self, name)
+
+    def wrap(self, name, func):
+        """Return a wrapper timing each call of `func` as span `name`."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = self.clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, self.clock() - start)
+        return wrapper
+
+    def add(self, name, elapsed):
+        """Record `elapsed` seconds spent in span `name`."""
+        stats = self.__stats.get(name)
+        if stats is None:
+            self.__stats[name] = [1, elapsed, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            if elapsed > stats[2]:
+                stats[2] = elapsed
+
+    def clear(self):
+        """Discard all recorded spans."""
+        self.__stats.clear()
+
+    def report(self):
+        """Return a :class:`dict` mapping span names to their count,
+        total, mean and maximum time in seconds.
+
+        """
+        return {
+            name: {'count': count, 'total': total, 'mean': total / count,
+                   'max': max_}
+            for name, (count, total, max_) in self.__stats.items()
+        }
+
+    def format(self):
+        """Format :meth:`report` as text, most expensive spans first."""
+        report = sorted(self.report().items(),
+                        key=lambda item: -item[1]['total'])
+        return '\n'.join(
+            '%-16s%10d calls%10.3f s total%10.3f ms mean%10.3f ms max' % (
+                name, stats['count'], stats['total'], stats['mean'] * 1000,
+                stats['max'] * 1000
+            ) for name, stats in report
+        )
+
+
+spans = Spans()
+"""Default :class:`Spans` instance."""
+
+
+class SamplingProfiler(object):
+    """Statistical profiler sampling the stack of a single thread.
+
+    A background thread records the stack of the profiled thread every
+    `interval` seconds, so the overhead is independent of the code
+    being profiled.  Stacks are written in the "collapsed" format
+    understood by flame graph tools, e.g. ``flamegraph.pl`` or
+    speedscope.
+
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.current_thread().ident
+        self.stacks = collections.Counter()
+        self.__labels = {}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    @property
+    def running(self):
+        return self.__thread is not None
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name='profiler',
+                                         daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def dump(self, path):
+        """Write all stacks sampled so far in collapsed format."""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write('%s %d\n' % (stack, count))
+
+    def __run(self):
+        labels = self.__labels
+        while not self.__stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = '%s:%s:%d' % (
+                        os.path.basename(code.co_filename), code.co_name,
+                        code.co_firstlineno
+                    )
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+
+class CProfiler(object):
+    """Deterministic profiler using :mod:`cProfile`, writing statistics
+    in :mod:`pstats` format.
+
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.running = False
+
+    def start(self):
+        self.profile.enable()
+        self.running = True
+
+    def stop(self):
+        self.profile.disable()
+        self.running = False
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+class ProfileToggle(object):
+    """Start and stop profiling on demand, e.g. on a keypress or
+    signal.
+
+    `mode` is either ``sample`` for :class:`SamplingProfiler`, which
+    writes ``.collapsed`` files, or ``cprofile`` for
+    :class:`CProfiler`, which writes ``.prof`` files.  Files are
+    written to `directory`, named after the time profiling started.
+
+    """
+
+    def __init__(self, mode='sample', directory='.', interval=0.005):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError('Invalid profiling mode: %r' % mode)
+        self.mode = mode
+        self.directory = directory
+        self.interval = interval
+        self.profiler = None
+        self.__started = None
+
+    @property
+    def running(self):
+        return self.profiler is not None
+
+    def toggle(self):
+        """Start profiling, or stop it and return the path of the
+        profile written.
+
+        """
+        if self.profiler is None:
+            if self.mode == 'sample':
+                self.profiler = SamplingProfiler(self.interval)
+            else:
+                self.profiler = CProfiler()
+            self.__started = time.strftime('%Y%m%d-%H%M%S')
+            self.profiler.start()
+            logger.info('Profiling started')
+            return None
+        profiler, self.profiler = self.profiler, None
+        profiler.stop()
+        ext = 'collapsed' if self.mode == 'sample' else 'prof'
+        path = os.path.join(self.directory, 'profile-%s-%d.%s' % (
+            self.__started, os.getpid(), ext
+        ))
+        profiler.dump(path)
+        logger.info('Profile written to %s', path)
+        return path
+
+    def install(self, signum=signal.SIGUSR1):
+        """Toggle profiling whenever the process receives `signum`."""
+        signal.signal(signum, lambda signum, frame: self.toggle())
@@ -1,6 +1,13 @@
 from __future__ import absolute_import, division, unicode_literals
 
+import array
 import re
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class ProtocolError(Exception):
@@ -13,6 +20,15 @@ class ChecksumError(Exception):
     pass
 
 
+TimerColumns = namedtuple('TimerColumns',
+                          'frame address timestamp sector errors')
+"""Columns of timer events returned by :func:`decode_timers`."""
+
+StatusColumns = namedtuple('StatusColumns',
+                           'frame fuel start mode pit display errors')
+"""Columns of status responses returned by :func:`decode_status`."""
+
+
 def chksum(buf, offset=0, size=None):
     """Compute the protocol checksum for the buffer `buf`."""
     n = len(buf)
@@ -71,6 +87,116 @@ def unpack(fmt, buf):
     return tuple(result)
 
 
+def decode_timers(frames):
+    """Decode all timer events in the buffer `frames`, which holds
+    responses delimited by ``$``, e.g. as captured from a serial port.
+
+    Returns a :class:`TimerColumns` instance holding the index of
+    every timer frame within `frames`, the zero-based controller
+    address, timestamp and sector as NumPy arrays if available, or
+    :class:`array.array` instances otherwise.  Frames with a wrong
+    checksum are skipped and counted in `errors`.
+
+    """
+    if numpy is not None:
+        (index, rows), = _frame_rows(frames, (_TIMER_SIZE,), timer=True)
+        valid = _valid(rows)
+        n = rows[valid] & 0x0f
+        timestamp = numpy.zeros(len(n), dtype=numpy.uint32)
+        for i, shift in enumerate(_TIMESTAMP_SHIFTS, start=2):
+            timestamp |= n[:, i].astype(numpy.uint32) << shift
+        return TimerColumns(index[valid], n[:, 1].astype(numpy.int8) - 1,
+                            timestamp, n[:, 10], int(len(rows) - valid.sum()))
+    columns = tuple(array.array(code) for code in 'LbLB')
+    errors = 0
+    for index, frame in enumerate(bytearray(frames).split(b'$')):
+        if len(frame) != _TIMER_SIZE or frame[0] != 0x3f or frame[1] == 0x3a:
+            continue
+        if sum(frame[1:-1]) & 0x0f != frame[-1] & 0x0f:
+            errors += 1
+            continue
+        timestamp = 0
+        for i, shift in enumerate(_TIMESTAMP_SHIFTS, start=2):
+            timestamp |= (frame[i] & 0x0f) << shift
+        for column, value in zip(columns, (index, (frame[1] & 0x0f) - 1,
+                                           timestamp, frame[10] & 0x0f)):
+            column.append(value)
+    return TimerColumns(*(columns + (errors,)))
+
+
+def decode_status(frames):
+    """Decode all status responses in the buffer `frames`, which holds
+    responses delimited by ``$``.
+
+    Returns a :class:`StatusColumns` instance holding the index of
+    every status frame within `frames`, a tuple of eight fuel level
+    columns, and the start light, mode, pit lane bit mask and display
+    columns, as NumPy arrays if available, or :class:`array.array`
+    instances otherwise.  Frames with a wrong checksum are skipped and
+    counted in `errors`.
+
+    """
+    if numpy is not None:
+        parts = []
+        errors = 0
+        for index, rows in _frame_rows(frames, _STATUS_SIZES, timer=False):
+            valid = _valid(rows)
+            errors += int(len(rows) - valid.sum())
+            parts.append((index[valid], rows[valid] & 0x0f))
+        index = numpy.concatenate([index for index, _ in parts])
+        n = numpy.concatenate([n[:, :15] for _, n in parts])
+        order = numpy.argsort(index, kind='stable')
+        index, n = index[order], n[order]
+        return StatusColumns(index, tuple(n[:, 2 + i] for i in range(8)),
+                             n[:, 10], n[:, 11], n[:, 12] | (n[:, 13] << 4),
+                             n[:, 14], errors)
+    index = array.array('L')
+    fuel = tuple(array.array('B') for _ in range(8))
+    columns = tuple(array.array('B') for _ in range(4))
+    errors = 0
+    for i, frame in enumerate(bytearray(frames).split(b'$')):
+        if len(frame) not in _STATUS_SIZES:
+            continue
+        if frame[0] != 0x3f or frame[1] != 0x3a:
+            continue
+        if sum(frame[1:-1]) & 0x0f != frame[-1] & 0x0f:
+            errors += 1
+            continue
+        n = [value & 0x0f for value in frame[:15]]
+        index.append(i)
+        for column, value in zip(fuel, n[2:10]):
+            column.append(value)
+        values = (n[10], n[11], n[12] | n[13] << 4, n[14])
+        for column, value in zip(columns, values):
+            column.append(value)
+    return StatusColumns(*((index, fuel) + columns + (errors,)))
+
+
+def _frame_rows(frames, sizes, timer):
+    # yield the frame indices and a two-dimensional array of the bytes
+    # of all frames of each size
+    data = numpy.frombuffer(frames, dtype=numpy.uint8)
+    ends = numpy.flatnonzero(data == 0x24)
+    if not len(data) or data[-1] != 0x24:
+        ends = numpy.append(ends, len(data))
+    starts = numpy.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    # pad, so the second byte of an empty trailing frame can be indexed
+    padded = numpy.append(data, numpy.zeros(2, dtype=numpy.uint8))
+    command = padded[starts] == 0x3f
+    colon = padded[starts + 1] == 0x3a
+    kind = command & ~colon if timer else command & colon
+    for size in sizes:
+        index = numpy.flatnonzero(kind & (lengths == size))
+        rows = data[starts[index][:, None] + numpy.arange(size)]
+        yield index, rows
+
+
+def _valid(rows):
+    checksum = rows[:, 1:-1].sum(axis=1, dtype=numpy.uint32) & 0x0f
+    return checksum == rows[:, -1] & 0x0f
+
+
 def _pack_B(buf, args, count, base=ord('0')):
     for _ in range(count):
         arg = next(args)
@@ -111,7 +237,7 @@ def _pack_s(buf, args, count, base=ord('0')):
     arg = next(args)
     if not isinstance(arg, bytes):
         raise ValueError("'s' format requires a bytes object")
-    buf.extend(arg.ljust(count, base)[:count])
+    buf.extend(arg.ljust(count, bytearray([base]))[:count])
 
 
 def _pack_x(buf, args, count, base=ord('0')):
@@ -177,6 +303,12 @@ def _unpack_Y(result, buf, values, offset, count):
     return count
 
 
+_TIMER_SIZE = 12
+
+_STATUS_SIZES = (16, 18)
+
+_TIMESTAMP_SHIFTS = (24, 28, 16, 20, 8, 12, 0, 4)
+
 _FORMAT_RE = re.compile(r'\s*([1-9]\d*|0)?(.)\s*')
 
 _PACK_FORMATS = {
@@ -0,0 +1,41 @@
+from __future__ import absolute_import, division, unicode_literals
+
+from .connection import BufferTooShort, Connection
+from .logs import TRACE_RECV, read_trace
+from .simulator import parse_url
+
+
+class ReplayConnection(Connection):
+    """Connection replaying the responses recorded in a trace file.
+
+    The URL has the form ``replay:FILE``, where `FILE` is a trace file
+    written by :class:`carreralib.logs.TraceWriter`.  Every call to
+    :meth:`recv` returns the next recorded response, regardless of the
+    messages sent.  With the ``loop=1`` option, the trace is replayed
+    indefinitely, otherwise :exc:`EOFError` is raised at its end.
+
+    """
+
+    def __init__(self, url, timeout=None, **kwargs):
+        path, options = parse_url(url, 'replay', loop=False)
+        options.update(kwargs)
+        self.path = path
+        self.loop = options['loop']
+        self.responses = [data for _, direction, data in read_trace(path)
+                          if direction == TRACE_RECV]
+        self.__index = 0
+
+    def recv(self, maxlength=None):
+        responses = self.responses
+        if self.__index >= len(responses):
+            if not self.loop or not responses:
+                raise EOFError('End of replay')
+            self.__index = 0
+        buf = responses[self.__index]
+        self.__index += 1
+        if maxlength is not None and maxlength < len(buf):
+            raise BufferTooShort('Buffer too short for data received')
+        return buf
+
+    def send(self, buf, offset=0, size=None):
+        pass
@@ -0,0 +1,185 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import mmap
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+from .cu import ControlUnit
+
+MAGIC = b'CRLR'
+
+VERSION = 1
+
+DEFAULT_PATH = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'carreralib-ring'
+)
+"""Default path of the memory-mapped event ring buffer."""
+
+# magic, version, capacity, last written position
+_HEADER = struct.Struct('<4sHxxIQ4x')
+
+_POSITION = struct.Struct('<Q')
+
+_POSITION_OFFSET = 12
+
+# position, host time, kind, address or start light, sector or mode,
+# pit mask, fuel levels, timestamp, display
+_SLOT = struct.Struct('<QdBBBB8sIB7x')
+
+_TIMER = 1
+
+_STATUS = 2
+
+_RESET = 3
+
+
+class Reset(namedtuple('Reset', '')):
+    """Event type written to mark that the race was reset."""
+
+    __slots__ = ()
+
+
+RESET = Reset()
+"""The :class:`Reset` event."""
+
+
+def size(capacity):
+    """Return the size in bytes of a ring buffer holding `capacity`
+    events.
+    """
+    return _HEADER.size + capacity * _SLOT.size
+
+
+class RingWriter(object):
+    """Writer for a memory-mapped ring buffer of Control Unit events.
+
+    Events are written into fixed-size slots, each tagged with its
+    position in the event stream, so the writer never waits for
+    readers: a reader that falls more than `capacity` events behind
+    loses the oldest ones instead.  There must only be a single writer.
+
+    """
+
+    def __init__(self, path=DEFAULT_PATH, capacity=4096):
+        n = size(capacity)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, n)
+            self.__mmap = mmap.mmap(fd, n)
+        finally:
+            os.close(fd)
+        self.__path = path
+        self.__position = 0
+        self.capacity = capacity
+        _HEADER.pack_into(self.__mmap, 0, MAGIC, VERSION, capacity, 0)
+
+    def close(self, unlink=False):
+        """Close the ring buffer, and optionally remove it."""
+        self.__mmap.close()
+        if unlink:
+            os.unlink(self.__path)
+
+    def write(self, event, hosttime=0.0):
+        """Write a :class:`ControlUnit.Timer`, a
+        :class:`ControlUnit.Status` or :const:`RESET` event received at
+        `hosttime`.
+
+        """
+        if isinstance(event, ControlUnit.Timer):
+            fields = (_TIMER, event.address, event.sector, 0, b'',
+                      event.timestamp, 0)
+        elif isinstance(event, ControlUnit.Status):
+            pitmask = sum(1 << n for n, pit in enumerate(event.pit) if pit)
+            fields = (_STATUS, event.start, event.mode, pitmask,
+                      bytes(bytearray(event.fuel)), 0, event.display)
+        elif isinstance(event, Reset):
+            fields = (_RESET, 0, 0, 0, b'', 0, 0)
+        else:
+            raise TypeError('Unsupported event: %r' % (event,))
+        buf = self.__mmap
+        position = self.__position + 1
+        offset = _HEADER.size + (position % self.capacity) * _SLOT.size
+        # invalidate the slot while it is being written
+        _POSITION.pack_into(buf, offset, 0)
+        _SLOT.pack_into(buf, offset, 0, hosttime, *fields)
+        _POSITION.pack_into(buf, offset, position)
+        _POSITION.pack_into(buf, _POSITION_OFFSET, position)
+        self.__position = position
+
+
+class RingReader(object):
+    """Reader for a ring buffer created by :class:`RingWriter`.
+
+    Every reader keeps its own position, so any number of readers may
+    consume the same events at their own pace.  Reading starts with the
+    next event written after the reader was created.
+
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.__mmap = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, _, capacity, position = _HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC:
+            self.__mmap.close()
+            raise ValueError('Not an event ring buffer: %s' % path)
+        self.capacity = capacity
+        self.lost = 0
+        self.__next = position + 1
+
+    def close(self):
+        """Close the ring buffer."""
+        self.__mmap.close()
+
+    def pending(self):
+        """Return the number of events written but not yet read."""
+        head = _POSITION.unpack_from(self.__mmap, _POSITION_OFFSET)[0]
+        return max(head + 1 - self.__next, 0)
+
+    def read(self, maxevents=None):
+        """Return a list of `(event, hosttime)` tuples for the events
+        written since the last call, oldest first.
+
+        Events that were overwritten before they could be read are
+        skipped and counted in :attr:`lost`.
+
+        """
+        buf = self.__mmap
+        head = _POSITION.unpack_from(buf, _POSITION_OFFSET)[0]
+        if head - self.__next >= self.capacity:
+            oldest = head - self.capacity + 1
+            self.lost += oldest - self.__next
+            self.__next = oldest
+        end = head + 1
+        if maxevents is not None:
+            end = min(end, self.__next + maxevents)
+        events = []
+        for position in range(self.__next, end):
+            offset = _HEADER.size + (position % self.capacity) * _SLOT.size
+            slot = _SLOT.unpack_from(buf, offset)
+            current = _POSITION.unpack_from(buf, offset)[0]
+            if slot[0] != position or current != position:
+                self.lost += 1
+                continue
+            events.append((self.__event(slot), slot[1]))
+        self.__next = max(self.__next, end)
+        return events
+
+    @staticmethod
+    def __event(slot):
+        _, _, kind, a, b, pitmask, fuel, timestamp, display = slot
+        if kind == _TIMER:
+            return ControlUnit.Timer(a, timestamp, b)
+        elif kind == _STATUS:
+            pit = tuple(pitmask & (1 << n) != 0 for n in range(8))
+            fuel = tuple(bytearray(fuel))
+            return ControlUnit.Status(fuel, a, b, pit, display)
+        else:
+            return RESET
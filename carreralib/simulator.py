@@ -0,0 +1,165 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import collections
+import random
+import time
+
+from . import protocol
+from .connection import Connection, TimeoutError
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    from urlparse import parse_qsl
+
+
+def parse_url(url, scheme, **defaults):
+    """Parse a connection URL of the form `scheme:path?key=value&...`.
+
+    Returns the path and a :class:`dict` of options, converted to the
+    types of the corresponding `defaults`.
+
+    """
+    if not url.startswith(scheme + ':'):
+        raise ValueError('Invalid %s URL: %s' % (scheme, url))
+    path, _, query = url[len(scheme) + 1:].partition('?')
+    options = dict(defaults)
+    for key, value in parse_qsl(query):
+        if key not in defaults:
+            raise ValueError('Invalid %s option: %s' % (scheme, key))
+        default = defaults[key]
+        if isinstance(default, bool):
+            options[key] = value.lower() in ('1', 'true', 'yes')
+        elif default is not None:
+            options[key] = type(default)(value)
+        else:
+            options[key] = value
+    return path, options
+
+
+class SimulatorConnection(Connection):
+    """Simulated Control Unit connection.
+
+    The URL has the form ``sim:?cars=2&lap=4.0``, with the following
+    options:
+
+    `cars`
+      number of cars on the track (default 2)
+    `lap`
+      mean lap time in seconds (default 4.0)
+    `jitter`
+      relative lap time variation (default 0.1)
+    `rate`
+      CU time elapsed per host second, to accelerate races (default 1)
+    `latency`
+      response latency in seconds (default 0)
+    `loss`
+      probability of a response being lost, causing a timeout
+    `duplicates`
+      probability of a timer event being reported twice
+    `seed`
+      random seed
+
+    """
+
+    VERSION = b'5337'
+
+    def __init__(self, url='sim:', timeout=None, clock=time.monotonic,
+                 **kwargs):
+        _, options = parse_url(url, 'sim', cars=2, lap=4.0, jitter=0.1,
+                               rate=1.0, latency=0.0, loss=0.0,
+                               duplicates=0.0, seed=0)
+        options.update(kwargs)
+        if not 0 <= options['cars'] <= 8:
+            raise ValueError('Number of cars out of range')
+        self.options = options
+        self.clock = clock
+        self.__random = random.Random(options['seed'])
+        self.__responses = collections.deque()
+        self.__start = 0
+        self.__lights = None
+        self.__duplicate = None
+        self.reset()
+
+    def now(self):
+        """Return the current simulated CU time in milliseconds."""
+        elapsed = (self.clock() - self.__epoch) * self.options['rate']
+        return int(elapsed * 1000) & 0xffffffff
+
+    def reset(self):
+        """Reset the simulated CU timer and cars."""
+        self.__epoch = self.clock()
+        self.__crossings = [self.__laptime() // 2 + 100 * n
+                            for n in range(self.options['cars'])]
+
+    def recv(self, maxlength=None):
+        if self.options['latency']:
+            time.sleep(self.options['latency'])
+        responses = self.__responses
+        if not responses or self.__random.random() < self.options['loss']:
+            responses.clear()
+            raise TimeoutError('Timeout waiting for simulated data')
+        return responses.popleft()
+
+    def send(self, buf, offset=0, size=None):
+        if size is None:
+            size = len(buf) - offset
+        buf = bytes(buf[offset:offset+size])
+        cmd = buf[0:1]
+        if buf == b'?':
+            res = self.__poll()
+        elif cmd == b'0':
+            res = protocol.pack('c4sC', b'0', self.VERSION)
+        elif buf == b'=10':
+            self.reset()
+            res = b'='
+        elif buf == b'T2':
+            self.__startkey()
+            res = b'T'
+        else:
+            res = buf
+        self.__responses.append(res)
+
+    def __laptime(self):
+        options = self.options
+        jitter = 1 + options['jitter'] * (2 * self.__random.random() - 1)
+        return max(1, int(options['lap'] * 1000 * jitter))
+
+    def __poll(self):
+        if self.__duplicate is not None:
+            res, self.__duplicate = self.__duplicate, None
+            return res
+        now = self.now()
+        crossings = self.__crossings
+        if crossings:
+            address = min(range(len(crossings)), key=crossings.__getitem__)
+            timestamp = crossings[address]
+            if timestamp <= now:
+                crossings[address] += self.__laptime()
+                res = protocol.pack('cYIYC', b'?', address + 1, timestamp, 1)
+                if self.__random.random() < self.options['duplicates']:
+                    self.__duplicate = res
+                return res
+        fuel = [15] * self.options['cars'] + [0] * (8 - self.options['cars'])
+        return protocol.pack('cc8YYYBYC', b'?', b':', *(
+            fuel + [self.__startlight(), 0, 0, 8]
+        ))
+
+    def __startkey(self):
+        if self.__lights is None and self.__start == 0:
+            self.__start = 1
+        elif self.__lights is None:
+            self.__lights = self.clock()
+        else:
+            self.__start = 1
+            self.__lights = None
+
+    def __startlight(self):
+        if self.__lights is None:
+            return self.__start
+        elapsed = (self.clock() - self.__lights) * self.options['rate']
+        if elapsed < 5:
+            return 2 + int(elapsed)
+        self.__lights = None
+        self.__start = 0
+        return 0
@@ -0,0 +1,163 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import gc
+import os
+import resource
+import time
+import tracemalloc
+from collections import namedtuple
+
+from .bench import percentiles
+
+Sample = namedtuple('Sample', 'elapsed rss traced objects collections count '
+                             'p50 p99 max')
+"""Resource usage and latency percentiles at a point in time.
+
+`rss` and `traced` are the resident set size and the memory allocated
+by Python in bytes, `objects` the number of objects tracked by the
+garbage collector and `collections` the number of collections per
+generation.  Latency percentiles in seconds refer to the `count`
+calls recorded since the previous sample.
+
+"""
+
+
+def rss():
+    """Return the resident set size of the current process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        # peak rather than current size, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class SoakMonitor(object):
+    """Track memory usage and latency of a long-running loop.
+
+    Call :meth:`record` with the duration of each call to be tracked,
+    and :meth:`sample` periodically.  The first sample taken after
+    `warmup` seconds serves as the baseline, against which growth is
+    checked by :meth:`check`.  Allocation sites responsible for most of
+    the growth since the baseline are reported by :meth:`top`, with up
+    to `frames` frames of traceback recorded by :mod:`tracemalloc`.
+
+    """
+
+    def __init__(self, warmup=60.0, frames=1, clock=time.monotonic):
+        self.warmup = warmup
+        self.frames = frames
+        self.clock = clock
+        self.samples = []
+        self.baseline = None
+        self.__latencies = []
+        self.__snapshot = None
+        self.__started = None
+
+    def start(self):
+        """Start tracking allocations."""
+        if self.frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.__started = self.clock()
+
+    def stop(self):
+        """Stop tracking allocations."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def record(self, latency):
+        """Record the duration of a call in seconds."""
+        self.__latencies.append(latency)
+
+    def sample(self):
+        """Take and return a :class:`Sample`."""
+        latencies, self.__latencies = self.__latencies, []
+        stats = percentiles(latencies, (50, 99))
+        gc.collect()
+        traced = 0
+        if tracemalloc.is_tracing():
+            traced = tracemalloc.get_traced_memory()[0]
+        sample = Sample(
+            elapsed=self.clock() - self.__started,
+            rss=rss(),
+            traced=traced,
+            objects=len(gc.get_objects()),
+            collections=tuple(gen['collections'] for gen in gc.get_stats()),
+            count=len(latencies),
+            p50=stats[50],
+            p99=stats[99],
+            max=max(latencies) if latencies else None
+        )
+        self.samples.append(sample)
+        if self.baseline is None and sample.elapsed >= self.warmup:
+            self.baseline = sample
+            if tracemalloc.is_tracing():
+                self.__snapshot = self.__take_snapshot()
+        return sample
+
+    def top(self, limit=5):
+        """Return the `limit` source lines with the largest allocation
+        growth since the baseline as strings.
+
+        """
+        if self.__snapshot is None or not tracemalloc.is_tracing():
+            return []
+        stats = self.__take_snapshot().compare_to(self.__snapshot, 'lineno')
+        return [str(stat) for stat in stats[:limit] if stat.size_diff > 0]
+
+    @staticmethod
+    def __take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__)
+        ])
+
+    def check(self, max_rss=None, max_traced=None, max_p99=None):
+        """Return a list of messages describing thresholds exceeded by
+        the latest sample relative to the baseline.
+
+        `max_rss` and `max_traced` limit the growth of the resident set
+        size and of traced memory in bytes, `max_p99` the ratio of the
+        99th latency percentile to the baseline's.
+
+        """
+        baseline = self.baseline
+        if baseline is None or not self.samples:
+            return []
+        sample = self.samples[-1]
+        failures = []
+        rss_growth = sample.rss - baseline.rss
+        traced_growth = sample.traced - baseline.traced
+        if max_rss is not None and rss_growth > max_rss:
+            failures.append('RSS grew by %d bytes' % rss_growth)
+        if max_traced is not None and traced_growth > max_traced:
+            failures.append('Traced memory grew by %d bytes' % traced_growth)
+        if max_p99 is not None and baseline.p99 and sample.p99 is not None:
+            if sample.p99 > baseline.p99 * max_p99:
+                failures.append('P99 latency grew from %.3f ms to %.3f ms' % (
+                    baseline.p99 * 1000, sample.p99 * 1000
+                ))
+        return failures
+
+    def report(self):
+        """Return all samples and the current top allocation sites as a
+        :class:`dict`.
+
+        """
+        return {
+            'warmup': self.warmup,
+            'baseline': self.baseline._asdict() if self.baseline else None,
+            'samples': [sample._asdict() for sample in self.samples],
+            'top': self.top(),
+        }
+
+
+def format_sample(sample):
+    """Format a :class:`Sample` as a single line of text."""
+    def ms(value):
+        return '%.3f' % (value * 1000) if value is not None else 'n/a'
+    return '%8.0f s  RSS %8.1f MiB  traced %8.1f MiB  objects %8d  ' \
+        'polls %8d  p50 %s ms  p99 %s ms  max %s ms' % (
+            sample.elapsed, sample.rss / 2**20, sample.traced / 2**20,
+            sample.objects, sample.count, ms(sample.p50), ms(sample.p99),
+            ms(sample.max)
+        )
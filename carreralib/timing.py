@@ -0,0 +1,195 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import uuid
+
+from .cu import ControlUnit
+from .laps import LapRecord
+
+NCARS = 8
+"""Number of controller addresses supported by the CU."""
+
+
+def racekey(car):
+    """Standings key ranking cars by laps completed and, for the same
+    number of laps, by the time they last crossed the finish line.
+
+    """
+    return (-len(car.laps), car.time)
+
+
+class Car(object):
+    """Timing state of a single car.
+
+    Subclasses may override :meth:`finish` to be notified when the car
+    has finished the race.  The :attr:`heat` id is set by
+    :class:`RaceTiming`.
+
+    """
+
+    def __init__(self, address, window=5):
+        self.address = address
+        self.heat = None
+        self.laps = LapRecord(window)
+        self.reset()
+
+    def reset(self):
+        """Reset the car's timing state."""
+        self.laps.clear()
+        self.time = None
+        self.checkpoint = None
+        # time from the previous checkpoint to the finish line (index 0)
+        # or Check Lane sector 2 or 3 (index 1, 2) on the current lap
+        self.splits = [None, None, None]
+        self.best_splits = [None, None, None]
+        self.position = None
+        self.finished = False
+        self.fuel = 0
+        self.pit = False
+        self.pits = 0
+
+    def finish(self):
+        """Called when the car has finished the race."""
+        self.finished = True
+
+    def newlap(self, timer):
+        """Record a finish line crossing reported by `timer`.
+
+        If the CU timer was reset or wrapped around since the previous
+        crossing, timing restarts without recording a lap.
+
+        """
+        if self.time is not None and timer.timestamp >= self.time:
+            self.laps.append(timer.timestamp - self.time, timer.timestamp,
+                             timer.sector)
+        self.time = timer.timestamp
+
+    def split(self, timer):
+        """Record a sector time reported by `timer`."""
+        if (self.time is not None and self.checkpoint is not None and
+                timer.timestamp >= self.checkpoint):
+            n = timer.sector - 1
+            split = timer.timestamp - self.checkpoint
+            self.splits[n] = split
+            if self.best_splits[n] is None or split < self.best_splits[n]:
+                self.best_splits[n] = split
+        self.checkpoint = timer.timestamp
+
+
+class RaceTiming(object):
+    """UI-independent lap timing engine.
+
+    Feed :class:`ControlUnit.Timer` and :class:`ControlUnit.Status`
+    events to :meth:`handle`.  In a lap-limited race, a car finishes
+    after completing `laps` laps.  In a time-limited race, every car
+    finishes when crossing the finish line after `duration`
+    milliseconds have passed since the start, i.e. the first crossing.
+
+    The :attr:`standings` list is maintained incrementally using the
+    `key` function, which must only depend on the state of the car
+    itself: when a car crosses the finish line, only that car is moved
+    within the standings.
+
+    Every reset starts a new heat, identified by the random string
+    :attr:`heat`, which is shared by all cars racing in it.
+
+    """
+
+    def __init__(self, cars=None, laps=None, duration=None, key=racekey):
+        if cars is None:
+            cars = [Car(address) for address in range(NCARS)]
+        elif len(cars) > NCARS:
+            raise ValueError('Too many cars')
+        self.cars = cars
+        self.maxlaps = laps
+        self.duration = duration
+        self.key = key
+        self.reset()
+
+    def reset(self):
+        """Reset the timing state of the race and all cars, starting a
+        new heat."""
+        self.heat = uuid.uuid4().hex
+        for car in self.cars:
+            car.reset()
+            car.heat = self.heat
+        self.start = None
+        self.standings = []
+
+    @property
+    def finished(self):
+        """Whether all cars in the standings have finished."""
+        return bool(self.standings) and all(
+            car.finished for car in self.standings
+        )
+
+    @property
+    def leader(self):
+        """The car leading the race, or :const:`None`."""
+        return self.standings[0] if self.standings else None
+
+    def elapsed(self, timestamp):
+        """Return the race time at the CU `timestamp`."""
+        return None if self.start is None else timestamp - self.start
+
+    def handle(self, event):
+        """Handle a timer or status event reported by the CU."""
+        if isinstance(event, ControlUnit.Timer):
+            return self.handle_timer(event)
+        elif isinstance(event, ControlUnit.Status):
+            return self.handle_status(event)
+        else:
+            return None
+
+    def handle_status(self, status):
+        """Update fuel levels and pit stop counts from `status`."""
+        for car, fuel, pit in zip(self.cars, status.fuel, status.pit):
+            if pit and not car.pit:
+                car.pits += 1
+            car.fuel = fuel
+            car.pit = pit
+        return None
+
+    def handle_timer(self, timer):
+        """Update timing from `timer` and return the car concerned, or
+        :const:`None` if the timer event was ignored.
+
+        """
+        if timer.address >= len(self.cars):
+            return None
+        car = self.cars[timer.address]
+        if car.finished:
+            return None
+        if timer.sector != 1:
+            car.split(timer)
+            return car
+        if self.start is None:
+            self.start = timer.timestamp
+        car.split(timer)
+        car.newlap(timer)
+        self.rerank(car)
+        if self.maxlaps is not None and len(car.laps) >= self.maxlaps:
+            car.finish()
+        elif (self.duration is not None and car.laps and
+              timer.timestamp - self.start >= self.duration):
+            car.finish()
+        return car
+
+    def rerank(self, car):
+        """Move `car` to its position within the standings."""
+        standings = self.standings
+        key = self.key
+        if car.position is None:
+            standings.append(car)
+            car.position = len(standings)
+        n = car.position - 1
+        carkey = key(car)
+        while n > 0 and carkey < key(standings[n - 1]):
+            standings[n] = standings[n - 1]
+            standings[n].position = n + 1
+            n -= 1
+        while n < len(standings) - 1 and key(standings[n + 1]) < carkey:
+            standings[n] = standings[n + 1]
+            standings[n].position = n + 1
+            n += 1
+        standings[n] = car
+        car.position = n + 1
@@ -0,0 +1,91 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import time
+
+MAX_LAP = 250
+"""Number of laps the Position Tower can display."""
+
+
+def _monotonic():
+    try:
+        return time.monotonic()
+    except AttributeError:
+        return time.time()
+
+
+class PositionTower(object):
+    """Coalesced updates of the Position Tower display.
+
+    :meth:`update` only records the desired tower state.  :meth:`flush`
+    sends the difference to the last state sent at most once every
+    `interval` seconds, and at most `maxwrites` register writes per
+    flush, so tower updates take a bounded share of link bandwidth.
+    Writes left over are sent by subsequent flushes.
+
+    """
+
+    def __init__(self, cu, interval=0.5, maxwrites=None, clock=_monotonic):
+        self.cu = cu
+        self.interval = interval
+        self.maxwrites = maxwrites
+        self.clock = clock
+        self.__positions = {}
+        self.__lap = None
+        self.__sent = {}
+        self.__flushed = None
+
+    def clear(self):
+        """Clear the Position Tower display."""
+        self.cu.clrpos()
+        self.__positions.clear()
+        self.__lap = None
+        self.__sent.clear()
+        self.__flushed = None
+
+    def update(self, standings, lap=None):
+        """Set the desired tower state from `standings`, a sequence of
+        objects with an `address` attribute in race order, and the
+        leader's `lap`.
+
+        """
+        self.__positions = {
+            car.address: pos for pos, car in enumerate(standings[:8], 1)
+        }
+        if lap is not None:
+            self.__lap = lap % MAX_LAP
+
+    def pending(self):
+        """Return the list of `(word, address, value)` register writes
+        needed to bring the tower to the desired state.
+
+        """
+        sent = self.__sent
+        words = [(6, address, pos) for address, pos in
+                 sorted(self.__positions.items(), key=lambda item: item[1])
+                 if sent.get((6, address)) != pos]
+        if self.__lap is not None:
+            for word, value in ((17, self.__lap >> 4), (18, self.__lap & 0xf)):
+                if sent.get((word, 7)) != value:
+                    words.append((word, 7, value))
+        return words
+
+    def flush(self, force=False):
+        """Send pending updates if `interval` has passed since the last
+        flush, or if `force` is set, and return the number of register
+        writes sent.
+
+        """
+        now = self.clock()
+        flushed = self.__flushed
+        if not force and flushed is not None and now - flushed < self.interval:
+            return 0
+        words = self.pending()
+        if not words:
+            return 0
+        if self.maxwrites is not None:
+            words = words[:self.maxwrites]
+        self.cu.setwords(words)
+        for word, address, value in words:
+            self.__sent[(word, address)] = value
+        self.__flushed = now
+        return len(words)
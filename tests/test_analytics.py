@@ -0,0 +1,65 @@
+from __future__ import unicode_literals
+
+import unittest
+from datetime import datetime
+
+from webapp.analytics import LapAnalytics
+from webapp.results import Result
+
+
+def result(username, minute, laps):
+    finished_at = datetime(2020, 2, 20, 12, minute) if minute is not None else None
+    return Result(username, sum(laps), finished_at, laps, min(laps) if laps else None)
+
+
+RESULTS = [
+    result('bob', 1, [11]),
+    result('alice', 5, [9, 9, 30]),
+    result('alice', 0, [10, 12]),
+    result('carol', 2, []),
+]
+
+
+class LapAnalyticsTest(unittest.TestCase):
+
+    def test_columns(self):
+        analytics = LapAnalytics(RESULTS)
+        self.assertEqual(len(analytics), 6)
+        self.assertEqual(list(analytics.drivers), ['alice', 'bob'])
+        self.assertEqual(analytics.laps.tolist(), [10, 12, 9, 9, 30, 11])
+        self.assertEqual(analytics.heat.tolist(), [0, 0, 1, 1, 1, 2])
+        self.assertEqual(analytics.driver.tolist(), [0, 0, 0, 0, 0, 1])
+        self.assertEqual(analytics.lap_number.tolist(), [0, 1, 0, 1, 2, 0])
+        self.assertEqual(analytics.attempt.tolist(), [0, 0, 1, 1, 1, 0])
+
+    def test_event_stats(self):
+        stats = LapAnalytics(RESULTS).event_stats()
+        self.assertEqual(stats['drivers'], 2)
+        self.assertEqual(stats['heats'], 3)
+        self.assertEqual(stats['laps'], 6)
+        self.assertEqual(stats['best'], 9)
+        self.assertEqual(stats['mean'], 13.5)
+        self.assertEqual(stats['percentiles'][50], 10.5)
+
+    def test_driver_stats(self):
+        bob, alice = LapAnalytics(RESULTS).driver_stats()
+        self.assertEqual(bob['username'], 'bob')
+        self.assertEqual((bob['heats'], bob['laps'], bob['best'], bob['mean']), (1, 1, 11, 11))
+        self.assertEqual(bob['outliers'], 0)
+        self.assertEqual(alice['username'], 'alice')
+        self.assertEqual((alice['heats'], alice['laps'], alice['best'], alice['mean']),
+                         (2, 5, 9, 14))
+        self.assertEqual(alice['percentiles'][50], 10)
+        self.assertEqual(alice['outliers'], 1)
+
+    def test_improvement(self):
+        laps, attempts = LapAnalytics(RESULTS).improvement()
+        self.assertEqual(laps.tolist(), [10, 10.5, 30])
+        self.assertEqual(attempts.tolist(), [11, 16])
+
+    def test_empty(self):
+        analytics = LapAnalytics([result('carol', None, [])])
+        self.assertEqual(len(analytics), 0)
+        self.assertIsNone(analytics.event_stats())
+        self.assertEqual(analytics.driver_stats(), [])
+        self.assertEqual(analytics.outliers().tolist(), [])
@@ -0,0 +1,99 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from carreralib import ControlUnit
+from carreralib.archive import ArchiveReader, ArchiveWriter, STATUS, TIMERS
+
+
+def status(start=0, fuel=15, pit=False):
+    return ControlUnit.Status((fuel,) * 8, start, 0, (pit,) + (False,) * 7, 8)
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'session.crla')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_archive(self):
+        now = [0.0]
+        writer = ArchiveWriter(self.path, chunksize=4, clock=lambda: now[0])
+        writer.heat(['Alice', 'Bob'])
+        for n in range(10):
+            now[0] = n
+            writer.write(ControlUnit.Timer(n % 2, 1000 * n, 1))
+            writer.write(status(start=0))
+        writer.write(status(start=1, fuel=10, pit=True), 42.0)
+        writer.write(b'0')
+        writer.heat(['Carol'])
+        writer.write(ControlUnit.Timer(2, 20000, 2), 50.0)
+        writer.write(status(start=1, fuel=10, pit=True), 51.0)
+        writer.close()
+
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(reader.rows(TIMERS), 11)
+            self.assertEqual(reader.rows(STATUS), 3)
+            self.assertEqual([heat.names for heat in reader.heats],
+                             [['Alice', 'Bob'], ['Carol']])
+            self.assertEqual(reader.heat(2).rows, {TIMERS: (10, 11), STATUS: (2, 3)})
+            self.assertEqual(list(reader.column(TIMERS, 'timestamp', heat=1)),
+                             [1000 * n for n in range(10)])
+            self.assertEqual(list(reader.column(TIMERS, 'address', heat=2)), [2])
+            self.assertEqual(list(reader.column(TIMERS, 'sector')), [1] * 10 + [2])
+            self.assertEqual(list(reader.column(TIMERS, 'time'))[-2:], [9.0, 50.0])
+            self.assertEqual(list(reader.column(STATUS, 'start')), [0, 1, 1])
+            self.assertEqual(list(reader.column(STATUS, 'pit')), [0, 1, 1])
+            self.assertEqual(list(reader.column(STATUS, 'fuel0')), [15, 10, 10])
+            chunks = list(reader.chunks(TIMERS, ('address',), 3, 9))
+            self.assertEqual([len(chunk['address']) for chunk in chunks], [1, 4, 1])
+            with self.assertRaises(KeyError):
+                reader.heat(3)
+
+    def test_events(self):
+        writer = ArchiveWriter(self.path, chunksize=2)
+        writer.heat(['Alice'])
+        writer.write(status(start=2), 1.0)
+        writer.write(ControlUnit.Timer(0, 1000, 1), 2.0)
+        writer.write(ControlUnit.Timer(0, 2000, 1), 3.0)
+        writer.write(status(start=0, pit=True), 3.0)
+        writer.heat(['Bob'])
+        writer.write(ControlUnit.Timer(1, 3000, 1), 4.0)
+        writer.close()
+
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(list(reader.events(1)), [
+                (1.0, status(start=2)),
+                (2.0, ControlUnit.Timer(0, 1000, 1)),
+                (3.0, status(start=0, pit=True)),
+                (3.0, ControlUnit.Timer(0, 2000, 1)),
+            ])
+            self.assertEqual(list(reader.events(2)), [(4.0, ControlUnit.Timer(1, 3000, 1))])
+            self.assertEqual(len(list(reader.events())), 5)
+
+    def test_truncated(self):
+        writer = ArchiveWriter(self.path)
+        writer.heat()
+        writer.write(ControlUnit.Timer(0, 1000, 1), 1.0)
+        writer.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'CHNK\xff\xff')
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(list(reader.column(TIMERS, 'timestamp')), [1000])
+
+    def test_exists(self):
+        ArchiveWriter(self.path).close()
+        with self.assertRaises(FileExistsError):
+            ArchiveWriter(self.path)
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not an archive')
+        with self.assertRaises(ValueError):
+            ArchiveReader(self.path)
@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from webapp.assets import CACHE_CONTROL, MANIFEST_FILE, Assets, _rewrite_urls, build, outdated
+
+SCRIPT = b'function update() { return document.title; }\n' * 16
+
+
+class AssetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'static')
+        self.dest = os.path.join(self.tmpdir, 'dist')
+        os.mkdir(self.source)
+        for name, data in [('logo.svg', b'<svg></svg>'), ('app.js', SCRIPT),
+                           ('styles.css', b'body { background: url("logo.svg"); }\n'
+                                          b'div { background: url(missing.png); }\n')]:
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def app(self):
+        app = Flask(__name__, static_folder=self.source)
+        return app, Assets(app, self.source, self.dest)
+
+    def test_rewrite_urls(self):
+        files = {'logo.svg': 'logo.0123456789ab.svg', 'img/a.png': 'img/a.0123456789ab.png'}
+        self.assertEqual(
+            _rewrite_urls('a { b: url("logo.svg") } c { d: url( ./img/a.png ) } '
+                          'e { f: url(other.png) }', files),
+            'a { b: url("logo.0123456789ab.svg") } c { d: url(img/a.0123456789ab.png) } '
+            'e { f: url(other.png) }'
+        )
+
+    def test_build(self):
+        self.assertTrue(outdated(self.source, self.dest))
+        manifest = build(self.source, self.dest)
+        self.assertFalse(outdated(self.source, self.dest))
+        files = manifest['files']
+        self.assertEqual(sorted(files), ['app.js', 'logo.svg', 'styles.css'])
+        self.assertRegex(files['app.js'], r'^app\.[0-9a-f]{12}\.js$')
+        with open(os.path.join(self.dest, files['styles.css']), 'rb') as f:
+            css = f.read()
+        self.assertIn(('url("%s")' % files['logo.svg']).encode('ascii'), css)
+        self.assertIn(b'url(missing.png)', css)
+        # too small to compress
+        self.assertNotIn(files['logo.svg'], manifest['encodings'])
+        self.assertIn('gzip', manifest['encodings'][files['app.js']])
+        with gzip.open(os.path.join(self.dest, files['app.js'] + '.gz')) as f:
+            self.assertEqual(f.read(), SCRIPT)
+        with open(os.path.join(self.dest, MANIFEST_FILE)) as f:
+            self.assertEqual(json.load(f), manifest)
+        # unchanged content keeps its name
+        self.assertEqual(build(self.source, self.dest)['files'], files)
+
+    def test_send(self):
+        app, assets = self.app()
+        target = assets.manifest['files']['app.js']
+        client = app.test_client()
+        with app.test_request_context():
+            self.assertEqual(assets.url('app.js'), '/assets/' + target)
+            self.assertEqual(assets.url('other.js'), '/static/other.js')
+            self.assertEqual(assets.srcset('logo.svg'), '')
+        response = client.get('/assets/' + target, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Cache-Control'], CACHE_CONTROL)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.get_data()), SCRIPT)
+        response.close()
+        response = client.get('/assets/' + target)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_data(), SCRIPT)
+        response.close()
+        self.assertEqual(client.get('/assets/app.js').status_code, 404)
+        self.assertEqual(client.get('/assets/' + MANIFEST_FILE).status_code, 404)
+
+    def test_unwritable(self):
+        # a file where the build directory should be
+        self.dest = os.path.join(self.source, 'app.js', 'dist')
+        app, assets = self.app()
+        self.assertEqual(assets.manifest['files'], {})
+        with app.test_request_context():
+            self.assertEqual(assets.url('app.js'), '/static/app.js')
+
+    def test_last_build(self):
+        files = build(self.source, self.dest)['files']
+        path = os.path.join(self.source, 'app.js')
+        with open(path, 'ab') as f:
+            f.write(b'update();\n')
+        built = os.path.getmtime(os.path.join(self.dest, MANIFEST_FILE))
+        os.utime(path, (built + 1, built + 1))
+        # the manifest cannot be replaced
+        os.mkdir(os.path.join(self.dest, MANIFEST_FILE + '.tmp'))
+        app, assets = self.app()
+        self.assertEqual(assets.manifest['files'], files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+from __future__ import division, unicode_literals
+
+import unittest
+
+from carreralib import ControlUnit
+from carreralib.clock import ClockSync, WRAP
+
+
+class ClockSyncTest(unittest.TestCase):
+
+    def test_offset(self):
+        clock = ClockSync()
+        self.assertIsNone(clock.hosttime(0))
+        clock.observe(1000, 101.05)
+        clock.observe(2000, 102.01)
+        clock.observe(3000, 103.03)
+        self.assertAlmostEqual(clock.offset, 100.01)
+        self.assertAlmostEqual(clock.hosttime(2000), 102.01)
+        percentiles = clock.percentiles((0, 100))
+        self.assertAlmostEqual(percentiles[0], 0.0)
+        self.assertAlmostEqual(percentiles[100], 0.02)
+
+    def test_reset_anchor(self):
+        clock = ClockSync()
+        clock.reset(50.0, 50.02)
+        self.assertAlmostEqual(clock.hosttime(0), 50.01)
+        self.assertAlmostEqual(clock.hosttime(1500), 51.51)
+
+    def test_drift(self):
+        clock = ClockSync(block=10.0)
+        drift = 1e-4
+        for n in range(100):
+            cutime = n * 5.0
+            received = 100 + cutime * (1 + drift) + (0.01 if n % 3 else 0)
+            clock.observe(int(cutime * 1000), received)
+        self.assertAlmostEqual(clock.drift, drift, places=6)
+        self.assertAlmostEqual(clock.hosttime(500000), 100 + 500 * (1 + drift),
+                               places=3)
+
+    def test_wraparound(self):
+        clock = ClockSync()
+        clock.observe(WRAP - 1000, 10.0)
+        self.assertEqual(clock.unwrap(500), WRAP + 500)
+        self.assertAlmostEqual(clock.hosttime(500), 11.5)
+        self.assertAlmostEqual(clock.hosttime(WRAP - 1000), 10.0)
+
+    def test_timer_reset(self):
+        clock = ClockSync()
+        clock.observe(1000000, 10.0)
+        self.assertEqual(clock.unwrap(999000), 999000)
+        self.assertEqual(clock.unwrap(500), 500)
+        clock.observe(1000, 20.0)
+        self.assertAlmostEqual(clock.offset, 19.0)
+
+    def test_annotate(self):
+        clock = ClockSync()
+        clock.observe(1000, 11.0)
+        timer = ControlUnit.Timer(0, 2000, 1)
+        self.assertEqual(clock.annotate(timer), (timer, 12.0))
+        self.assertEqual(clock.annotate(None), (None, None))
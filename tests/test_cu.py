@@ -0,0 +1,160 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from carreralib import ControlUnit
+from carreralib.clock import ClockSync
+from carreralib.connection import Connection
+from carreralib.cu import TimerIndex
+from carreralib.framing import FrameAssembler
+from carreralib.protocol import pack
+
+
+def timer(address, timestamp, sector=1):
+    return pack('cYIYC', b'?', address + 1, timestamp, sector)
+
+
+def status(fuel=(15,) * 8, start=0, mode=0, pitmask=0, display=8):
+    return pack('cc8YYYBYC', b'?', b':', *(fuel + (start, mode, pitmask,
+                                                  display)))
+
+
+class FakeConnection(Connection):
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.sent = []
+
+    def recv(self, maxlength=None):
+        return self.responses.pop(0)
+
+    def send(self, buf, offset=0, size=None):
+        self.sent.append(bytes(buf))
+
+
+class TimerIndexTest(unittest.TestCase):
+
+    def test_add(self):
+        index = TimerIndex(window=1000)
+        self.assertTrue(index.add(ControlUnit.Timer(0, 100, 1)))
+        self.assertFalse(index.add(ControlUnit.Timer(0, 100, 1)))
+        self.assertTrue(index.add(ControlUnit.Timer(0, 100, 2)))
+        self.assertTrue(index.add(ControlUnit.Timer(1, 100, 1)))
+        self.assertEqual(index.suppressed, 1)
+        self.assertIn(ControlUnit.Timer(0, 100, 1), index)
+
+    def test_window(self):
+        index = TimerIndex(window=1000)
+        index.add(ControlUnit.Timer(0, 100, 1))
+        index.add(ControlUnit.Timer(1, 1200, 1))
+        self.assertNotIn(ControlUnit.Timer(0, 100, 1), index)
+        self.assertEqual(len(index), 1)
+
+    def test_maxsize(self):
+        index = TimerIndex(window=10000, maxsize=4)
+        for n in range(10):
+            index.add(ControlUnit.Timer(0, n, 1))
+        self.assertEqual(len(index), 4)
+        self.assertIn(ControlUnit.Timer(0, 9, 1), index)
+
+    def test_reset(self):
+        index = TimerIndex(window=1000)
+        index.add(ControlUnit.Timer(0, 50000, 1))
+        self.assertTrue(index.add(ControlUnit.Timer(0, 10, 1)))
+        self.assertFalse(index.add(ControlUnit.Timer(0, 10, 1)))
+        self.assertEqual(len(index), 1)
+
+
+class ControlUnitTest(unittest.TestCase):
+
+    def test_request(self):
+        cu = ControlUnit(FakeConnection([timer(1, 226287), status()]))
+        self.assertEqual(cu.request(), ControlUnit.Timer(1, 226287, 1))
+        self.assertEqual(cu.request(), ControlUnit.Status(
+            (15,) * 8, 0, 0, (False,) * 8, 8
+        ))
+
+    def test_memoryview(self):
+        # Bluetooth LE notifications lack the command letter
+        assembler = FrameAssembler()
+        for frame in [timer(1, 226287), status(pitmask=0x81), pack('c4sC', b'0', b'5337')]:
+            assembler.feed(frame[1:] + b'$')
+        cu = ControlUnit(FakeConnection(assembler.frames))
+        self.assertEqual(cu.request(), ControlUnit.Timer(1, 226287, 1))
+        self.assertEqual(cu.request().pit, (True,) + (False,) * 6 + (True,))
+        version = cu.version()
+        self.assertIsInstance(version, bytes)
+        self.assertEqual(version, b'5337')
+
+    def test_status_cache(self):
+        cu = ControlUnit(FakeConnection([
+            status(), status(pitmask=0x81), status(), status(start=1),
+            status(pitmask=0x81)
+        ]), status_cache=2)
+        first, pit, again, start, evicted = [cu.request() for _ in range(5)]
+        self.assertIs(again, first)
+        self.assertEqual(pit.pit, (True,) + (False,) * 6 + (True,))
+        self.assertEqual(start.start, 1)
+        self.assertEqual(evicted, pit)
+        self.assertIsNot(evicted, pit)
+
+    def test_poll(self):
+        cu = ControlUnit(FakeConnection([
+            timer(0, 1000), status(), timer(0, 1000), timer(1, 1000),
+            status(), status()
+        ]))
+        events = [cu.poll() for _ in range(6)]
+        self.assertEqual(events[0], ControlUnit.Timer(0, 1000, 1))
+        self.assertIsInstance(events[1], ControlUnit.Status)
+        self.assertIsNone(events[2])
+        self.assertEqual(events[3], ControlUnit.Timer(1, 1000, 1))
+        self.assertIsInstance(events[4], ControlUnit.Status)
+        self.assertIsInstance(events[5], ControlUnit.Status)
+        self.assertEqual(cu.timers.suppressed, 1)
+
+    def test_clock(self):
+        times = iter([10.0, 10.02, 11.5])
+        clock = ClockSync(clock=lambda: next(times))
+        cu = ControlUnit(FakeConnection([b'=', timer(0, 1400)]), clock=clock)
+        self.assertIsNone(cu.hosttime)
+        cu.reset()
+        self.assertAlmostEqual(clock.hosttime(0), 10.01)
+        cu.request()
+        self.assertAlmostEqual(clock.hosttime(1400), 11.41)
+        self.assertAlmostEqual(cu.hosttime, 11.41)
+        self.assertAlmostEqual(clock.latencies[-1], 0.09)
+
+    def test_setword_cache(self):
+        conn = FakeConnection([b'J'] * 4)
+        cu = ControlUnit(conn)
+        cu.setspeed(0, 8)
+        cu.setspeed(0, 8)
+        cu.setspeed(1, 8)
+        cu.setspeed(0, 8)
+        self.assertEqual(len(conn.sent), 2)
+        cu.invalidate(0)
+        cu.setspeed(0, 8)
+        self.assertEqual(len(conn.sent), 3)
+        cu.setspeed(0, 8)
+        cu.setword(0, 0, 8, repeat=2, force=True)
+        self.assertEqual(len(conn.sent), 4)
+
+    def test_clrpos(self):
+        conn = FakeConnection([b'J'] * 4)
+        cu = ControlUnit(conn)
+        cu.setpos(0, 1)
+        cu.clrpos()
+        cu.clrpos()
+        cu.setpos(0, 1)
+        self.assertEqual(len(conn.sent), 4)
+
+    def test_apply_profile(self):
+        conn = FakeConnection([b'J'] * 17)
+        cu = ControlUnit(conn)
+        self.assertEqual(cu.apply_profile(speed=8, brake=[4] * 7 + [None]), 15)
+        self.assertEqual(conn.responses, [b'J', b'J'])
+        self.assertEqual(conn.sent[0], pack('cBYYC', b'J', 0, 8, 2))
+        self.assertEqual(conn.sent[-1], pack('cBYYC', b'J', 1 | 6 << 5, 4, 2))
+        self.assertEqual(cu.apply_profile(speed=8, fuel=[15] + [None] * 7), 1)
+        with self.assertRaises(ValueError):
+            cu.apply_profile(speed=[8] * 7)
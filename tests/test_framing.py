@@ -0,0 +1,57 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from carreralib.framing import FrameAssembler
+
+
+class FrameAssemblerTest(unittest.TestCase):
+
+    def frames(self, assembler):
+        frames = [bytes(frame) for frame in assembler.frames]
+        assembler.frames.clear()
+        return frames
+
+    def test_single(self):
+        assembler = FrameAssembler()
+        assembler.feed(b'53377$')
+        assembler.feed(b'1234567890$')
+        assembler.feed(b'J')
+        self.assertEqual(self.frames(assembler), [b'053377', b'?1234567890', b'J'])
+
+    def test_split(self):
+        assembler = FrameAssembler(fragment_size=4)
+        assembler.feed(b':123')
+        self.assertEqual(len(assembler.frames), 0)
+        assembler.feed(b'45')
+        assembler.feed(b'67$')
+        self.assertEqual(self.frames(assembler), [b'?:1234567'])
+
+    def test_multiple(self):
+        assembler = FrameAssembler()
+        assembler.feed(b'123456$5337')
+        assembler.feed(b'7$:9$')
+        self.assertEqual(self.frames(assembler), [b'?123456', b'053377', b'?:9'])
+
+    def test_reuse(self):
+        assembler = FrameAssembler(size=16)
+        for n in range(100):
+            assembler.feed(b'%08d$' % n)
+            frame = assembler.frames.popleft()
+            self.assertEqual(bytes(frame), b'?%08d' % n)
+
+    def test_grow(self):
+        assembler = FrameAssembler(size=16)
+        for n in range(10):
+            assembler.feed(b'%08d$' % n)
+        assembler.feed(b'x' * 40 + b'$')
+        frames = self.frames(assembler)
+        self.assertEqual(frames[:10], [b'?%08d' % n for n in range(10)])
+        self.assertEqual(frames[10], b'?' + b'x' * 40)
+
+    def test_clear(self):
+        assembler = FrameAssembler(fragment_size=4)
+        assembler.feed(b'12345')
+        assembler.clear()
+        assembler.feed(b'5337$')
+        self.assertEqual(self.frames(assembler), [b'?5337'])
@@ -0,0 +1,124 @@
+from __future__ import unicode_literals
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import unittest
+
+from webapp.ingest import Ingestor
+
+
+def result(username, total, heat='h1'):
+    return {
+        'heat': heat,
+        'username': username,
+        'time': total,
+        'finished_at': '2020-02-20T12:00:00',
+        'laps': [total],
+    }
+
+
+class IngestorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.journal = os.path.join(self.tmpdir, 'ingest.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def submit(self, ingestor, station, results):
+        batch_id = ingestor.submit(station, results)
+        ingestor.join()
+        return ingestor.status(batch_id)
+
+    def test_dedup(self):
+        ingestor = Ingestor(self.journal)
+        status = self.submit(ingestor, 'a', [result('alice', 10), result('bob', 12)])
+        self.assertEqual(status, {'status': 'done', 'results': 2, 'accepted': 2,
+                                  'duplicates': 0})
+        # a retried batch, the same heat from another station and a new heat
+        status = self.submit(ingestor, 'a', [result('alice', 10), result('bob', 12)])
+        self.assertEqual(status['duplicates'], 2)
+        status = self.submit(ingestor, 'b', [result('alice', 11)])
+        self.assertEqual(status['accepted'], 1)
+        status = self.submit(ingestor, 'a', [result('alice', 9, heat='h2')])
+        self.assertEqual(status['accepted'], 1)
+        self.assertEqual(len(ingestor.index.history('alice')[0]), 3)
+
+    def test_replay(self):
+        ingestor = Ingestor(self.journal)
+        self.submit(ingestor, 'a', [result('alice', 10), result('bob', 12)])
+        with open(self.journal, 'ab') as f:
+            # partial line written by a crashed process
+            f.write(b'{"station": "a", "heat"')
+        restored = Ingestor(self.journal)
+        page, _ = restored.index.standings()
+        self.assertEqual([(r.username, r.time) for _, r in page], [('alice', 10), ('bob', 12)])
+        status = self.submit(restored, 'a', [result('alice', 10)])
+        self.assertEqual(status['duplicates'], 1)
+
+    def test_shared_journal(self):
+        first, second = Ingestor(self.journal), Ingestor(self.journal)
+        self.submit(first, 'a', [result('alice', 10)])
+        self.assertEqual(len(second.refresh(interval=0)), 1)
+        status = self.submit(second, 'a', [result('alice', 10), result('bob', 12)])
+        self.assertEqual(status['duplicates'], 1)
+        self.assertEqual(len(first.refresh(interval=0)), 2)
+
+    def test_memory(self):
+        ingestor = Ingestor(None)
+        status = self.submit(ingestor, 'a', [result('alice', 10), result('alice', 10)])
+        self.assertEqual(status, {'status': 'done', 'results': 2, 'accepted': 1,
+                                  'duplicates': 1})
+
+    def test_invalid(self):
+        ingestor = Ingestor(None)
+        with self.assertRaises(ValueError):
+            ingestor.submit('', [result('alice', 10)])
+        with self.assertRaises(ValueError):
+            ingestor.submit('a', [{'username': 'alice'}])
+        with self.assertRaises(ValueError):
+            ingestor.submit('a', [result('', 10)])
+
+    def test_full(self):
+        ingestor = Ingestor(self.journal, maxsize=1)
+        merge, merging, blocked = ingestor._merge, threading.Event(), threading.Event()
+
+        def blocking_merge(*args):
+            merging.set()
+            blocked.wait(5.0)
+            merge(*args)
+
+        # block the background thread while merging the first batch
+        ingestor._merge = blocking_merge
+        first = ingestor.submit('a', [result('alice', 10)])
+        self.assertTrue(merging.wait(5.0))
+        second = ingestor.submit('a', [result('bob', 12)])
+        with self.assertRaises(queue.Full):
+            ingestor.submit('a', [result('carol', 14)])
+        self.assertEqual(ingestor.status(second)['status'], 'pending')
+        # the rejected batch is not reported as pending
+        self.assertEqual(len(ingestor._status), 2)
+        blocked.set()
+        ingestor.join()
+        self.assertEqual(ingestor.status(first)['status'], 'done')
+        self.assertEqual(ingestor.status(second)['status'], 'done')
+        self.assertEqual(len(ingestor.index), 2)
+
+    def test_shared_status(self):
+        first, second = Ingestor(self.journal), Ingestor(self.journal)
+        self.submit(first, 'a', [result('alice', 10)])
+        batch_id = first.submit('a', [result('alice', 10), result('bob', 12)])
+        first.join()
+        self.assertEqual(second.status(batch_id), first.status(batch_id))
+        self.assertEqual(second.status(batch_id)['accepted'], 1)
+        self.assertIsNone(second.status('0-0'))
+        # statuses are restored from the journal
+        self.assertEqual(Ingestor(self.journal).status(batch_id)['status'], 'done')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+from __future__ import division, unicode_literals
+
+import statistics
+import unittest
+
+from carreralib.laps import LapRecord
+
+
+class LapRecordTest(unittest.TestCase):
+
+    def test_empty(self):
+        laps = LapRecord()
+        self.assertEqual(len(laps), 0)
+        self.assertEqual(laps.total, 0)
+        self.assertIsNone(laps.last)
+        self.assertIsNone(laps.best)
+        self.assertIsNone(laps.mean)
+        self.assertIsNone(laps.variance)
+        self.assertIsNone(laps.rolling_mean)
+        self.assertIsNone(laps.rolling_variance)
+
+    def test_statistics(self):
+        times = [5200, 4100, 4350, 3980, 4420, 4105, 6020]
+        laps = LapRecord(window=3)
+        for n, time in enumerate(times):
+            laps.append(time, timestamp=n * 1000, sector=1)
+            self.assertEqual(laps.last, time)
+            self.assertEqual(laps.total, sum(times[:n+1]))
+            self.assertEqual(laps.best, min(times[:n+1]))
+            self.assertAlmostEqual(laps.mean, statistics.mean(times[:n+1]))
+            self.assertAlmostEqual(laps.variance,
+                                   statistics.pvariance(times[:n+1]))
+            window = times[max(0, n-2):n+1]
+            self.assertEqual(laps.rolling_total, sum(window))
+            self.assertAlmostEqual(laps.rolling_mean,
+                                   statistics.mean(window))
+            self.assertAlmostEqual(laps.rolling_variance,
+                                   statistics.pvariance(window))
+        self.assertEqual(laps.tolist(), times)
+        self.assertEqual(list(laps.timestamps), [n * 1000 for n in range(7)])
+        self.assertEqual(list(laps.sectors), [1] * 7)
+
+    def test_clear(self):
+        laps = LapRecord()
+        laps.append(4000)
+        laps.clear()
+        self.assertEqual(len(laps), 0)
+        self.assertEqual(laps.total, 0)
+        self.assertIsNone(laps.best)
+        self.assertIsNone(laps.rolling_mean)
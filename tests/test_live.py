@@ -0,0 +1,35 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from carreralib.live import LivePublisher, LiveSubscriber
+
+
+class LiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.address = os.path.join(self.tmpdir, 'live.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_no_subscriber(self):
+        publisher = LivePublisher(self.address)
+        self.assertFalse(publisher.publish('lights', start=1))
+        self.assertEqual(publisher.dropped, 1)
+        publisher.close()
+
+    def test_publish(self):
+        subscriber = LiveSubscriber(self.address)
+        publisher = LivePublisher(self.address)
+        self.assertTrue(publisher.publish('lap', address=1, laps=2))
+        self.assertEqual(subscriber.recv(1.0),
+                         {'type': 'lap', 'address': 1, 'laps': 2})
+        self.assertIsNone(subscriber.recv(0.01))
+        publisher.close()
+        subscriber.close()
+        self.assertFalse(os.path.exists(self.address))
@@ -0,0 +1,52 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from carreralib.livestate import CarState, LiveStateReader, LiveStateWriter
+
+
+class LiveStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'live')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_snapshot(self):
+        writer = LiveStateWriter(self.path)
+        reader = LiveStateReader(self.path)
+        self.assertEqual(reader.snapshot(), (0, 0, ()))
+        seq = reader.sequence()
+        cars = [
+            CarState('Alice', 3, 4100, 3900, 12100, 1, 15, 1, False, True),
+            CarState('Bob', 2, None, None, None, 2, 7, 0, True, False)
+        ]
+        writer.write(5, 6, cars)
+        self.assertNotEqual(reader.sequence(), seq)
+        self.assertEqual(reader.snapshot(), (5, 6, tuple(cars)))
+        reader.close()
+        writer.close(unlink=True)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_writer(self):
+        writer = LiveStateWriter(self.path)
+        writer.write(1, 0, [CarState('Alice')])
+        reader = LiveStateReader(self.path)
+        # writer died during an update
+        with open(self.path, 'r+b') as f:
+            f.write(struct.pack('<I', reader.sequence() + 1))
+        self.assertIsNone(reader.snapshot(maxretries=1000))
+        reader.close()
+        writer.close()
+
+    def test_too_many_cars(self):
+        writer = LiveStateWriter(self.path)
+        with self.assertRaises(ValueError):
+            writer.write(0, 0, [CarState()] * 9)
+        writer.close()
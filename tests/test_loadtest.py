@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import Flask
+
+from webapp.loadtest import AppClient, HttpClient, format_report, run
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(0.5)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FailingClient(AppClient):
+
+    def get(self, route):
+        if route == '/down':
+            raise ConnectionResetError()
+        return super().get(route)
+
+
+class RunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.add_url_rule('/ok', 'ok', lambda: 'ok')
+        self.app.add_url_rule('/fail', 'fail', lambda: ('failed', 500))
+
+    def test_run(self):
+        routes = ['/ok', '/fail', '/missing', '/down']
+        report = run(lambda: FailingClient(self.app), routes, clients=2, duration=0.2,
+                     warmup=0.05)
+        self.assertEqual((report['clients'], report['duration']), (2, 0.2))
+        self.assertEqual(list(report['routes']), routes)
+        ok = report['routes']['/ok']
+        self.assertGreater(ok['requests'], 0)
+        self.assertEqual(ok['errors'], 0)
+        self.assertEqual(ok['rate'], ok['requests'] / 0.2)
+        self.assertLessEqual(ok['p50'], ok['max'])
+        for route in routes[1:]:
+            stats = report['routes'][route]
+            self.assertGreater(stats['requests'], 0)
+            self.assertEqual(stats['errors'], stats['requests'])
+            self.assertEqual(stats['rate'], 0)
+            self.assertIsNone(stats['max'])
+        self.assertIn('/missing', format_report(report))
+
+    def test_warmup(self):
+        # with a clock ticking once per request, only the second is measured
+        clock = iter(range(100)).__next__
+        report = run(lambda: AppClient(self.app), ['/ok', '/fail'], clients=1, duration=1,
+                     warmup=2, clock=clock)
+        self.assertEqual(report['routes']['/ok']['requests'], 0)
+        self.assertEqual(report['routes']['/fail']['requests'], 1)
+        self.assertEqual(report['routes']['/fail']['errors'], 1)
+
+
+class HttpClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_reconnect(self):
+        client = HttpClient('http://127.0.0.1:%d/' % self.server.server_address[1],
+                            timeout=0.1)
+        try:
+            self.assertEqual(client.get('/ok'), 200)
+            with self.assertRaises(socket.timeout):
+                client.get('/slow')
+            self.assertEqual(client.get('/ok'), 200)
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+from __future__ import unicode_literals
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from carreralib.logs import RateLimitFilter, TRACE_RECV, TRACE_SEND
+from carreralib.logs import TraceWriter, read_trace
+
+
+def record(msg, *args):
+    return logging.LogRecord('test', logging.WARN, __file__, 0, msg, args,
+                             None)
+
+
+class RateLimitFilterTest(unittest.TestCase):
+
+    def test_filter(self):
+        now = [0.0]
+        f = RateLimitFilter(interval=10.0, burst=2, clock=lambda: now[0])
+        results = [f.filter(record('Unexpected %r', n)) for n in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+        self.assertTrue(f.filter(record('Other message')))
+        self.assertEqual(f.suppressed, 3)
+        now[0] = 10.0
+        r = record('Unexpected %r', 5)
+        self.assertTrue(f.filter(r))
+        self.assertEqual(r.getMessage(),
+                         'Unexpected 5 (3 similar messages suppressed)')
+
+    def test_maxkeys(self):
+        f = RateLimitFilter(maxkeys=2, clock=lambda: 0.0)
+        for msg in ('a', 'b', 'c'):
+            self.assertTrue(f.filter(record(msg)))
+        self.assertTrue(f.filter(record('a')))
+        self.assertFalse(f.filter(record('c')))
+
+    def test_threads(self):
+        f = RateLimitFilter(interval=0.0, burst=1, maxkeys=4)
+        errors = []
+
+        def run(n):
+            try:
+                for i in range(2000):
+                    f.filter(record('message %d' % ((i + n) % 16)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class TraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'trace')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_trace(self):
+        times = iter([1.0, 1.5])
+        trace = TraceWriter(self.path, clock=lambda: next(times))
+        trace.send(b'?')
+        trace.recv(b'?2003037?>1=')
+        trace.close()
+        self.assertEqual(list(read_trace(self.path)), [
+            (1.0, TRACE_SEND, b'?'), (1.5, TRACE_RECV, b'?2003037?>1=')
+        ])
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage!')
+        with self.assertRaises(ValueError):
+            list(read_trace(self.path))
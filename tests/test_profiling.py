@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from carreralib.profiling import ProfileToggle, SamplingProfiler, Spans
+
+
+def busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class SpansTest(unittest.TestCase):
+
+    def test_spans(self):
+        now = [0.0]
+        spans = Spans(clock=lambda: now[0])
+        with spans.span('update'):
+            now[0] += 0.5
+        with spans.span('update'):
+            now[0] += 1.5
+
+        def request(x):
+            now[0] += 0.25
+            return x
+        self.assertEqual(spans.wrap('request', request)(42), 42)
+        self.assertEqual(spans.report(), {
+            'update': {'count': 2, 'total': 2.0, 'mean': 1.0, 'max': 1.5},
+            'request': {'count': 1, 'total': 0.25, 'mean': 0.25, 'max': 0.25},
+        })
+        self.assertTrue(spans.format().startswith('update'))
+        spans.clear()
+        self.assertEqual(spans.report(), {})
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sampling(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        busy(0.1)
+        profiler.stop()
+        self.assertFalse(profiler.running)
+        path = os.path.join(self.tmpdir, 'profile.collapsed')
+        profiler.dump(path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertIn('test_profiling.py:busy', stack)
+        self.assertGreater(int(count), 0)
+
+    def test_toggle(self):
+        for mode, ext in (('sample', '.collapsed'), ('cprofile', '.prof')):
+            toggle = ProfileToggle(mode, self.tmpdir, interval=0.001)
+            self.assertIsNone(toggle.toggle())
+            self.assertTrue(toggle.running)
+            busy(0.01)
+            path = toggle.toggle()
+            self.assertFalse(toggle.running)
+            self.assertTrue(path.endswith(ext))
+            self.assertTrue(os.path.exists(path))
+        with self.assertRaises(ValueError):
+            ProfileToggle('foo')
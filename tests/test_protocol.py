@@ -2,8 +2,18 @@ from __future__ import unicode_literals
 
 import unittest
 
+from carreralib import protocol
 from carreralib.protocol import chksum, pack, unpack
 
+FRAMES = b'$'.join([
+    pack('cYIYC', b'?', 2, 226287, 1),
+    pack('cc8YYYBYC', b'?', b':', *((15,) * 8 + (0, 3, 0x81, 8))),
+    b'0',
+    pack('cYIYC', b'?', 8, 0xfedcba98, 3)[:-1] + b'?',
+    pack('cc8YYYBYxxC', b'?', b':', *((1, 2, 3, 4, 5, 6, 7, 8, 9, 1, 0x10, 6))),
+    pack('cYIYC', b'?', 8, 0xfedcba98, 3),
+]) + b'$'
+
 
 class ProtocolTest(unittest.TestCase):
 
@@ -26,7 +36,9 @@ class ProtocolTest(unittest.TestCase):
     def test_pack(self):
         for fmt, args, res in (
             ('cBYYC', [b'J', 6, 9, 1], b'J60910'),
-            ('cBYYC', [b'J', 6 | (5 << 5), 4, 1], b'J6:415')
+            ('cBYYC', [b'J', 6 | (5 << 5), 4, 1], b'J6:415'),
+            ('c4sC', [b'0', b'5321'], b'05321;'),
+            ('c4sC', [b'0', b'53'], b'053008')
         ):
             self.assertEqual(pack(fmt, *args), res)
 
@@ -41,3 +53,35 @@ class ProtocolTest(unittest.TestCase):
             ('x8YC', b':01234500?', (0, 1, 2, 3, 4, 5, 0, 0)),
         ):
             self.assertEqual(unpack(fmt, buf), res)
+
+
+class DecodeTest(unittest.TestCase):
+
+    def decode(self):
+        timers = protocol.decode_timers(FRAMES)
+        self.assertEqual([list(column) for column in timers[:4]], [
+            [0, 5], [1, 7], [226287, 0xfedcba98], [1, 3]
+        ])
+        self.assertEqual(timers.errors, 1)
+        status = protocol.decode_status(FRAMES)
+        self.assertEqual(list(status.frame), [1, 4])
+        self.assertEqual([list(column) for column in status.fuel],
+                         [[15, 1], [15, 2], [15, 3], [15, 4],
+                          [15, 5], [15, 6], [15, 7], [15, 8]])
+        self.assertEqual([list(column) for column in status[2:6]],
+                         [[0, 9], [3, 1], [0x81, 0x10], [8, 6]])
+        self.assertEqual(status.errors, 0)
+        empty = protocol.decode_timers(b'')
+        self.assertEqual([len(column) for column in empty[:4]], [0] * 4)
+
+    @unittest.skipIf(protocol.numpy is None, 'requires numpy')
+    def test_decode_numpy(self):
+        self.decode()
+
+    def test_decode_array(self):
+        numpy = protocol.numpy
+        protocol.numpy = None
+        try:
+            self.decode()
+        finally:
+            protocol.numpy = numpy
@@ -0,0 +1,108 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from carreralib import ControlUnit
+from carreralib.__main__ import diff_results, format_result, parse_result, reprocess_archive
+from carreralib.archive import ArchiveWriter
+
+
+def at(seconds):
+    return datetime(1970, 1, 1, 0, 0, seconds)
+
+
+class ResultFormatTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        finished_at = datetime(2020, 2, 20, 12, 0, 0, 123456)
+        line = format_result('Alice', 8000, finished_at, [4000, 4000])
+        self.assertEqual(line, 'Alice, 8000, 2020-02-20 12:00:00.123456, 4000 4000\n')
+        self.assertEqual(parse_result(line), ('Alice', 8000, finished_at, [4000, 4000]))
+
+    def test_heat(self):
+        finished_at = datetime(2020, 2, 20, 12, 0, 0, 123456)
+        line = format_result('Alice', 8000, finished_at, [4000, 4000], 'abc')
+        self.assertTrue(line.endswith(', 4000 4000, abc\n'))
+        self.assertEqual(parse_result(line), ('Alice', 8000, finished_at, [4000, 4000]))
+
+    def test_no_laps(self):
+        finished_at = datetime(2020, 2, 20, 12, 0, 0, 123456)
+        line = 'Alice, 8000, 2020-02-20 12:00:00.123456\n'
+        self.assertEqual(parse_result(line), ('Alice', 8000, finished_at, []))
+
+
+class DiffResultsTest(unittest.TestCase):
+
+    def test_match(self):
+        stored = [('Alice', 8000, at(9), [4000, 4000])]
+        regenerated = [('Alice', 8000, at(12), [4000, 4000])]
+        self.assertEqual(diff_results(stored, regenerated, [(0, 20)], tolerance=5),
+                         ([], [], []))
+
+    def test_tolerance(self):
+        stored = [('Alice', 8000, at(9), [4000, 4000])]
+        regenerated = [('Alice', 8000, at(15), [4000, 4000])]
+        changed, added, missing = diff_results(stored, regenerated, [(0, 20)], tolerance=5)
+        self.assertEqual(changed, [])
+        self.assertEqual(added, regenerated)
+        self.assertEqual(missing, stored)
+
+    def test_changed(self):
+        stored = [('Alice', 8000, at(9), [4000, 4000]), ('Bob', 9000, at(10), [4500, 4500])]
+        regenerated = [('Alice', 8100, at(9), [4000, 4100]), ('Bob', 9000, at(10), [4500, 4500])]
+        changed, added, missing = diff_results(stored, regenerated, [(0, 20)])
+        self.assertEqual(changed, [(stored[0], regenerated[0])])
+        self.assertEqual((added, missing), ([], []))
+
+    def test_closest(self):
+        stored = [('Alice', 8000, at(5), [4000, 4000]), ('Alice', 7000, at(9), [3500, 3500])]
+        regenerated = [('Alice', 7000, at(8), [3500, 3500])]
+        changed, added, missing = diff_results(stored, regenerated, [(0, 20)])
+        self.assertEqual((changed, added), ([], []))
+        self.assertEqual(missing, [stored[0]])
+
+    def test_missing_outside_heats(self):
+        stored = [('Alice', 8000, at(9), [4000, 4000]), ('Bob', 9000, at(40), [4500, 4500])]
+        changed, added, missing = diff_results(stored, [], [(0, 20)], tolerance=5)
+        self.assertEqual(missing, stored[:1])
+
+
+class ReprocessArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'session.crla')
+        writer = ArchiveWriter(self.path, clock=lambda: 0.0)
+        writer.heat(['Alice', 'Bob'])
+        for address, timestamp, hosttime in [(0, 0, 1.0), (1, 500, 1.5), (0, 4000, 5.0),
+                                             (1, 5000, 6.0), (0, 8000, 9.0), (1, 9500, 10.5)]:
+            writer.write(ControlUnit.Timer(address, timestamp, 1), hosttime)
+        writer.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_reprocess(self):
+        results, heats = reprocess_archive(self.path, laps=2)
+        self.assertEqual(results, [
+            ('Alice', 8000, at(9), [4000, 4000]),
+            ('Bob', 9000, datetime(1970, 1, 1, 0, 0, 10, 500000), [4500, 4500]),
+        ])
+        self.assertEqual(len(heats), 1)
+        self.assertEqual(heats[0][0], 0.0)
+        self.assertEqual(diff_results(results, results, heats), ([], [], []))
+
+    def test_laps(self):
+        results, heats = reprocess_archive(self.path, laps=3)
+        self.assertEqual(results, [])
+        results, heats = reprocess_archive(self.path, laps=1)
+        self.assertEqual([(name, total) for name, total, _, _ in results],
+                         [('Alice', 4000), ('Bob', 4500)])
+
+
+if __name__ == '__main__':
+    unittest.main()
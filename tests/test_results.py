@@ -0,0 +1,160 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from webapp.results import (CsvSource, DatastoreSource, Result, ResultIndex,
+                            decode_cursor, encode_cursor)
+
+
+def result(username, total, minute=0):
+    return Result(username, total, datetime(2020, 2, 20, 12, minute), [total], total)
+
+
+class FakeQuery(object):
+
+    def __init__(self, entities):
+        self.entities = entities
+        self.filters = []
+        self.order = []
+
+    def add_filter(self, name, op, value):
+        self.filters.append((name, op, value))
+
+    def fetch(self, limit=None):
+        entities = self.entities
+        for name, op, value in self.filters:
+            assert op == '>='
+            entities = [e for e in entities if e[name] >= value]
+        return entities[:limit]
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.entities = []
+
+    def query(self, kind):
+        return FakeQuery(self.entities)
+
+    def put(self, result):
+        self.entities.append(result._asdict())
+
+
+class CursorTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        self.assertEqual(decode_cursor(encode_cursor((1234, 'alice'))), (1234, 'alice'))
+
+    def test_invalid(self):
+        for cursor in ['', 'not a cursor', 'é', encode_cursor({'a': 1}),
+                       encode_cursor(['x']), encode_cursor([1, 2]),
+                       encode_cursor(['x', 'y']), encode_cursor([True, 'x']),
+                       encode_cursor([1.5, 'x']), encode_cursor([1, 'x', 'y'])]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class ResultIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ResultIndex()
+        for r in [result('carol', 30), result('alice', 20), result('bob', 25),
+                  result('alice', 10, 1), result('alice', 15, 2), result('bob', 40, 3)]:
+            self.index.add(r)
+
+    def test_standings(self):
+        page, cursor = self.index.standings(limit=2)
+        self.assertEqual([(rank, r.username, r.time) for rank, r in page],
+                         [(1, 'alice', 10), (2, 'bob', 25)])
+        page, cursor = self.index.standings(cursor, limit=2)
+        self.assertEqual([(rank, r.username) for rank, r in page], [(3, 'carol')])
+        self.assertIsNone(cursor)
+        self.assertEqual(len(self.index), 3)
+
+    def test_history(self):
+        page, cursor = self.index.history('alice', limit=2)
+        self.assertEqual([r.time for r in page], [10, 15])
+        page, cursor = self.index.history('alice', cursor, limit=2)
+        self.assertEqual([r.time for r in page], [20])
+        self.assertIsNone(cursor)
+        self.assertEqual(self.index.history('dave'), ([], None))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            self.index.standings(encode_cursor(['x']))
+        with self.assertRaises(ValueError):
+            self.index.history('alice', encode_cursor([None, None]))
+
+    def test_version(self):
+        version = self.index.version
+        self.index.add(result('dave', 50))
+        self.assertGreater(self.index.version, version)
+
+
+class CsvSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'results.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def append(self, data):
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def test_refresh(self):
+        source = CsvSource(self.path)
+        self.assertEqual(len(source.refresh(interval=0)), 0)
+        self.append(b'alice, 8000, 2020-02-20 12:00:00.000000, 4000 4000\n'
+                    b'bob, 9000, 2020-02-20 12:01:00.000000\ncarol, 7')
+        self.assertEqual(len(source.refresh(interval=0)), 2)
+        self.append(b'000, 2020-02-20 12:02:00.000000, 3500 3500\n')
+        index = source.refresh(interval=0)
+        self.assertEqual([r.username for _, r in index.standings()[0]], ['carol', 'alice', 'bob'])
+        self.assertEqual(index.history('bob')[0][0].laps, [])
+
+    def test_invalid(self):
+        source = CsvSource(self.path)
+        self.append(b'alice, 8000, 2020-02-20 12:00:00.000000, 4000 4000\n'
+                    b'bob, fast, 2020-02-20 12:01:00.000000\ndave\n'
+                    b'carol, 7000, 2020-02-20 12:02:00.000000, 3500 3500\n')
+        with self.assertLogs('webapp.results', 'WARNING') as logs:
+            index = source.refresh(interval=0)
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual([r.username for _, r in index.standings()[0]], ['carol', 'alice'])
+        # invalid rows are not read again
+        self.append(b'dave, 9000, 2020-02-20 12:03:00.000000, 4500 4500\n')
+        self.assertEqual(len(source.refresh(interval=0)), 3)
+
+
+class DatastoreSourceTest(unittest.TestCase):
+
+    def test_refresh(self):
+        client = FakeClient()
+        source = DatastoreSource(client, overlap=timedelta(minutes=5))
+        client.put(result('alice', 20, 10))
+        client.put(result('bob', 25, 10))
+        index = source.refresh(interval=0)
+        self.assertEqual(len(index), 2)
+        # stored late, but within the overlap window
+        client.put(result('carol', 15, 7))
+        # finished at the same time as the latest result
+        client.put(result('dave', 30, 10))
+        index = source.refresh(interval=0)
+        self.assertEqual(len(index), 4)
+        page, _ = index.standings()
+        self.assertEqual([r.username for _, r in page], ['carol', 'alice', 'bob', 'dave'])
+        # results already added are not added twice
+        source.refresh(interval=0)
+        self.assertEqual(len(index.history('alice')[0]), 1)
+        self.assertEqual(len(index.history('carol')[0]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
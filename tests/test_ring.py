@@ -0,0 +1,133 @@
+from __future__ import unicode_literals
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from carreralib import ControlUnit
+from carreralib.pipeline import RemoteControlUnit, io_process, run_io
+from carreralib.profiling import Spans
+from carreralib.ring import RESET, Reset, RingReader, RingWriter
+from carreralib.simulator import SimulatorConnection
+
+
+class RingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'ring')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read(self):
+        writer = RingWriter(self.path, capacity=8)
+        timer = ControlUnit.Timer(1, 123456, 1)
+        status = ControlUnit.Status(
+            (15, 14, 13, 0, 0, 0, 0, 0), 9, 3,
+            (False, True, False, False, False, False, False, True), 8
+        )
+        writer.write(timer, 1.5)
+        reader = RingReader(self.path)
+        self.assertEqual(reader.read(), [])
+        writer.write(status, 2.0)
+        writer.write(RESET, 2.5)
+        writer.write(timer, 3.0)
+        self.assertEqual(reader.pending(), 3)
+        self.assertEqual(reader.read(2), [(status, 2.0), (RESET, 2.5)])
+        self.assertEqual(reader.read(), [(timer, 3.0)])
+        self.assertEqual(reader.read(), [])
+        self.assertEqual(reader.lost, 0)
+        reader.close()
+        writer.close(unlink=True)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_overrun(self):
+        writer = RingWriter(self.path, capacity=4)
+        reader = RingReader(self.path)
+        for n in range(10):
+            writer.write(ControlUnit.Timer(0, n, 1), n)
+        events = reader.read()
+        self.assertEqual([event.timestamp for event, _ in events], [6, 7, 8, 9])
+        self.assertEqual(reader.lost, 6)
+        reader.close()
+        writer.close()
+
+    def test_unsupported(self):
+        writer = RingWriter(self.path, capacity=4)
+        with self.assertRaises(TypeError):
+            writer.write(b'0')
+        writer.close()
+
+    def test_pipeline(self):
+        writer = RingWriter(self.path)
+        reader = RingReader(self.path)
+        conn = SimulatorConnection('sim:?cars=2&lap=0.1&jitter=0')
+        cu = ControlUnit(conn)
+        commands = queue.Queue()
+        stop = threading.Event()
+        thread = threading.Thread(target=run_io, args=(cu, writer, commands, stop))
+        thread.start()
+        try:
+            remote = RemoteControlUnit(reader, commands, alive=thread.is_alive)
+            self.assertIsInstance(remote.request(), ControlUnit.Status)
+            self.assertIsNotNone(remote.hosttime)
+            remote.reset()
+            remote.start()
+            events = []
+            while len(events) < 4:
+                event = remote.poll()
+                if isinstance(event, (ControlUnit.Timer, Reset)):
+                    events.append(event)
+            self.assertIs(events[0], RESET)
+            timers = [event for event in events if isinstance(event, ControlUnit.Timer)]
+            while len(timers) < 4:
+                event = remote.poll()
+                if isinstance(event, ControlUnit.Timer):
+                    timers.append(event)
+            self.assertEqual({timer.address for timer in timers}, {0, 1})
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(reader.lost, 0)
+        remote.close()
+        writer.close()
+
+    def test_io_process(self):
+        spans = Spans()
+        commands = queue.Queue()
+        stop, ready = threading.Event(), threading.Event()
+        thread = threading.Thread(target=io_process, args=(
+            'sim:?cars=2&lap=0.1&jitter=0', self.path, commands, stop, ready
+        ), kwargs={'spans': spans})
+        thread.start()
+        try:
+            self.assertTrue(ready.wait(5.0))
+            time.sleep(0.1)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertGreater(spans.report()['request']['count'], 1)
+
+    def test_remote_reset(self):
+        writer = RingWriter(self.path)
+        remote = RemoteControlUnit(RingReader(self.path), queue.Queue())
+        status = ControlUnit.Status((0,) * 8, 0, 0, (False,) * 8, 8)
+        timer = ControlUnit.Timer(0, 1000, 1)
+        writer.write(timer, 1.0)
+        writer.write(RESET, 2.0)
+        writer.write(status, 3.0)
+        writer.write(timer, 4.0)
+        self.assertEqual(remote.request(), status)
+        self.assertEqual(remote.hosttime, 3.0)
+        # the reset marker is kept for the next poll
+        self.assertIs(remote.poll(), RESET)
+        self.assertEqual(remote.hosttime, 2.0)
+        self.assertEqual(remote.poll(), timer)
+        self.assertEqual(remote.hosttime, 4.0)
+        remote.close()
+        writer.close()
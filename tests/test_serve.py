@@ -0,0 +1,97 @@
+from __future__ import unicode_literals
+
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from webapp.results import PAGE_SIZE
+from webapp.serve import Master, parse_bind, worker_address
+
+try:
+    from google.cloud import datastore
+except ImportError:
+    datastore = None
+
+
+def idle_worker(sock, cache, live_address, csv_path=None):
+    time.sleep(60)
+
+
+class ParseBindTest(unittest.TestCase):
+
+    def test_parse_bind(self):
+        self.assertEqual(parse_bind('127.0.0.1:5000'), ('127.0.0.1', 5000))
+        self.assertEqual(parse_bind(':8080'), ('0.0.0.0', 8080))
+        self.assertEqual(parse_bind('[::1]:5000'), ('::1', 5000))
+        self.assertEqual(worker_address('/tmp/live.sock', 2), '/tmp/live.sock.2')
+
+
+class MasterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.csv_path = os.path.join(self.tmpdir, 'results.csv')
+        self.master = Master(self.sock, 2, os.path.join(self.tmpdir, 'live.sock'),
+                             self.csv_path)
+
+    def tearDown(self):
+        self.master.stop()
+        for publisher in self.master.publishers:
+            publisher.close()
+        self.master.cache.close()
+        self.sock.close()
+        shutil.rmtree(self.tmpdir)
+
+    def wait_reaped(self, pid, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while pid in self.master.workers and time.monotonic() < deadline:
+            self.master.reap()
+            time.sleep(0.05)
+
+    @mock.patch('webapp.serve.run_worker', idle_worker)
+    def test_restart(self):
+        for number in range(2):
+            self.master.spawn(number)
+        self.assertEqual(sorted(self.master.workers.values()), [0, 1])
+        pid = next(pid for pid, number in self.master.workers.items() if number == 1)
+        os.kill(pid, signal.SIGKILL)
+        with self.assertLogs('webapp.serve', 'WARNING'):
+            self.wait_reaped(pid)
+        self.assertNotIn(pid, self.master.workers)
+        self.assertEqual(sorted(self.master.workers.values()), [0, 1])
+        pids = list(self.master.workers)
+        self.master.stop()
+        self.assertEqual(self.master.workers, {})
+        for pid in pids:
+            with self.assertRaises(ChildProcessError):
+                os.waitpid(pid, os.WNOHANG)
+
+    @unittest.skipIf(datastore is None, 'requires google-cloud-datastore')
+    def test_worker(self):
+        with open(self.csv_path, 'w') as f:
+            f.write('alice, 8000, 2020-02-20 12:00:00.000000, 4000 4000\n')
+        self.master.spawn(0)
+        connection = http.client.HTTPConnection(*self.sock.getsockname()[:2], timeout=5.0)
+        try:
+            connection.request('GET', '/csv/api/standings')
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            data = json.loads(response.read().decode('utf-8'))
+        finally:
+            connection.close()
+        self.assertEqual([r['username'] for r in data['results']], ['alice'])
+        # the first page is shared with other workers
+        key = json.dumps(['csv', ['standings'], PAGE_SIZE])
+        self.assertEqual(json.loads(self.master.cache.get(key)[1].decode('utf-8')), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from __future__ import unicode_literals
+
+import struct
+import unittest
+
+from webapp.sharedcache import SharedCache
+
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = [100.0]
+        self.cache = SharedCache(slots=4, slot_size=256, clock=lambda: self.now[0])
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_put(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.assertTrue(self.cache.put('a', b'data'))
+        self.now[0] += 1.5
+        self.assertEqual(self.cache.get('a'), (1.5, b'data'))
+        self.assertTrue(self.cache.put('a', b'new'))
+        self.assertEqual(self.cache.get('a'), (0.0, b'new'))
+        self.assertFalse(self.cache.put('a', b'x' * 256))
+        self.assertEqual(self.cache.get('a'), (0.0, b'new'))
+
+    def test_long_key(self):
+        key = 'k' * 100
+        self.cache.put(key, b'data')
+        self.assertEqual(self.cache.get(key)[1], b'data')
+        self.assertIsNone(self.cache.get('k' * 99))
+
+    def test_claim(self):
+        self.assertTrue(self.cache.claim('a', 2.0))
+        self.cache.put('a', b'data')
+        self.assertFalse(self.cache.claim('a', 2.0))
+        self.now[0] += 3.0
+        self.assertTrue(self.cache.claim('a', 2.0))
+        # other workers keep serving the claimed entry
+        self.assertFalse(self.cache.claim('a', 2.0))
+        self.assertEqual(self.cache.get('a'), (0.0, b'data'))
+
+    def test_stale_writer(self):
+        self.cache.put('a', b'data')
+        _, offset = self.cache._slot('a')
+        seq = struct.unpack_from('<I', self.cache._mmap, offset)[0]
+        self.assertFalse(seq & 1)
+        # a writer killed during an update leaves the sequence odd
+        struct.pack_into('<I', self.cache._mmap, offset, seq + 1)
+        self.assertIsNone(self.cache.get('a', maxretries=10))
+        self.assertTrue(self.cache.put('a', b'new'))
+        seq = struct.unpack_from('<I', self.cache._mmap, offset)[0]
+        self.assertFalse(seq & 1)
+        self.assertEqual(self.cache.get('a'), (0.0, b'new'))
+        struct.pack_into('<I', self.cache._mmap, offset, seq + 1)
+        self.assertTrue(self.cache.claim('a', 2.0))
+        self.assertIsNone(self.cache.get('a', maxretries=10))
+        self.assertFalse(struct.unpack_from('<I', self.cache._mmap, offset)[0] & 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from carreralib import ControlUnit, connection
+from carreralib.bench import bench, format_report
+from carreralib.logs import TraceWriter
+from carreralib.simulator import SimulatorConnection, parse_url
+
+
+class SimulatorTest(unittest.TestCase):
+
+    def test_parse_url(self):
+        self.assertEqual(parse_url('sim:?cars=4&lap=2.5', 'sim', cars=2,
+                                   lap=4.0, loop=False),
+                         ('', {'cars': 4, 'lap': 2.5, 'loop': False}))
+        self.assertEqual(parse_url('replay:x.trace?loop=1', 'replay',
+                                   loop=False),
+                         ('x.trace', {'loop': True}))
+        with self.assertRaises(ValueError):
+            parse_url('sim:?foo=1', 'sim', cars=2)
+
+    def test_race(self):
+        now = [0.0]
+        conn = SimulatorConnection('sim:?cars=2&lap=4.0&jitter=0',
+                                   clock=lambda: now[0])
+        cu = ControlUnit(conn)
+        self.assertEqual(cu.version(), b'5337')
+        self.assertIsInstance(cu.request(), ControlUnit.Status)
+        now[0] = 6.5
+        events = [cu.request() for _ in range(5)]
+        self.assertEqual(events[:4], [
+            ControlUnit.Timer(0, 2000, 1), ControlUnit.Timer(1, 2100, 1),
+            ControlUnit.Timer(0, 6000, 1), ControlUnit.Timer(1, 6100, 1)
+        ])
+        self.assertIsInstance(events[4], ControlUnit.Status)
+        cu.reset()
+        self.assertIsInstance(cu.request(), ControlUnit.Status)
+
+    def test_start_lights(self):
+        now = [0.0]
+        cu = ControlUnit(SimulatorConnection('sim:?cars=0',
+                                             clock=lambda: now[0]))
+        self.assertEqual(cu.request().start, 0)
+        cu.start()
+        self.assertEqual(cu.request().start, 1)
+        cu.start()
+        now[0] = 2.5
+        self.assertEqual(cu.request().start, 4)
+        now[0] = 6.0
+        self.assertEqual(cu.request().start, 0)
+
+    def test_loss(self):
+        cu = ControlUnit(SimulatorConnection('sim:?loss=1'))
+        with self.assertRaises(connection.TimeoutError):
+            cu.request()
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'trace')
+        trace = TraceWriter(self.path)
+        cu = ControlUnit(SimulatorConnection('sim:?cars=0'), trace=trace)
+        cu.version()
+        cu.request()
+        trace.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_replay(self):
+        cu = ControlUnit('replay:' + self.path)
+        self.assertEqual(cu.version(), b'5337')
+        self.assertIsInstance(cu.request(), ControlUnit.Status)
+        with self.assertRaises(EOFError):
+            cu.request()
+
+    def test_loop(self):
+        cu = ControlUnit('replay:%s?loop=1' % self.path)
+        for _ in range(3):
+            self.assertEqual(cu.version(), b'5337')
+            self.assertIsInstance(cu.request(), ControlUnit.Status)
+
+    def test_bench(self):
+        cu = ControlUnit('replay:%s?loop=1' % self.path)
+        report = bench(cu, duration=0.05, version_interval=2)
+        self.assertGreater(report['requests'], 0)
+        self.assertEqual(report['timeouts'], 0)
+        self.assertEqual(set(report['commands']), {'poll', 'version'})
+        self.assertIn('poll', format_report(report))
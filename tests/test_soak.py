@@ -0,0 +1,60 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from carreralib.soak import SoakMonitor, format_sample, rss
+
+
+class SoakTest(unittest.TestCase):
+
+    def test_rss(self):
+        self.assertGreater(rss(), 0)
+
+    def test_monitor(self):
+        now = [0.0]
+        monitor = SoakMonitor(warmup=10.0, clock=lambda: now[0])
+        monitor.start()
+        try:
+            for n in range(100):
+                monitor.record(0.001 * (n + 1))
+            now[0] = 5.0
+            sample = monitor.sample()
+            self.assertEqual(sample.count, 100)
+            self.assertAlmostEqual(sample.p50, 0.051)
+            self.assertAlmostEqual(sample.p99, 0.1)
+            self.assertIsNone(monitor.baseline)
+            self.assertEqual(monitor.check(max_p99=1.0), [])
+            self.assertIn('polls      100', format_sample(sample))
+
+            monitor.record(0.001)
+            now[0] = 10.0
+            baseline = monitor.sample()
+            self.assertIs(monitor.baseline, baseline)
+            self.assertEqual(monitor.check(max_rss=2**30, max_traced=2**30, max_p99=2.0), [])
+
+            leak = [bytearray(1024) for _ in range(1024)]
+            monitor.record(0.003)
+            now[0] = 15.0
+            monitor.sample()
+            failures = monitor.check(max_traced=2**19, max_p99=2.0)
+            self.assertEqual(len(failures), 2)
+            self.assertTrue(failures[0].startswith('Traced memory grew'))
+            self.assertTrue(failures[1].startswith('P99 latency grew'))
+            self.assertTrue(monitor.top())
+            report = monitor.report()
+            self.assertEqual(len(report['samples']), 3)
+            self.assertEqual(report['baseline']['elapsed'], 10.0)
+            del leak
+        finally:
+            monitor.stop()
+
+    def test_empty(self):
+        monitor = SoakMonitor(warmup=0.0, frames=0)
+        monitor.start()
+        sample = monitor.sample()
+        self.assertEqual(sample.count, 0)
+        self.assertIsNone(sample.p99)
+        self.assertEqual(sample.traced, 0)
+        self.assertEqual(monitor.check(max_p99=1.0), [])
+        self.assertEqual(monitor.top(), [])
+        monitor.stop()
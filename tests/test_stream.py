@@ -0,0 +1,39 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from webapp.stream import Broadcaster, event_stream
+
+
+class BroadcasterTest(unittest.TestCase):
+
+    def test_wait(self):
+        broadcaster = Broadcaster()
+        self.assertEqual(broadcaster.wait(0, timeout=0), (0, []))
+        broadcaster.publish({'type': 'lap', 'address': 0, 'laps': 1})
+        broadcaster.publish({'type': 'lap', 'address': 1, 'laps': 1})
+        broadcaster.publish({'type': 'lap', 'address': 0, 'laps': 2})
+        version, events = broadcaster.wait(0)
+        self.assertEqual(version, 3)
+        # coalesced per car, in the order of the latest updates
+        self.assertEqual(events, [{'type': 'lap', 'address': 1, 'laps': 1},
+                                  {'type': 'lap', 'address': 0, 'laps': 2}])
+        self.assertEqual(broadcaster.wait(2), (3, [events[1]]))
+        self.assertEqual(broadcaster.wait(3, timeout=0), (3, []))
+
+    def test_reset(self):
+        broadcaster = Broadcaster()
+        broadcaster.publish({'type': 'lap', 'address': 0, 'laps': 1})
+        broadcaster.publish({'type': 'reset'})
+        self.assertEqual(broadcaster.wait(0), (2, [{'type': 'reset'}]))
+
+    def test_event_stream(self):
+        broadcaster = Broadcaster()
+        stream = event_stream(broadcaster, keepalive=0)
+        self.assertEqual(next(stream), ': keepalive\n\n')
+        broadcaster.publish({'type': 'lap', 'address': 0})
+        self.assertEqual(next(stream), 'data: {"type":"lap","address":0}\n\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from carreralib import ControlUnit
+from carreralib.timing import Car, RaceTiming
+
+Timer = ControlUnit.Timer
+
+
+def status(fuel=(15,) * 8, pit=(False,) * 8):
+    return ControlUnit.Status(fuel, 0, 0, pit, 8)
+
+
+class RaceTimingTest(unittest.TestCase):
+
+    def test_standings(self):
+        timing = RaceTiming()
+        timing.handle(Timer(2, 1000, 1))
+        timing.handle(Timer(0, 1200, 1))
+        self.assertEqual(timing.start, 1000)
+        self.assertEqual([car.address for car in timing.standings], [2, 0])
+        timing.handle(Timer(0, 5200, 1))
+        self.assertEqual([car.address for car in timing.standings], [0, 2])
+        self.assertEqual([car.position for car in timing.standings], [1, 2])
+        timing.handle(Timer(7, 5300, 1))
+        timing.handle(Timer(2, 5400, 1))
+        self.assertEqual([car.address for car in timing.standings], [0, 2, 7])
+        self.assertEqual(timing.leader.laps.tolist(), [4000])
+        self.assertEqual(timing.cars[2].laps.tolist(), [4400])
+        self.assertIsNone(timing.cars[1].position)
+
+    def test_key(self):
+        timing = RaceTiming(key=lambda car: (car.laps.best or 10 ** 9,))
+        for timer in [Timer(0, 0, 1), Timer(1, 0, 1), Timer(0, 4000, 1),
+                      Timer(1, 3900, 1), Timer(0, 7800, 1)]:
+            timing.handle(timer)
+        self.assertEqual([car.address for car in timing.standings], [0, 1])
+
+    def test_lap_limit(self):
+        finished = []
+
+        class FinishingCar(Car):
+            def finish(self):
+                super(FinishingCar, self).finish()
+                finished.append(self.address)
+
+        timing = RaceTiming([FinishingCar(n) for n in range(2)], laps=2)
+        for timer in [Timer(0, 0, 1), Timer(1, 0, 1), Timer(0, 4000, 1),
+                      Timer(0, 8000, 1), Timer(1, 4500, 1)]:
+            timing.handle(timer)
+        self.assertEqual(finished, [0])
+        self.assertFalse(timing.finished)
+        self.assertIsNone(timing.handle(Timer(0, 12000, 1)))
+        self.assertEqual(len(timing.cars[0].laps), 2)
+        timing.handle(Timer(1, 9000, 1))
+        self.assertEqual(finished, [0, 1])
+        self.assertTrue(timing.finished)
+
+    def test_duration(self):
+        timing = RaceTiming(duration=10000)
+        for timer in [Timer(0, 0, 1), Timer(1, 100, 1), Timer(0, 6000, 1),
+                      Timer(1, 6500, 1), Timer(0, 12000, 1)]:
+            timing.handle(timer)
+        self.assertTrue(timing.cars[0].finished)
+        self.assertFalse(timing.cars[1].finished)
+        timing.handle(Timer(1, 12900, 1))
+        self.assertTrue(timing.finished)
+        self.assertEqual(timing.elapsed(12900), 12900)
+
+    def test_sectors(self):
+        timing = RaceTiming()
+        car = timing.handle(Timer(3, 1000, 2))
+        self.assertEqual(car.splits, [None, None, None])
+        for timer in [Timer(3, 2000, 1), Timer(3, 3500, 2),
+                      Timer(3, 4700, 3), Timer(3, 6000, 1)]:
+            timing.handle(timer)
+        self.assertEqual(car.splits, [1300, 1500, 1200])
+        self.assertEqual(car.laps.tolist(), [4000])
+        timing.handle(Timer(3, 7000, 2))
+        self.assertEqual(car.splits, [1300, 1000, 1200])
+        self.assertEqual(car.best_splits, [1300, 1000, 1200])
+
+    def test_status(self):
+        timing = RaceTiming()
+        pit = (False, True) + (False,) * 6
+        timing.handle(status(fuel=(15, 8) + (0,) * 6, pit=pit))
+        timing.handle(status(pit=pit))
+        timing.handle(status())
+        timing.handle(status(pit=pit))
+        self.assertEqual(timing.cars[1].pits, 2)
+        self.assertTrue(timing.cars[1].pit)
+        self.assertEqual(timing.cars[1].fuel, 15)
+        self.assertEqual(timing.cars[0].pits, 0)
+
+    def test_reset(self):
+        timing = RaceTiming()
+        timing.handle(Timer(0, 0, 1))
+        timing.handle(Timer(0, 4000, 1))
+        timing.reset()
+        self.assertIsNone(timing.start)
+        self.assertEqual(timing.standings, [])
+        self.assertEqual(len(timing.cars[0].laps), 0)
+        self.assertIsNone(timing.cars[0].position)
+
+    def test_timer_restart(self):
+        car = Car(0)
+        car.newlap(Timer(0, 5000, 1))
+        car.newlap(Timer(0, 9000, 1))
+        # CU reset, timer wrap or replay starting over
+        car.newlap(Timer(0, 100, 1))
+        self.assertEqual(car.laps.tolist(), [4000])
+        self.assertEqual(car.time, 100)
+        car.newlap(Timer(0, 4200, 1))
+        self.assertEqual(car.laps.tolist(), [4000, 4100])
+
+    def test_heat(self):
+        timing = RaceTiming()
+        heat = timing.heat
+        self.assertEqual({car.heat for car in timing.cars}, {heat})
+        timing.handle(Timer(0, 0, 1))
+        self.assertEqual(timing.heat, heat)
+        timing.reset()
+        self.assertNotEqual(timing.heat, heat)
+        self.assertEqual({car.heat for car in timing.cars}, {timing.heat})
@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from carreralib.tower import PositionTower
+
+
+class Car(object):
+
+    def __init__(self, address):
+        self.address = address
+
+
+class FakeControlUnit(object):
+
+    def __init__(self):
+        self.writes = []
+        self.cleared = 0
+
+    def clrpos(self):
+        self.cleared += 1
+
+    def setwords(self, words):
+        self.writes.extend(words)
+
+
+class PositionTowerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cu = FakeControlUnit()
+        self.tower = PositionTower(self.cu, interval=1.0,
+                                   clock=lambda: self.now)
+
+    def test_flush(self):
+        self.tower.update([Car(2), Car(0)], 1)
+        self.assertEqual(self.tower.flush(), 4)
+        self.assertEqual(self.cu.writes, [
+            (6, 2, 1), (6, 0, 2), (17, 7, 0), (18, 7, 1)
+        ])
+        self.assertEqual(self.tower.flush(), 0)
+
+    def test_coalesce(self):
+        self.tower.update([Car(2), Car(0)], 1)
+        self.tower.flush()
+        del self.cu.writes[:]
+        self.now = 0.5
+        self.tower.update([Car(0), Car(2)], 2)
+        self.tower.update([Car(0), Car(2), Car(1)], 2)
+        self.assertEqual(self.tower.flush(), 0)
+        self.now = 1.0
+        self.assertEqual(self.tower.flush(), 4)
+        self.assertEqual(self.cu.writes, [
+            (6, 0, 1), (6, 2, 2), (6, 1, 3), (18, 7, 2)
+        ])
+
+    def test_maxwrites(self):
+        self.tower.maxwrites = 3
+        self.tower.update([Car(n) for n in range(8)], 17)
+        self.assertEqual(self.tower.flush(), 3)
+        self.assertEqual(self.tower.flush(force=True), 3)
+        self.assertEqual(self.tower.flush(force=True), 3)
+        self.assertEqual(self.tower.flush(force=True), 1)
+        self.assertEqual(self.cu.writes[-1], (18, 7, 1))
+        self.assertEqual(self.tower.pending(), [])
+
+    def test_clear(self):
+        self.tower.update([Car(0)], 260)
+        self.assertEqual(self.tower.pending(), [
+            (6, 0, 1), (17, 7, 0), (18, 7, 10)
+        ])
+        self.tower.flush()
+        self.tower.clear()
+        self.assertEqual(self.cu.cleared, 1)
+        self.assertEqual(self.tower.pending(), [])
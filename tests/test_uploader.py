@@ -0,0 +1,72 @@
+from __future__ import unicode_literals
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from carreralib.__main__ import ResultUploader
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(data['results'])
+        usernames = [result['username'] for result in data['results']]
+        if 'invalid' in usernames:
+            self.send_response(400)
+        elif 'busy' in usernames and len(self.server.requests) < 3:
+            self.send_response(503)
+        else:
+            self.server.accepted.extend(usernames)
+            self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ResultUploaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.server.requests = []
+        self.server.accepted = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/api/results' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def upload(self, usernames):
+        uploader = ResultUploader(self.url, 'station', interval=0.01, maxbatch=1)
+        for username in usernames:
+            uploader.submit({'username': username})
+        deadline = time.monotonic() + 10
+        while len(self.server.accepted) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        uploader.close(timeout=10)
+        self.assertFalse(uploader.thread.is_alive())
+        return uploader
+
+    def test_rejected(self):
+        uploader = self.upload(['invalid', 'alice', 'bob'])
+        self.assertEqual(self.server.accepted, ['alice', 'bob'])
+        self.assertEqual(uploader.pending, [])
+
+    def test_retry(self):
+        uploader = self.upload(['busy', 'alice'])
+        self.assertEqual(self.server.accepted, ['busy', 'alice'])
+        # retried until the server is no longer busy
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(uploader.pending, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
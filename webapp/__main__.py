@@ -1,56 +1,288 @@
-import csv
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
 
 from flask import Flask
+from flask import Response
+from flask import abort
+from flask import jsonify
 from flask import render_template
+from flask import request
 
 from google.cloud import datastore
 from google.oauth2 import service_account
 
+from carreralib.live import DEFAULT_ADDRESS
+from carreralib.livestate import LiveStateReader
+from webapp import results as results_store
+from webapp.assets import Assets
+from webapp.ingest import Ingestor
+from webapp.stream import Broadcaster, event_stream
+
 
-credentials = service_account.Credentials \
-    .from_service_account_file('./bigdatatech-warsaw-challenge-219525419ec7.json')
-client = datastore.Client(project=credentials.project_id, credentials=credentials)
 app = Flask(__name__,
     static_url_path='/static'
 )
+assets = Assets(app)
+broadcaster = Broadcaster()
+listener_lock = threading.Lock()
+listener = None
+live_address = DEFAULT_ADDRESS
+state_reader = None
+stats_cache = {}
+STATS_CACHE_TTL = 30
+client = None
+client_lock = threading.Lock()
+sources = {}
+sources_lock = threading.Lock()
+page_cache = OrderedDict()
+page_cache_lock = threading.Lock()
+PAGE_CACHE_SIZE = 256
+# set by webapp.serve to share first pages between worker processes
+shared_cache = None
+
+
+def datastore_client():
+    # created on first use, i.e. after forking in each server worker
+    global client
+    with client_lock:
+        if client is None:
+            if os.environ.get('DATASTORE_EMULATOR_HOST'):
+                # local emulator, e.g. loaded with webapp.loadtest fixtures
+                client = datastore.Client(
+                    project=os.environ.get('DATASTORE_PROJECT_ID', 'carreralib')
+                )
+            else:
+                credentials = service_account.Credentials \
+                    .from_service_account_file('./bigdatatech-warsaw-challenge-219525419ec7.json')
+                client = datastore.Client(project=credentials.project_id,
+                                          credentials=credentials)
+        return client
+
+
+def source(name):
+    with sources_lock:
+        if name not in sources:
+            if name == 'datastore':
+                sources[name] = results_store.DatastoreSource(datastore_client())
+            elif name == 'csv':
+                sources[name] = results_store.CsvSource()
+            else:
+                sources[name] = Ingestor()
+        return sources[name]
+
 
 @app.route("/")
 def data_store():
-    query = client.query(kind="race_results")
-    query.order = ['time']
-
-    results = query.fetch(limit=200)
-    results = deduplicate_results(results)
-    return render_template('index.html', results=results[:10])
+    return render_template('index.html', results=leaderboard('datastore'))
 
 
 @app.route("/csv")
 def csv_store():
-    results = list()
-    with open('results.csv', newline='') as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
+    return render_template('index.html', results=leaderboard('csv'))
+
+
+@app.route("/global")
+def global_store():
+    return render_template('index.html', results=leaderboard('global'))
+
+
+@app.route("/api/results", methods=['POST'])
+def ingest_results():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('results'), list):
+        return jsonify(error='Expected a JSON object with station and results'), 400
+    try:
+        batch_id = source('global').submit(data.get('station'), data['results'])
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except queue.Full:
+        return jsonify(error='Too many pending batches'), 503
+    return jsonify(batch=batch_id, status='pending'), 202
+
+
+@app.route("/api/batches/<batch_id>")
+def batch_status(batch_id):
+    status = source('global').status(batch_id)
+    if status is None:
+        abort(404)
+    return jsonify(batch=batch_id, **status)
+
+
+@app.route("/api/standings")
+def api_standings():
+    return standings_page('datastore')
+
+
+@app.route("/csv/api/standings")
+def csv_api_standings():
+    return standings_page('csv')
+
+
+@app.route("/global/api/standings")
+def global_api_standings():
+    return standings_page('global')
+
+
+@app.route("/api/users/<username>/history")
+def api_history(username):
+    return history_page('datastore', username)
+
+
+@app.route("/csv/api/users/<username>/history")
+def csv_api_history(username):
+    return history_page('csv', username)
+
+
+@app.route("/global/api/users/<username>/history")
+def global_api_history(username):
+    return history_page('global', username)
+
+
+def leaderboard(name, limit=10):
+    if shared_cache is not None:
+        return json.loads(shared_page(name, ('standings',), limit, standings))['results']
+    results, _ = source(name).refresh().standings(limit=limit)
+    return [result for _, result in results]
+
+
+def standings(index, after, limit):
+    results, cursor = index.standings(after, limit)
+    return {
+        'results': [dict(result_json(result), rank=rank) for rank, result in results],
+        'next': cursor,
+    }
+
+
+def standings_page(name):
+    return paginate(name, ('standings',), standings)
+
+
+def history_page(name, username):
+    def page(index, after, limit):
+        results, cursor = index.history(username, after, limit)
+        return {
+            'username': username,
+            'results': [result_json(result) for result in results],
+            'next': cursor,
+        }
+    return paginate(name, ('history', username), page)
+
+
+def paginate(name, kind, page):
+    after = request.args.get('after') or None
+    try:
+        limit = results_store.page_size(request.args.get('limit'))
+    except ValueError:
+        abort(400)
+    if after is not None:
+        try:
+            return jsonify(page(source(name).refresh(), after, limit))
+        except ValueError:
+            abort(400)
+    if shared_cache is not None:
+        return Response(shared_page(name, kind, limit, page), mimetype='application/json')
+    # first pages are requested most often, so keep them until the
+    # index changes
+    index = source(name).refresh()
+    key = (name, kind, limit)
+    with page_cache_lock:
+        cached = page_cache.get(key)
+        if cached is None or cached[0] is not index or cached[1] != index.version:
+            cached = (index, index.version, page(index, None, limit))
+            page_cache[key] = cached
+            if len(page_cache) > PAGE_CACHE_SIZE:
+                page_cache.popitem(last=False)
+        else:
+            page_cache.move_to_end(key)
+    return jsonify(cached[2])
+
+
+def shared_page(name, kind, limit, page):
+    # a first page rendered by any worker is served by all of them for
+    # up to REFRESH_INTERVAL; once stale, a single worker renders it
+    # again while the others keep serving the stale page
+    key = json.dumps([name, kind, limit])
+    cached = shared_cache.get(key)
+    if cached is None or (cached[0] >= results_store.REFRESH_INTERVAL
+                          and shared_cache.claim(key, results_store.REFRESH_INTERVAL)):
+        data = json.dumps(page(source(name).refresh(), None, limit)).encode('utf-8')
+        shared_cache.put(key, data)
+        return data
+    return cached[1]
+
+
+def result_json(result):
+    return {
+        'username': result.username,
+        'time': result.time,
+        'finished_at': result.finished_at.isoformat() if result.finished_at else None,
+        'laps': result.laps,
+        'best_lap': result.best_lap,
+    }
+
+
+@app.route("/stats")
+def stats():
+    return render_stats('datastore', lambda: results_store.fetch_datastore(datastore_client()))
+
+
+@app.route("/csv/stats")
+def csv_stats():
+    return render_stats('csv', results_store.read_csv)
+
+
+def render_stats(source, load):
+    from webapp.analytics import LapAnalytics
+
+    cached = stats_cache.get(source)
+    if cached is None or time.monotonic() - cached[0] > STATS_CACHE_TTL:
+        analytics = LapAnalytics(load())
+        lap_curve, attempt_curve = analytics.improvement()
+        cached = (time.monotonic(), {
+            'event': analytics.event_stats(),
+            'drivers': analytics.driver_stats(),
+            'lap_curve': lap_curve.tolist(),
+            'attempt_curve': attempt_curve.tolist(),
+        })
+        stats_cache[source] = cached
+    return render_template('stats.html', **cached[1])
 
-        for row in reader:
-            results.append({
-                'username' : row[0],
-                'time' : int(row[1])
-            })
 
-    results.sort(key=lambda result: result['time'],reverse=False)
-    results = deduplicate_results(results)
-    return render_template('index.html', results=results[:10])
+@app.route("/live")
+def live():
+    return render_template('live.html')
 
 
-def deduplicate_results(results):
-    deduplication_info = set()
-    deduplicated_results = list()
+@app.route("/stream")
+def stream():
+    global listener
+    with listener_lock:
+        if listener is None:
+            listener = broadcaster.listen(live_address)
+    return Response(event_stream(broadcaster), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    for result in results:
-        if result['username'] not in deduplication_info:
-            deduplicated_results.append(result)
-            deduplication_info.add(result['username'])
 
-    return deduplicated_results
+@app.route("/state")
+def state():
+    global state_reader
+    if state_reader is None:
+        try:
+            state_reader = LiveStateReader()
+        except (OSError, ValueError):
+            return jsonify(error='No race running'), 404
+    snapshot = state_reader.snapshot()
+    if snapshot is None:
+        return jsonify(error='Live state unavailable'), 503
+    return jsonify(
+        start=snapshot.start,
+        mode=snapshot.mode,
+        cars=[car._asdict() for car in snapshot.cars],
+    )
 
 
 if __name__ == "__main__":
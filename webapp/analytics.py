@@ -0,0 +1,138 @@
+import array
+
+import numpy as np
+
+
+PERCENTILES = (10, 50, 90)
+
+
+class LapAnalytics:
+    """Vectorized lap time statistics over recorded results.
+
+    All laps are flattened into one array, together with the driver,
+    heat, lap number and attempt number of every lap, so statistics
+    are computed with a few NumPy operations regardless of the number
+    of drivers and heats.
+    """
+
+    def __init__(self, results):
+        results = sorted((result for result in results if result.laps),
+                         key=lambda result: (result.username, result.finished_at is None,
+                                             result.finished_at or 0))
+        usernames = []
+        counts = array.array('q')
+
+        def flatten():
+            # collect per-heat columns while NumPy consumes the laps
+            for result in results:
+                usernames.append(result.username)
+                counts.append(len(result.laps))
+                yield from result.laps
+
+        self.laps = np.fromiter(flatten(), dtype=np.float64)
+        counts = np.frombuffer(counts, dtype=np.int64) if counts else np.zeros(0, np.int64)
+        self.drivers, heat_driver = np.unique(np.array(usernames, dtype=str),
+                                              return_inverse=True)
+        self.heat = np.repeat(np.arange(len(results)), counts)
+        self.driver = np.repeat(heat_driver, counts)
+        # position of every lap within its heat and of every heat within
+        # the driver's attempts, both zero-based
+        starts = np.cumsum(counts) - counts
+        self.lap_number = np.arange(len(self.laps)) - np.repeat(starts, counts)
+        heat_starts = np.searchsorted(heat_driver, np.arange(len(self.drivers)))
+        attempt = np.arange(len(results)) - heat_starts[heat_driver]
+        self.attempt = np.repeat(attempt, counts)
+
+    def __len__(self):
+        return len(self.laps)
+
+    def event_stats(self, percentiles=PERCENTILES):
+        """Return the distribution of all lap times."""
+        laps = self.laps
+        if not len(laps):
+            return None
+        return {
+            'drivers': len(self.drivers),
+            'heats': int(self.heat[-1]) + 1,
+            'laps': len(laps),
+            'best': float(laps.min()),
+            'mean': float(laps.mean()),
+            'std': float(laps.std()),
+            'percentiles': dict(zip(percentiles, np.percentile(laps, percentiles).tolist())),
+        }
+
+    def driver_stats(self, percentiles=PERCENTILES):
+        """Return lap time statistics per driver, fastest mean first."""
+        n = len(self.drivers)
+        if not n:
+            return []
+        driver, laps = self.driver, self.laps
+        counts = np.bincount(driver, minlength=n)
+        sums = np.bincount(driver, weights=laps, minlength=n)
+        squares = np.bincount(driver, weights=laps * laps, minlength=n)
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0))
+        heats = np.bincount(driver[np.r_[True, self.heat[1:] != self.heat[:-1]]], minlength=n)
+        quantiles = self.group_percentiles(driver, laps, n, percentiles)
+        best = np.full(n, np.inf)
+        np.minimum.at(best, driver, laps)
+        outliers = np.bincount(driver, weights=self.outliers(), minlength=n)
+        stats = [
+            {
+                'username': str(self.drivers[i]),
+                'heats': int(heats[i]),
+                'laps': int(counts[i]),
+                'best': float(best[i]),
+                'mean': float(means[i]),
+                'std': float(stds[i]),
+                'percentiles': dict(zip(percentiles, quantiles[:, i].tolist())),
+                'outliers': int(outliers[i]),
+            }
+            for i in range(n)
+        ]
+        stats.sort(key=lambda stat: stat['mean'])
+        return stats
+
+    def improvement(self):
+        """Return mean lap time by lap number within a heat and by a
+        driver's attempt number, as two arrays.
+        """
+        return (self.group_means(self.lap_number), self.group_means(self.attempt))
+
+    def outliers(self, threshold=3.5):
+        """Return a boolean array marking outlier laps, e.g. crashes.
+
+        Laps are outliers if their modified z-score relative to the
+        driver's median and median absolute deviation exceeds
+        `threshold`.
+        """
+        n = len(self.drivers)
+        if not len(self.laps):
+            return np.zeros(0, dtype=bool)
+        driver, laps = self.driver, self.laps
+        medians = self.group_percentiles(driver, laps, n, (50,))[0]
+        deviations = np.abs(laps - medians[driver])
+        mads = self.group_percentiles(driver, deviations, n, (50,))[0]
+        scores = 0.6745 * deviations / np.maximum(mads[driver], 1.0)
+        return scores > threshold
+
+    def group_means(self, groups):
+        counts = np.bincount(groups)
+        sums = np.bincount(groups, weights=self.laps)
+        return sums / np.maximum(counts, 1)
+
+    @staticmethod
+    def group_percentiles(groups, values, n, percentiles):
+        """Return an array of `percentiles` of `values` per group, using
+        the nearest-rank method on one lexicographic sort.
+        """
+        order = np.lexsort((values, groups))
+        sorted_values = values[order]
+        counts = np.bincount(groups, minlength=n)
+        starts = np.cumsum(counts) - counts
+        result = np.full((len(percentiles), n), np.nan)
+        present = counts > 0
+        for row, p in enumerate(percentiles):
+            index = starts + np.floor((counts - 1) * p / 100).astype(np.int64)
+            result[row, present] = sorted_values[index[present]]
+        return result
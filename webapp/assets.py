@@ -0,0 +1,254 @@
+"""Fingerprinted, precompressed static assets.
+
+Build them from ``webapp/static`` with::
+
+    python -m webapp.assets
+
+or let the webapp build them on startup whenever the static files
+changed.  If the build directory is not writable, e.g. on a read-only
+deployment, the last build is served, or the static files if there
+is none.  Every asset is written under a name containing a hash of
+its content, together with gzip and brotli variants.  Smaller
+variants of raster images are generated with Pillow for ``srcset``
+attributes and media queries.  Both ``brotli`` and Pillow are
+optional, but a warning is logged when building without them.  Since
+names change with content, assets are served with immutable cache
+headers.
+
+Templates refer to assets with ``asset_url(name)``, and to image
+variants with ``asset_srcset(name)`` or ``asset_sizes(name)``.
+
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import abort
+from flask import request
+from flask import send_from_directory
+from flask import url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+DIST_DIR = os.path.join(os.path.dirname(__file__), 'dist')
+MANIFEST_FILE = 'manifest.json'
+URL_PREFIX = '/assets'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+IMAGE_WIDTHS = (320, 640, 960, 1440)
+IMAGE_TYPES = ('.jpg', '.jpeg', '.png')
+COMPRESS_TYPES = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+MIN_COMPRESS_SIZE = 256
+
+_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(name, data):
+    base, ext = os.path.splitext(name)
+    return '%s.%s%s' % (base, hashlib.sha256(data).hexdigest()[:12], ext)
+
+
+def build(source=STATIC_DIR, dest=DIST_DIR):
+    """Build the assets in `source` into `dest` and return the manifest."""
+    if brotli is None:
+        logger.warning('brotli is not installed, building assets without brotli variants')
+    if Image is None:
+        logger.warning('Pillow is not installed, building assets without image variants')
+    os.makedirs(dest, exist_ok=True)
+    files, sizes, encodings = {}, {}, {}
+    names = [name for name in os.listdir(source) if os.path.isfile(os.path.join(source, name))]
+    # stylesheets refer to other assets, so build them last
+    for name in sorted(names, key=lambda name: (name.endswith('.css'), name)):
+        with open(os.path.join(source, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = _rewrite_urls(data.decode('utf-8'), files).encode('utf-8')
+        files[name] = _write(dest, fingerprint(name, data), data, encodings)
+        if Image is not None and name.lower().endswith(IMAGE_TYPES):
+            sizes[name] = _resize(dest, name, data, files[name], encodings)
+    manifest = {'files': files, 'sizes': sizes, 'encodings': encodings}
+    path = os.path.join(dest, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def outdated(source=STATIC_DIR, dest=DIST_DIR):
+    """Return True if any asset in `source` changed since the last build."""
+    try:
+        built = os.path.getmtime(os.path.join(dest, MANIFEST_FILE))
+    except OSError:
+        return True
+    with os.scandir(source) as entries:
+        return any(entry.stat().st_mtime > built for entry in entries if entry.is_file())
+
+
+def _rewrite_urls(css, files):
+    def replace(match):
+        quote, url = match.groups()
+        name = posixpath.normpath(url.strip())
+        if name not in files:
+            return match.group(0)
+        return 'url(%s%s%s)' % (quote, files[name], quote)
+    return _URL.sub(replace, css)
+
+
+def _write(dest, target, data, encodings):
+    # names depend on content, so existing files are up to date
+    path = os.path.join(dest, target)
+    if not os.path.exists(path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    if target.endswith(COMPRESS_TYPES) and len(data) >= MIN_COMPRESS_SIZE:
+        variants = [('gzip', '.gz', lambda: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.insert(0, ('br', '.br', lambda: brotli.compress(data)))
+        for encoding, ext, compress in variants:
+            if not os.path.exists(path + ext):
+                compressed = compress()
+                if len(compressed) >= len(data):
+                    continue
+                with open(path + ext + '.tmp', 'wb') as f:
+                    f.write(compressed)
+                os.replace(path + ext + '.tmp', path + ext)
+            encodings.setdefault(target, []).append(encoding)
+    return target
+
+
+def _resize(dest, name, data, target, encodings):
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    base, ext = os.path.splitext(name)
+    result = []
+    for size in IMAGE_WIDTHS:
+        if size >= width:
+            break
+        scaled = max(1, round(height * size / width))
+        resized = image.resize((size, scaled), Image.LANCZOS)
+        buf = io.BytesIO()
+        if image.format == 'JPEG':
+            resized.save(buf, 'JPEG', quality=80, optimize=True, progressive=True)
+        else:
+            resized.save(buf, image.format, optimize=True)
+        variant = buf.getvalue()
+        variant_name = fingerprint('%s-%dw%s' % (base, size, ext), variant)
+        result.append([size, scaled, _write(dest, variant_name, variant, encodings)])
+    result.append([width, height, target])
+    return result
+
+
+class Assets:
+    """Serve built assets from a Flask app, building them on startup if
+    the static files changed and `dest` is writable.
+    """
+
+    def __init__(self, app=None, source=STATIC_DIR, dest=DIST_DIR):
+        self.source = source
+        self.dest = dest
+        self.manifest = {'files': {}, 'sizes': {}, 'encodings': {}}
+        self._targets = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        try:
+            if outdated(self.source, self.dest):
+                self.manifest = build(self.source, self.dest)
+            else:
+                self.manifest = self.load()
+        except OSError as e:
+            logger.warning('Failed to build assets in %s: %s', self.dest, e)
+            try:
+                self.manifest = self.load()
+            except (OSError, ValueError):
+                logger.warning('Serving static files instead of built assets')
+        self._targets = set(self.manifest['files'].values())
+        for variants in self.manifest['sizes'].values():
+            self._targets.update(target for _, _, target in variants)
+        app.add_url_rule(URL_PREFIX + '/<path:filename>', 'assets', self.send)
+        app.context_processor(lambda: {
+            'asset_url': self.url,
+            'asset_srcset': self.srcset,
+            'asset_sizes': self.sizes,
+        })
+
+    def load(self):
+        """Return the manifest of the last build."""
+        with open(os.path.join(self.dest, MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def url(self, name):
+        """Return the URL of the asset `name`, or of the static file if
+        it has not been built.
+        """
+        target = self.manifest['files'].get(name)
+        if target is None:
+            return url_for('static', filename=name)
+        return '%s/%s' % (URL_PREFIX, target)
+
+    def sizes(self, name):
+        """Return ``(width, height, url)`` tuples of the variants of image
+        `name`, smallest first.
+        """
+        return [(width, height, '%s/%s' % (URL_PREFIX, target))
+                for width, height, target in self.manifest['sizes'].get(name, ())]
+
+    def srcset(self, name):
+        """Return a ``srcset`` attribute value for image `name`, which
+        is empty if no variants have been built.
+        """
+        return ', '.join('%s %dw' % (url, width) for width, _, url in self.sizes(name))
+
+    def send(self, filename):
+        if filename not in self._targets:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding in self.manifest['encodings'].get(filename, ()):
+            if request.accept_encodings[encoding]:
+                response = send_from_directory(
+                    self.dest, filename + ('.br' if encoding == 'br' else '.gz'),
+                    mimetype=mimetype
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.dest, filename, mimetype=mimetype)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m webapp.assets')
+    parser.add_argument('-s', '--source', default=STATIC_DIR, metavar='DIR')
+    parser.add_argument('-o', '--output', default=DIST_DIR, metavar='DIR')
+    args = parser.parse_args()
+    manifest = build(args.source, args.output)
+    for name, target in sorted(manifest['files'].items()):
+        variants = manifest['encodings'].get(target, []) + [
+            '%dw' % width for width, _, _ in manifest['sizes'].get(name, [])[:-1]
+        ]
+        print('%s -> %s %s' % (name, target, ' '.join(variants)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import fcntl
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from webapp.results import REFRESH_INTERVAL, Result, ResultIndex
+
+INGEST_JOURNAL_FILE = 'ingest.jsonl'
+MAX_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def parse_result(data):
+    """Parse a submitted result, raising :exc:`ValueError` if invalid."""
+    try:
+        laps = [int(lap) for lap in data.get('laps') or []]
+        finished_at = data.get('finished_at')
+        result = Result(
+            username=str(data['username']),
+            time=int(data['time']),
+            finished_at=datetime.fromisoformat(finished_at) if finished_at else None,
+            laps=laps,
+            best_lap=min(laps) if laps else None,
+        )
+        heat = str(data['heat'])
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError('Invalid result: %r' % e)
+    if not result.username or not heat:
+        raise ValueError('Invalid result: missing username or heat')
+    return heat, result
+
+
+class Ingestor:
+    """Merge batches of results submitted by several race stations into
+    one global index.
+
+    Batches are validated when submitted and queued; a background
+    thread drops results already submitted by the same station for the
+    same heat and username, adds the others to the index and appends
+    them to a journal, from which the index is restored on startup.
+    Submitters poll :meth:`status` for the outcome of a batch.
+
+    Several processes may share a journal: appends are serialized by
+    a file lock, and results journaled by other processes are added
+    to the index before merging a batch and on :meth:`refresh`.  The
+    status of every batch is journaled as well, so any process can
+    report it.
+
+    """
+
+    def __init__(self, journal=INGEST_JOURNAL_FILE, maxsize=256, maxstatus=4096):
+        self.index = ResultIndex()
+        self.journal = journal
+        self.queue = queue.Queue(maxsize)
+        self.maxstatus = maxstatus
+        self._seen = set()
+        self._status = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._journal_lock = threading.RLock()
+        self._offset = 0
+        self._refreshed = None
+        if journal and os.path.exists(journal):
+            with open(journal, 'rb') as f:
+                self._follow(f)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, station, results):
+        """Queue a batch of results of `station` and return its id.
+
+        Raises :exc:`ValueError` if the batch is invalid and
+        :exc:`queue.Full` if too many batches are pending.
+
+        """
+        if not station:
+            raise ValueError('Missing station')
+        if len(results) > MAX_BATCH_SIZE:
+            raise ValueError('Batch too large')
+        batch = [parse_result(result) for result in results]
+        with self._lock:
+            batch_id = '%s-%d' % (os.getpid(), next(self._ids))
+        status = {'status': 'pending', 'results': len(batch)}
+        # record the pending status before the batch can be merged
+        self._set_status(batch_id, status)
+        with self._journal_lock:
+            try:
+                self.queue.put_nowait((batch_id, str(station), batch))
+            except queue.Full:
+                with self._lock:
+                    self._status.pop(batch_id, None)
+                raise
+            self._journal(batch_id, status)
+        return batch_id
+
+    def status(self, batch_id):
+        """Return the status of a batch as a :class:`dict`, or None if
+        unknown.
+        """
+        with self._lock:
+            status = self._status.get(batch_id)
+        if self.journal and (status is None or status['status'] == 'pending'):
+            # the batch may have been submitted to or merged by another process
+            self.refresh(interval=0)
+            with self._lock:
+                status = self._status.get(batch_id)
+        return dict(status) if status is not None else None
+
+    def join(self):
+        """Wait until all submitted batches have been processed."""
+        self.queue.join()
+
+    def refresh(self, interval=REFRESH_INTERVAL):
+        if not self.journal:
+            return self.index
+        with self._journal_lock:
+            now = time.monotonic()
+            if self._refreshed is not None and now - self._refreshed < interval:
+                return self.index
+            self._refreshed = now
+            try:
+                with open(self.journal, 'rb') as f:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                    self._follow(f)
+            except FileNotFoundError:
+                pass
+        return self.index
+
+    def _set_status(self, batch_id, status):
+        with self._lock:
+            self._status[batch_id] = status
+            self._status.move_to_end(batch_id)
+            while len(self._status) > self.maxstatus:
+                self._status.popitem(last=False)
+
+    def _run(self):
+        while True:
+            batch_id, station, batch = self.queue.get()
+            try:
+                self._merge(batch_id, station, batch)
+            except Exception as e:
+                logger.error('Failed to ingest batch %s', batch_id, exc_info=e)
+                try:
+                    self._record(batch_id, {'status': 'failed', 'results': len(batch)})
+                except Exception as e:
+                    logger.error('Failed to record status of batch %s', batch_id, exc_info=e)
+            finally:
+                self.queue.task_done()
+
+    def _merge(self, batch_id, station, batch):
+        if not self.journal:
+            accepted = len(self._add(station, batch))
+            self._set_status(batch_id, _done(batch, accepted))
+            return
+        with self._journal_lock, open(self.journal, 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self._follow(f)
+            lines = self._add(station, batch)
+            status = _done(batch, len(lines))
+            self._set_status(batch_id, status)
+            self._append(f, lines + [_status_line(batch_id, status)])
+
+    def _record(self, batch_id, status):
+        self._set_status(batch_id, status)
+        self._journal(batch_id, status)
+
+    def _journal(self, batch_id, status):
+        if not self.journal:
+            return
+        with self._journal_lock, open(self.journal, 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self._follow(f)
+            self._append(f, [_status_line(batch_id, status)])
+
+    def _append(self, f, lines):
+        f.writelines(lines)
+        f.flush()
+        self._offset = f.tell()
+
+    def _add(self, station, batch):
+        lines = []
+        for heat, result in batch:
+            key = (station, heat, result.username)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.index.add(result)
+            lines.append(json.dumps({
+                'station': station,
+                'heat': heat,
+                'username': result.username,
+                'time': result.time,
+                'finished_at': result.finished_at.isoformat() if result.finished_at else None,
+                'laps': result.laps,
+            }).encode('utf-8') + b'\n')
+        return lines
+
+    def _follow(self, f):
+        # add results journaled since the last call, e.g. by other
+        # processes, leaving an incomplete last line for later
+        f.seek(self._offset)
+        data = f.read()
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            self._offset += len(line)
+            try:
+                data = json.loads(line)
+                if 'batch' in data:
+                    batch_id = data.pop('batch')
+                    self._set_status(batch_id, data)
+                    continue
+                heat, result = parse_result(data)
+            except (ValueError, TypeError):
+                # e.g. a partial line written before a crash
+                continue
+            key = (data.get('station'), heat, result.username)
+            if key not in self._seen:
+                self._seen.add(key)
+                self.index.add(result)
+
+
+def _done(batch, accepted):
+    return {'status': 'done', 'results': len(batch), 'accepted': accepted,
+            'duplicates': len(batch) - accepted}
+
+
+def _status_line(batch_id, status):
+    return json.dumps(dict(status, batch=batch_id)).encode('utf-8') + b'\n'
@@ -0,0 +1,287 @@
+"""Load-test the webapp with synthetic results.
+
+Generate a results CSV file and a Datastore fixture::
+
+    python -m webapp.loadtest generate -n 50000 -u 5000 --csv results.csv \
+        --fixture results.json
+
+Import the fixture into a local Datastore emulator, with
+``DATASTORE_EMULATOR_HOST`` set::
+
+    python -m webapp.loadtest import results.json
+
+Drive the webapp with concurrent clients, either in-process or over
+HTTP, and report throughput and latency per route::
+
+    python -m webapp.loadtest run --csv results.csv / /csv /csv/api/standings
+    python -m webapp.loadtest run --url http://localhost:5000 /csv
+
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import random
+import string
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+from carreralib.bench import percentiles
+from webapp.results import DATASTORE_ENTITY_NAME, Result
+
+ROUTES = ('/', '/csv', '/csv/api/standings')
+PERCENTS = (50, 90, 99)
+
+
+def generate(count, users, laps=5, lap_time=5000, seed=None, start=None):
+    """Generate `count` random results of `users` drivers."""
+    rng = random.Random(seed)
+    start = start or datetime(2020, 1, 1)
+    names = set()
+    while len(names) < users:
+        names.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(8)))
+    # driver skill, as a factor of the nominal lap time
+    drivers = [(name, rng.uniform(0.8, 1.5)) for name in sorted(names)]
+    for n in range(count):
+        name, skill = rng.choice(drivers)
+        times = [max(1, int(rng.gauss(lap_time * skill, lap_time * 0.05))) for _ in range(laps)]
+        yield Result(
+            username=name,
+            time=sum(times),
+            finished_at=start + timedelta(seconds=30 * n, microseconds=rng.randrange(1, 1000000)),
+            laps=times,
+            best_lap=min(times),
+        )
+
+
+def write_csv(path, results):
+    """Write `results` in the race runner's CSV format."""
+    with open(path, 'w') as f:
+        for result in results:
+            laps = ' '.join(str(lap) for lap in result.laps)
+            f.write(f'{result.username}, {result.time}, {result.finished_at}, {laps}\n')
+
+
+def write_fixture(path, results):
+    """Write `results` as JSON lines of Datastore entity properties."""
+    with open(path, 'w') as f:
+        for result in results:
+            f.write(json.dumps(dict(result._asdict(), finished_at=result.finished_at.isoformat())))
+            f.write('\n')
+
+
+def import_fixture(client, path, batch_size=500):
+    """Store the entities of a fixture file using `client`, which is
+    usually connected to a Datastore emulator.
+    """
+    from google.cloud import datastore
+
+    count = 0
+    with open(path) as f:
+        batch = []
+        for line in f:
+            properties = json.loads(line)
+            properties['finished_at'] = datetime.strptime(properties['finished_at'],
+                                                          '%Y-%m-%dT%H:%M:%S.%f')
+            entity = datastore.Entity(client.key(DATASTORE_ENTITY_NAME))
+            entity.update(properties)
+            batch.append(entity)
+            if len(batch) == batch_size:
+                client.put_multi(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            client.put_multi(batch)
+            count += len(batch)
+    return count
+
+
+class HttpClient:
+    """Issue requests over a persistent HTTP connection."""
+
+    def __init__(self, url, timeout=10.0):
+        url = urllib.parse.urlsplit(url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+        self.prefix = url.path.rstrip('/')
+
+    def get(self, route):
+        try:
+            self.connection.request('GET', self.prefix + route)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # reconnect on the next request
+            self.connection.close()
+            raise
+        return response.status
+
+    def close(self):
+        self.connection.close()
+
+
+class AppClient:
+    """Issue requests to a Flask app in-process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, route):
+        response = self.client.get(route)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+def run(factory, routes, clients=8, duration=10.0, warmup=1.0, clock=time.monotonic):
+    """Request `routes` round-robin from `clients` concurrent threads,
+    each using a client returned by `factory`, and return a report as a
+    :class:`dict`.
+
+    Requests during the first `warmup` seconds are not measured, so
+    the webapp's caches are filled first.
+
+    """
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    lock = threading.Lock()
+    start = clock()
+    begin, end = start + warmup, start + warmup + duration
+
+    def worker(offset):
+        client = factory()
+        local = collections.defaultdict(list)
+        failed = collections.Counter()
+        n = offset
+        try:
+            while True:
+                route = routes[n % len(routes)]
+                n += 1
+                sent = clock()
+                if sent >= end:
+                    break
+                try:
+                    ok = client.get(route) < 400
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                if sent < begin:
+                    continue
+                if ok:
+                    local[route].append(clock() - sent)
+                else:
+                    failed[route] += 1
+        finally:
+            client.close()
+        with lock:
+            for route, values in local.items():
+                latencies[route].extend(values)
+            errors.update(failed)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = {}
+    for route in routes:
+        values = latencies[route]
+        stats = percentiles(values, PERCENTS)
+        report[route] = {
+            'requests': len(values) + errors[route],
+            'errors': errors[route],
+            'rate': len(values) / duration,
+            'p50': stats[50],
+            'p90': stats[90],
+            'p99': stats[99],
+            'max': max(values) if values else None,
+        }
+    return {'clients': clients, 'duration': duration, 'routes': report}
+
+
+def format_report(report):
+    """Format a report returned by :func:`run` as text."""
+    def ms(value):
+        return '%.2f' % (value * 1000) if value is not None else 'n/a'
+    lines = [
+        'Clients: %d, duration: %.1f s' % (report['clients'], report['duration']),
+        '',
+        '%-30s%10s%8s%10s%10s%10s%10s%10s' % (
+            'Route', 'Requests', 'Errors', 'Req/s', 'P50', 'P90', 'P99', 'Max'
+        )
+    ]
+    for route, stats in report['routes'].items():
+        lines.append('%-30s%10d%8d%10.1f%10s%10s%10s%10s' % (
+            route, stats['requests'], stats['errors'], stats['rate'], ms(stats['p50']),
+            ms(stats['p90']), ms(stats['p99']), ms(stats['max'])
+        ))
+    return '\n'.join(lines)
+
+
+def load_app(csv_path=None):
+    from webapp import __main__ as webapp
+    from webapp.results import CsvSource
+
+    if csv_path is not None:
+        webapp.sources['csv'] = CsvSource(csv_path)
+    return webapp.app
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m webapp.loadtest')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    generate_parser = subparsers.add_parser('generate', help='generate synthetic results')
+    generate_parser.add_argument('-n', '--count', default=10000, type=int)
+    generate_parser.add_argument('-u', '--users', default=1000, type=int)
+    generate_parser.add_argument('-l', '--laps', default=5, type=int)
+    generate_parser.add_argument('-s', '--seed', default=None, type=int)
+    generate_parser.add_argument('--csv', metavar='FILE', help='write results CSV file')
+    generate_parser.add_argument('--fixture', metavar='FILE', help='write Datastore fixture')
+
+    import_parser = subparsers.add_parser('import', help='import a fixture into Datastore')
+    import_parser.add_argument('fixture', metavar='FILE')
+    import_parser.add_argument('-p', '--project', default='carreralib')
+
+    run_parser = subparsers.add_parser('run', help='drive the webapp with concurrent clients')
+    run_parser.add_argument('routes', metavar='ROUTE', nargs='*', default=ROUTES)
+    run_parser.add_argument('--url', help='webapp base URL, default is to run in-process')
+    run_parser.add_argument('--csv', metavar='FILE', help='results CSV file for in-process runs')
+    run_parser.add_argument('-c', '--clients', default=8, type=int)
+    run_parser.add_argument('-d', '--duration', default=10.0, type=float)
+    run_parser.add_argument('-w', '--warmup', default=1.0, type=float)
+    run_parser.add_argument('-o', '--output', metavar='FILE', help='write JSON report to FILE')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        results = list(generate(args.count, args.users, args.laps, seed=args.seed))
+        if args.csv:
+            write_csv(args.csv, results)
+        if args.fixture:
+            write_fixture(args.fixture, results)
+    elif args.command == 'import':
+        from google.cloud import datastore
+
+        if not os.environ.get('DATASTORE_EMULATOR_HOST'):
+            parser.error('DATASTORE_EMULATOR_HOST is not set')
+        client = datastore.Client(project=args.project)
+        print(f'Imported {import_fixture(client, args.fixture)} entities')
+    else:
+        if args.url:
+            factory = lambda: HttpClient(args.url)  # noqa: E731
+        else:
+            app = load_app(args.csv)
+            factory = lambda: AppClient(app)  # noqa: E731
+        report = run(factory, list(args.routes), args.clients, args.duration, args.warmup)
+        print(format_report(report))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
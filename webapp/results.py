@@ -0,0 +1,252 @@
+import base64
+import bisect
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+
+RESULTS_CSV_FILE = 'results.csv'
+DATASTORE_ENTITY_NAME = 'race_results'
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+REFRESH_INTERVAL = 2.0
+# results may be stored after others that finished later
+DATASTORE_OVERLAP = timedelta(minutes=1)
+
+logger = logging.getLogger(__name__)
+
+Result = namedtuple('Result', 'username time finished_at laps best_lap')
+
+
+def parse_datetime(value):
+    try:
+        return datetime.strptime(value.strip(), '%Y-%m-%d %H:%M:%S.%f')
+    except ValueError:
+        return None
+
+
+def parse_row(row):
+    """Parse a CSV row holding the username, total time, finish time
+    and, since lap times are recorded, the space-separated lap times.
+    """
+    laps = [int(lap) for lap in row[3].split()] if len(row) > 3 else []
+    return Result(
+        username=row[0],
+        time=int(row[1]),
+        finished_at=parse_datetime(row[2]) if len(row) > 2 else None,
+        laps=laps,
+        best_lap=min(laps) if laps else None,
+    )
+
+
+def read_csv(path=RESULTS_CSV_FILE):
+    """Read results written by the race runner."""
+    with open(path, newline='') as csvfile:
+        return [parse_row(row) for row in csv.reader(csvfile, delimiter=',') if row]
+
+
+def fetch_datastore(client, limit=None, since=None):
+    """Fetch results stored in Datastore by the race runner, optionally
+    only those finished at or after `since`.
+    """
+    query = client.query(kind=DATASTORE_ENTITY_NAME)
+    if since is not None:
+        query.add_filter('finished_at', '>=', since)
+        query.order = ['finished_at']
+    return [
+        Result(
+            username=entity['username'],
+            time=entity['time'],
+            finished_at=entity.get('finished_at'),
+            laps=list(entity.get('laps') or []),
+            best_lap=entity.get('best_lap'),
+        )
+        for entity in query.fetch(limit=limit)
+    ]
+
+
+def encode_cursor(key):
+    data = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor returned by :class:`ResultIndex`, raising
+    :exc:`ValueError` if invalid.
+
+    Both standings and history cursors hold a time and a string, the
+    username or the finish time respectively.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list) or len(key) != 2:
+        raise ValueError('Invalid cursor')
+    total, name = key
+    if not isinstance(total, int) or isinstance(total, bool) or not isinstance(name, str):
+        raise ValueError('Invalid cursor')
+    return total, name
+
+
+def page_size(limit):
+    return max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+def history_key(result):
+    finished_at = result.finished_at.isoformat() if result.finished_at else ''
+    return (result.time, finished_at)
+
+
+class ResultIndex:
+    """Sorted in-memory index of results for keyset pagination.
+
+    Standings hold every user's best result ordered by (time,
+    username); a user's history holds all of their results ordered by
+    (time, finish time).  Both are kept sorted as results are added,
+    so a page is found by bisection instead of scanning.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = 0
+        self._keys = []
+        self._best = {}
+        self._history = defaultdict(lambda: ([], []))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, result):
+        with self.lock:
+            best = self._best.get(result.username)
+            if best is None or result.time < best.time:
+                if best is not None:
+                    del self._keys[bisect.bisect_left(self._keys, (best.time, best.username))]
+                bisect.insort(self._keys, (result.time, result.username))
+                self._best[result.username] = result
+            keys, results = self._history[result.username]
+            key = history_key(result)
+            position = bisect.bisect_right(keys, key)
+            keys.insert(position, key)
+            results.insert(position, result)
+            self.version += 1
+
+    def standings(self, after=None, limit=PAGE_SIZE):
+        """Return a page of `(rank, result)` pairs following the cursor
+        `after`, and the cursor of the next page or None.
+        """
+        limit = page_size(limit)
+        with self.lock:
+            keys = self._keys
+            start = bisect.bisect_right(keys, decode_cursor(after)) if after else 0
+            page = [(start + n + 1, self._best[username])
+                    for n, (_, username) in enumerate(keys[start:start + limit])]
+            more = start + limit < len(keys)
+        return page, encode_cursor(keys[start + limit - 1]) if more else None
+
+    def history(self, username, after=None, limit=PAGE_SIZE):
+        """Return a page of the results of `username` following the
+        cursor `after`, and the cursor of the next page or None.
+        """
+        limit = page_size(limit)
+        with self.lock:
+            if username not in self._history:
+                return [], None
+            keys, results = self._history[username]
+            start = bisect.bisect_right(keys, decode_cursor(after)) if after else 0
+            page = results[start:start + limit]
+            more = start + limit < len(keys)
+        return page, encode_cursor(keys[start + limit - 1]) if more else None
+
+
+class CsvSource:
+    """Feed results appended to the race runner's CSV file into an
+    index, reading only the data added since the last refresh.
+    """
+
+    def __init__(self, path=RESULTS_CSV_FILE, index=None):
+        self.path = path
+        self.index = index or ResultIndex()
+        self._offset = 0
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def refresh(self, interval=REFRESH_INTERVAL):
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed is not None and now - self._refreshed < interval:
+                return self.index
+            self._refreshed = now
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return self.index
+            if size < self._offset:
+                self.index, self._offset = ResultIndex(), 0
+            if size > self._offset:
+                with open(self.path, 'rb') as f:
+                    f.seek(self._offset)
+                    data = f.read(size - self._offset)
+                # leave an incomplete last line for the next refresh
+                data = data[:data.rfind(b'\n') + 1]
+                reader = csv.reader(io.StringIO(data.decode('utf-8', 'replace'), newline=''))
+                results = []
+                for row in reader:
+                    if not row:
+                        continue
+                    try:
+                        results.append(parse_row(row))
+                    except (IndexError, ValueError) as e:
+                        logger.warning('Skipping invalid result in %s: %r (%s)', self.path, row, e)
+                for result in results:
+                    self.index.add(result)
+                self._offset += len(data)
+            return self.index
+
+
+class DatastoreSource:
+    """Feed results stored in Datastore into an index, fetching only
+    the results finished since the last refresh.
+
+    Since results are not necessarily stored in the order they
+    finished, each refresh fetches results finished up to `overlap`
+    before the latest one seen, skipping those already added.
+    """
+
+    def __init__(self, client, index=None, overlap=DATASTORE_OVERLAP):
+        self.client = client
+        self.index = index or ResultIndex()
+        self.overlap = overlap
+        self._since = None
+        self._seen = set()
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def refresh(self, interval=REFRESH_INTERVAL):
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed is not None and now - self._refreshed < interval:
+                return self.index
+            self._refreshed = now
+            since = self._since - self.overlap if self._since is not None else None
+            for result in fetch_datastore(self.client, since=since):
+                key = (result.username, result.time, result.finished_at)
+                if key in self._seen:
+                    continue
+                self.index.add(result)
+                if result.finished_at:
+                    self._seen.add(key)
+                    if self._since is None or result.finished_at > self._since:
+                        self._since = result.finished_at
+            if self._since is not None:
+                # results outside the next window will not be fetched again
+                since = self._since - self.overlap
+                self._seen = {key for key in self._seen if key[2] >= since}
+            return self.index
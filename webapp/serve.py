@@ -0,0 +1,160 @@
+"""Serve the webapp with several pre-forked worker processes.
+
+    python -m webapp.serve --bind 0.0.0.0:5000 --workers 4 --csv results.csv
+
+The listening socket is bound once and inherited by all workers, each
+of which serves requests in threads and creates its own Datastore
+client on first use.  First pages of standings and histories are
+shared between workers through a memory-mapped cache, results
+ingested by any worker and the status of their batches are merged
+through the shared journal, and live race events are relayed to
+every worker by the master process, which also restarts workers that
+exit.
+
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from carreralib.live import DEFAULT_ADDRESS, LivePublisher, LiveSubscriber
+from webapp.sharedcache import SharedCache
+
+DEFAULT_BIND = '127.0.0.1:5000'
+DEFAULT_WORKERS = os.cpu_count() or 1
+POLL_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host.strip('[]') or '0.0.0.0', int(port)
+
+
+def worker_address(address, number):
+    return '%s.%d' % (address, number)
+
+
+def run_worker(sock, cache, live_address, csv_path=None):
+    from werkzeug.serving import make_server
+
+    from webapp import __main__ as webapp
+    from webapp.results import CsvSource
+
+    if csv_path is not None:
+        webapp.sources['csv'] = CsvSource(csv_path)
+    webapp.shared_cache = cache
+    webapp.live_address = live_address
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, webapp.app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class Master:
+    """Fork and supervise worker processes, relaying live events to
+    each of them.
+    """
+
+    def __init__(self, sock, workers, live_address=DEFAULT_ADDRESS, csv_path=None):
+        self.sock = sock
+        self.cache = SharedCache()
+        self.live_address = live_address
+        self.csv_path = csv_path
+        self.workers = {}
+        self.publishers = [
+            LivePublisher(worker_address(live_address, n)) for n in range(workers)
+        ]
+
+    def spawn(self, number):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                run_worker(self.sock, self.cache, worker_address(self.live_address, number),
+                           self.csv_path)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                logger.exception('Worker %d failed', number)
+                status = 1
+            finally:
+                os._exit(status)
+        self.workers[pid] = number
+        logger.info('Started worker %d (pid %d)', number, pid)
+
+    def run(self):
+        for number in range(len(self.publishers)):
+            self.spawn(number)
+        subscriber = LiveSubscriber(self.live_address)
+        try:
+            while True:
+                event = subscriber.recv(timeout=POLL_INTERVAL)
+                if event is not None:
+                    for publisher in self.publishers:
+                        publisher.publish(**event)
+                self.reap()
+        finally:
+            subscriber.close()
+            self.stop()
+
+    def reap(self):
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            number = self.workers.pop(pid)
+            logger.warning('Worker %d (pid %d) exited with status %d, restarting',
+                           number, pid, os.waitstatus_to_exitcode(status))
+            self.spawn(number)
+
+    def stop(self):
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + 5.0
+        while self.workers and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.1)
+            else:
+                self.workers.pop(pid, None)
+        for pid in self.workers:
+            os.kill(pid, signal.SIGKILL)
+        self.workers.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m webapp.serve')
+    parser.add_argument('-b', '--bind', default=DEFAULT_BIND, metavar='HOST:PORT',
+                        help='address to listen on (default: %(default)s)')
+    parser.add_argument('-w', '--workers', default=DEFAULT_WORKERS, type=int,
+                        help='number of worker processes (default: %(default)s)')
+    parser.add_argument('--csv', metavar='FILE', help='results CSV file')
+    parser.add_argument('--backlog', default=1024, type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(message)s')
+    # import the app before forking, but create clients in the workers
+    import webapp.__main__  # noqa: F401
+    sock = socket.create_server(parse_bind(args.bind), backlog=args.backlog)
+    logger.info('Listening on %s:%d', *sock.getsockname()[:2])
+    master = Master(sock, args.workers, csv_path=args.csv)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        master.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
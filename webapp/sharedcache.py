@@ -0,0 +1,141 @@
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+# sequence, payload length, stored at, key
+_SLOT = struct.Struct('<IId64s')
+_SEQ = struct.Struct('<I')
+# the slot header following the sequence number
+_ENTRY = struct.Struct('<Id64s')
+
+
+class SharedCache:
+    """Cache of serialized pages shared by forked worker processes.
+
+    Entries are kept in fixed-size slots of an anonymous memory-mapped
+    file, selected by a hash of their key, so a colliding key simply
+    replaces an older entry.  Writers lock their slot, and readers use
+    the slot's sequence number to detect concurrent updates: it is odd
+    while a slot is updated, and only made even after the header and
+    data have been written.  A worker killed during an update leaves
+    its slot's sequence number odd, so readers give up after a number
+    of retries, and the next writer takes over.  Create the cache
+    before forking the workers that share it.
+
+    """
+
+    def __init__(self, slots=256, slot_size=65536, clock=time.monotonic):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.clock = clock
+        self._file = tempfile.TemporaryFile(dir=SHM_DIR)
+        self._file.truncate(slots * slot_size)
+        self._mmap = mmap.mmap(self._file.fileno(), slots * slot_size)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def get(self, key, maxretries=1000):
+        """Return the age in seconds and data of the entry for `key`,
+        or None if not cached or no consistent entry could be read
+        within `maxretries` attempts.
+        """
+        key, offset = self._slot(key)
+        buf = self._mmap
+        for retries in range(1, maxretries + 1):
+            seq, length, stored, slotkey = _SLOT.unpack_from(buf, offset)
+            if not seq & 1:
+                if slotkey.rstrip(b'\0') != key or not seq:
+                    return None
+                start = offset + _SLOT.size
+                data = buf[start:start + length]
+                if _SEQ.unpack_from(buf, offset)[0] == seq:
+                    return self.clock() - stored, data
+            if retries % 100 == 0:
+                time.sleep(0)
+        return None
+
+    def put(self, key, data):
+        """Store `data` for `key`, returning False if it is too large."""
+        if _SLOT.size + len(data) > self.slot_size:
+            return False
+        key, offset = self._slot(key)
+        with self._locked(offset):
+            seq = self._begin(offset)
+            start = offset + _SLOT.size
+            self._mmap[start:start + len(data)] = data
+            _ENTRY.pack_into(self._mmap, offset + _SEQ.size, len(data), self.clock(), key)
+            self._end(offset, seq)
+        return True
+
+    def claim(self, key, max_age):
+        """Return True if the entry for `key` is older than `max_age`
+        seconds, and mark it as fresh.
+
+        The caller is then expected to :meth:`put` a new entry, while
+        other workers keep serving the old one.  If `key` is not cached,
+        every caller gets True.
+
+        """
+        key, offset = self._slot(key)
+        with self._locked(offset):
+            seq, length, stored, slotkey = _SLOT.unpack_from(self._mmap, offset)
+            if seq & 1:
+                # a writer died during an update, so drop the entry
+                _ENTRY.pack_into(self._mmap, offset + _SEQ.size, 0, 0.0, b'')
+                self._end(offset, seq)
+                return True
+            if slotkey.rstrip(b'\0') != key or not seq:
+                return True
+            now = self.clock()
+            if now - stored < max_age:
+                return False
+            seq = self._begin(offset)
+            _ENTRY.pack_into(self._mmap, offset + _SEQ.size, length, now, key)
+            self._end(offset, seq)
+            return True
+
+    def _begin(self, offset):
+        # an odd sequence number is left by a writer that died, and
+        # readers already treat the slot as being updated
+        seq = _SEQ.unpack_from(self._mmap, offset)[0] | 1
+        _SEQ.pack_into(self._mmap, offset, seq)
+        return seq
+
+    def _end(self, offset, seq):
+        # zero marks empty slots, so skip it on wrap-around
+        _SEQ.pack_into(self._mmap, offset, (seq + 1) & 0xffffffff or 2)
+
+    def _slot(self, key):
+        key = key.encode('utf-8')
+        if len(key) > 64:
+            key = b'%08x' % zlib.crc32(key) + key[-56:]
+        return key, (zlib.crc32(key) % self.slots) * self.slot_size
+
+    def _locked(self, offset):
+        return _SlotLock(self, offset)
+
+
+class _SlotLock:
+
+    def __init__(self, cache, offset):
+        self.cache = cache
+        self.offset = offset
+
+    def __enter__(self):
+        # record locks are held per process, so also exclude other threads
+        self.cache._lock.acquire()
+        fcntl.lockf(self.cache._file, fcntl.LOCK_EX, 1, self.offset)
+
+    def __exit__(self, *exc_info):
+        fcntl.lockf(self.cache._file, fcntl.LOCK_UN, 1, self.offset)
+        self.cache._lock.release()
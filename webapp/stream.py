@@ -0,0 +1,74 @@
+import json
+import logging
+import threading
+
+from carreralib.live import DEFAULT_ADDRESS, LiveSubscriber
+
+
+KEEPALIVE_INTERVAL = 15
+
+
+class Broadcaster:
+    """Coalescing fan-out of live race events to many stream clients.
+
+    Only the latest event for each key (event type and car address) is
+    kept, so a slow client skips intermediate updates instead of
+    queueing them, and the cost of serving a client never depends on
+    how many events were published in the meantime.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._events = {}
+
+    def publish(self, event):
+        key = (event.get('type'), event.get('address'))
+        with self._cond:
+            if event.get('type') == 'reset':
+                self._events.clear()
+            self._version += 1
+            self._events[key] = (self._version, event)
+            self._cond.notify_all()
+
+    def wait(self, since=0, timeout=None):
+        """Wait for events newer than version `since`.
+
+        Returns the current version and the list of changed events in
+        the order they were published, which is empty if `timeout`
+        expired.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > since, timeout)
+            changed = [item for item in self._events.values() if item[0] > since]
+            changed.sort(key=lambda item: item[0])
+            return self._version, [event for _, event in changed]
+
+    def listen(self, address=DEFAULT_ADDRESS):
+        """Start a daemon thread feeding events from the race runner."""
+        thread = threading.Thread(target=self._listen, args=(address,), daemon=True)
+        thread.start()
+        return thread
+
+    def _listen(self, address):
+        subscriber = LiveSubscriber(address)
+        try:
+            while True:
+                event = subscriber.recv()
+                if event is not None:
+                    self.publish(event)
+        except Exception:
+            logging.exception('Live event listener failed')
+        finally:
+            subscriber.close()
+
+
+def event_stream(broadcaster, keepalive=KEEPALIVE_INTERVAL):
+    """Generate a Server-Sent Events stream from `broadcaster`."""
+    version = 0
+    while True:
+        version, events = broadcaster.wait(version, keepalive)
+        if not events:
+            yield ': keepalive\n\n'
+        for event in events:
+            yield 'data: %s\n\n' % json.dumps(event, separators=(',', ':'))